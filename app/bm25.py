@@ -0,0 +1,153 @@
+"""
+BM25 ranking over FAQ question, keywords and answer fields
+Term statistics are precomputed into a term-major sparse matrix so a query is
+scored with a single sparse accumulation instead of a Python loop over FAQs
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import Counter
+import math
+import os
+import threading
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from .text_processing import tokenize
+
+# Repeating a field's terms is the usual BM25F shortcut for field boosts
+FIELD_WEIGHTS = {'question': 2.0, 'keywords': 2.0, 'answer': 1.0}
+
+
+class _BM25State:
+    """Immutable snapshot swapped in atomically on rebuild"""
+    __slots__ = ('records', 'vocabulary', 'doc_freq', 'indptr', 'indices', 'weights', 'postings')
+
+    def __init__(self, records, vocabulary, doc_freq, indptr, indices, weights, postings):
+        self.records = records
+        self.vocabulary = vocabulary
+        self.doc_freq = doc_freq
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.postings = postings
+
+
+class BM25Index:
+    """Okapi BM25 with precomputed per-(term, FAQ) weights"""
+
+    def __init__(self, k1: Optional[float] = None, b: Optional[float] = None):
+        self.k1 = k1 if k1 is not None else float(os.getenv("BM25_K1", "1.2"))
+        self.b = b if b is not None else float(os.getenv("BM25_B", "0.75"))
+        self.generation = -1
+        self._state: Optional[_BM25State] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._state.records) if self._state else 0
+
+    def ensure(self, faq_index):
+        """Rebuild from the FAQ index whenever its contents changed"""
+        if self.generation != faq_index.generation:
+            with self._lock:
+                if self.generation != faq_index.generation:
+                    generation = faq_index.generation
+                    self.build(faq_index.snapshot())
+                    self.generation = generation
+
+    def build(self, records: Sequence):
+        """Compute document frequencies and BM25 weights for every FAQ"""
+        doc_terms: List[Counter] = []
+        for record in records:
+            terms: Counter = Counter()
+            for field, text in (('question', record.question),
+                                ('keywords', record.keywords),
+                                ('answer', record.answer)):
+                weight = FIELD_WEIGHTS[field]
+                for token in tokenize(text):
+                    terms[token] += weight
+            doc_terms.append(terms)
+
+        n_docs = len(doc_terms)
+        lengths = [sum(terms.values()) for terms in doc_terms]
+        # Empty and stopword-only corpora have no length; keep the denominator defined
+        avgdl = ((sum(lengths) / n_docs) if n_docs else 0.0) or 1.0
+
+        vocabulary: Dict[str, int] = {}
+        postings: List[List[Tuple[int, float]]] = []
+        for doc, terms in enumerate(doc_terms):
+            for term, tf in terms.items():
+                term_id = vocabulary.get(term)
+                if term_id is None:
+                    term_id = vocabulary[term] = len(postings)
+                    postings.append([])
+                postings[term_id].append((doc, tf))
+
+        doc_freq = [len(plist) for plist in postings]
+        for term_id, plist in enumerate(postings):
+            df = doc_freq[term_id]
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            postings[term_id] = [
+                (doc, idf * tf * (self.k1 + 1) /
+                 (tf + self.k1 * (1 - self.b + self.b * lengths[doc] / avgdl)))
+                for doc, tf in plist
+            ]
+
+        indptr = indices = weights = None
+        if NUMPY_AVAILABLE:
+            indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum(doc_freq)
+            indices = np.fromiter((doc for plist in postings for doc, _ in plist),
+                                  dtype=np.int32, count=int(indptr[-1]))
+            weights = np.fromiter((w for plist in postings for _, w in plist),
+                                  dtype=np.float32, count=int(indptr[-1]))
+            postings = None
+
+        self._state = _BM25State(list(records), vocabulary, doc_freq, indptr, indices, weights, postings)
+
+    def top_k(self, terms: Sequence[str], limit: int,
+              state: Optional[_BM25State] = None) -> List[Tuple[int, float]]:
+        """(document index, BM25 score) pairs for the best matches of a tokenized query"""
+        state = state or self._state
+        if state is None or limit <= 0:
+            return []
+        term_ids = sorted({state.vocabulary[t] for t in terms if t in state.vocabulary})
+        if not term_ids:
+            return []
+
+        if state.postings is not None:
+            scores: Dict[int, float] = {}
+            for term_id in term_ids:
+                for doc, weight in state.postings[term_id]:
+                    scores[doc] = scores.get(doc, 0.0) + weight
+            return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+        ids = np.asarray(term_ids, dtype=np.int64)
+        selected = np.concatenate([
+            np.arange(start, end) for start, end in zip(state.indptr[ids], state.indptr[ids + 1])
+        ])
+        docs = np.unique(state.indices[selected])
+        dense = np.bincount(state.indices[selected], weights=state.weights[selected],
+                            minlength=len(state.records))
+        scores = dense[docs]
+        if len(docs) > limit:
+            keep = np.argpartition(-scores, limit - 1)[:limit]
+            docs, scores = docs[keep], scores[keep]
+        order = np.lexsort((docs, -scores))
+        return list(zip(docs[order].tolist(), scores[order].tolist()))
+
+    def search(self, query: str, limit: int = 5, terms: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Top FAQs by BM25 score, same result shape as the legacy search"""
+        state = self._state
+        ranked = self.top_k(terms if terms is not None else tokenize(query), limit, state)
+        return [
+            {
+                'faq_id': state.records[doc].faq_id,
+                'question': state.records[doc].question,
+                'answer': state.records[doc].answer,
+                'score': score
+            }
+            for doc, score in ranked
+        ]
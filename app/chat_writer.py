@@ -0,0 +1,166 @@
+"""
+Write-behind persistence for chat_history
+Chat endpoints hand finished turns to a bounded queue and return; a
+background thread inserts them in batches (one executemany per batch) every
+CHAT_WRITER_INTERVAL_MS or as soon as CHAT_WRITER_BATCH rows are waiting.
+When the queue is full the caller writes its row itself, so a slow disk
+pushes back on the request instead of dropping turns
+"""
+from datetime import datetime, timezone
+from typing import Dict, List
+import atexit
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from .database import engine
+from . import models
+from .concurrency import run_blocking
+from .metrics import chat_stage_seconds
+
+_COMMIT_SECONDS = chat_stage_seconds['history_commit']
+
+
+class ChatHistoryWriter:
+    """Bounded queue of chat_history rows drained by one flusher thread"""
+
+    def __init__(self, max_queue: int = None, batch_size: int = None, interval_ms: float = None):
+        self.enabled = os.getenv("CHAT_WRITER_ENABLED", "1") not in ('0', 'false', 'no')
+        self.max_queue = max_queue or int(os.getenv("CHAT_WRITER_QUEUE_SIZE", "10000"))
+        self.batch_size = batch_size or int(os.getenv("CHAT_WRITER_BATCH", "100"))
+        self.interval = (interval_ms if interval_ms is not None else float(
+            os.getenv("CHAT_WRITER_INTERVAL_MS", "100")
+        )) / 1000
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=self.max_queue)
+        self._stop = threading.Event()
+        self._flusher = None
+        self._start_lock = threading.Lock()
+        # Held by the flusher from dequeue to commit, so flush() returns only
+        # after rows the flusher already took are saved
+        self._write_lock = threading.Lock()
+
+        self.written = 0
+        self.batches = 0
+        self.sync_writes = 0
+        self.failed = 0
+
+    @staticmethod
+    def make_row(user_id: int, session_id: str, user_message: str, bot_response: str,
+                 intent: str, confidence: float, entities: str) -> Dict:
+        return {
+            "user_id": user_id,
+            "session_id": session_id,
+            "user_message": user_message,
+            "bot_response": bot_response,
+            "intent": intent,
+            "confidence": confidence,
+            "entities": entities,
+            # Stamped now (UTC, like the server default) rather than at flush time
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+
+    def _ensure_started(self):
+        if self._flusher is None:
+            with self._start_lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+                    self._flusher.start()
+                    atexit.register(self.close)
+
+    def submit(self, row: Dict):
+        """Queue a row; write it on the calling thread when the queue is full"""
+        if self.enabled and not self._stop.is_set():
+            self._ensure_started()
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                pass
+        self.sync_writes += 1
+        self._write([row])
+
+    async def asubmit(self, row: Dict):
+        """Async submit; the fallback write runs on the blocking pool"""
+        if self.enabled and not self._stop.is_set():
+            self._ensure_started()
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                pass
+        self.sync_writes += 1
+        await run_blocking(self._write, [row])
+
+    def _drain(self, first: Dict) -> List[Dict]:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._write_lock:
+                try:
+                    first = self._queue.get(timeout=self.interval)
+                except queue.Empty:
+                    continue
+                # Give a burst a moment to accumulate into one transaction
+                if self._queue.qsize() < self.batch_size:
+                    time.sleep(min(self.interval, 0.01))
+                self._write(self._drain(first))
+
+    def _write(self, rows: List[Dict]):
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(models.ChatHistory.__table__), rows)
+            _COMMIT_SECONDS.observe(time.perf_counter() - started)
+            self.written += len(rows)
+            self.batches += 1
+        except Exception as e:
+            if len(rows) == 1:
+                self.failed += 1
+                print(f"Chat history write error: {e}")
+                return
+            # Isolate the bad row instead of losing the whole batch
+            for row in rows:
+                self._write([row])
+
+    def flush(self):
+        """Write everything queued so far on the calling thread"""
+        with self._write_lock:
+            while True:
+                try:
+                    first = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+                self._write(self._drain(first))
+
+    def close(self):
+        """Stop the flusher and write the remaining rows"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=10)
+        self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "written": self.written,
+            "batches": self.batches,
+            "sync_writes": self.sync_writes,
+            "failed": self.failed,
+        }
+
+
+chat_writer = ChatHistoryWriter()
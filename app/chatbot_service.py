@@ -6,6 +6,8 @@ from datetime import datetime
 import os
 import json
 
+from .intent_classifier import IntentClassifier
+
 # Import Gemini
 try:
     from google import genai
@@ -50,6 +52,7 @@ class ChatbotService:
         self.gemini_available = GEMINI_AVAILABLE
         self.client = None
         self.conversation_history = {}
+        self.intent_classifier = IntentClassifier.from_config(table="static_intents")
         
         if GEMINI_AVAILABLE:
             try:
@@ -66,27 +69,7 @@ class ChatbotService:
     
     def classify_intent(self, message: str) -> Tuple[str, float]:
         """Classify user intent"""
-        msg_lower = message.lower()
-        
-        # Intent patterns
-        if any(word in msg_lower for word in ['hello', 'hi', 'hey', 'greetings']):
-            return "greeting", 0.95
-        elif any(word in msg_lower for word in ['bye', 'goodbye', 'thanks', 'thank you']):
-            return "farewell", 0.95
-        elif any(word in msg_lower for word in ['timetable', 'schedule', 'class']):
-            return "timetable", 0.90
-        elif any(word in msg_lower for word in ['faculty', 'teacher', 'professor']):
-            return "faculty", 0.90
-        elif any(word in msg_lower for word in ['exam', 'test', 'ia', 'assessment']):
-            return "exam", 0.90
-        elif any(word in msg_lower for word in ['assignment', 'deadline', 'project']):
-            return "assignment", 0.90
-        elif any(word in msg_lower for word in ['course', 'subject', 'syllabus']):
-            return "course", 0.90
-        elif any(word in msg_lower for word in ['attendance', 'policy']):
-            return "attendance", 0.90
-        else:
-            return "general", 0.70
+        return self.intent_classifier.classify(message)
     
     def extract_entities(self, message: str, intent: str) -> Dict:
         """Extract entities from message"""
@@ -2,242 +2,467 @@
 Enhanced Academic Chatbot Service with Dynamic Database Integration
 Fetches real data from database and uses Gemini AI for intelligent responses
 """
-from typing import Dict, Tuple, List, Optional
-from datetime import datetime
+from typing import AsyncIterator, Dict, Tuple, List, Optional
 import os
 import json
+import time
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-try:
-    from google import genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    print("Warning: Google Gemini SDK not available")
-
-from .database import SessionLocal
+from .database import SessionLocal, read_engine
 from . import models
-import sqlite3
-from difflib import SequenceMatcher
+from .faq_index import FAQIndex
+from .bm25 import BM25Index
+from .semantic_index import SemanticIndex, NUMPY_AVAILABLE
+from .retrieval import HybridRetriever, CATEGORY_INTENTS
+from .response_cache import ResponseCache, fingerprint
+from .semantic_cache import SemanticCache
+from . import data_events
+from .concurrency import run_blocking
+from .session_store import create_session_store
+from .intent_classifier import IntentClassifier
+from .intent_model import load_intent_model
+from .entity_extractor import EntityExtractor
+from .context_cache import ContextSnapshotCache
+from .prompt_builder import AcademicContext, PromptBuilder, format_history
+from .singleflight import SingleFlight
+from .llm_providers import LLMProvider, create_llm_provider
+from .metrics import REGISTRY, HistogramVec, chat_stage_seconds
+from .text_processing import tokenize
+
+# Minimum top score for search results to be used as prompt context, per
+# retrieval mode (the scores of each mode live on different scales)
+CONTEXT_SCORE_THRESHOLDS = {
+    'legacy': 15.0,
+    'bm25': float(os.getenv("BM25_CONTEXT_THRESHOLD", "2.0")),
+    'semantic': float(os.getenv("SEMANTIC_CONTEXT_THRESHOLD", "0.3")),
+    'hybrid': float(os.getenv("HYBRID_CONTEXT_THRESHOLD", "0.02")),
+}
+
+# Extractive fast path: the top FAQ is returned as the answer, skipping the
+# LLM, when its score and its relative margin over the runner-up reach these
+# (min score, min margin) values for the retrieval mode. Legacy and hybrid
+# scores bunch up, so there the question-overlap check does most of the work
+EXTRACTIVE_THRESHOLDS = {
+    'legacy': (40.0, 0.0),
+    'bm25': (5.0, 0.25),
+    'semantic': (0.45, 0.07),
+    'hybrid': (0.04, 0.0),
+}
+
+# Where an answer came from; ChatResponse.source and the latency histograms
+ANSWER_SOURCES = ('extractive', 'cached', 'generated', 'fallback', 'unavailable')
+
+answer_seconds = REGISTRY.register(HistogramVec(
+    "chatbot_answer_seconds", "Time to answer a chat message, by answer path", "source", ANSWER_SOURCES
+))
+_CLASSIFY_SECONDS = chat_stage_seconds['classify']
+_EXTRACT_SECONDS = chat_stage_seconds['extract']
+_SEARCH_SECONDS = chat_stage_seconds['search']
+_CONTEXT_DB_SECONDS = chat_stage_seconds['context_db']
+_PROMPT_BUILD_SECONDS = chat_stage_seconds['prompt_build']
+_LLM_SECONDS = chat_stage_seconds['llm']
+
+UNAVAILABLE_MESSAGE = "⚠️ AI service is currently unavailable. Please ensure GEMINI_API_KEY is configured correctly."
+
+# Answers when the LLM call fails (breaker open, overloaded, timed out, ...);
+# the error itself is only logged
+FALLBACK_FAQ_TEMPLATE = (
+    "⚠️ The AI assistant is busy right now, so here is the closest answer from the department FAQ:\n\n"
+    "**{question}**\n{answer}"
+)
+FALLBACK_MESSAGE = (
+    "⚠️ The AI assistant is busy right now. Please try again in a moment, "
+    "or contact the department office for urgent queries."
+)
+
+
+class ChatTurn:
+    """State of one chat turn shared by the sync and async response paths"""
+    __slots__ = ('message', 'intent', 'entities', 'session_id', 'db_context', 'history',
+                 'cache_key', 'context_fingerprint', 'cached', 'prompt')
+    
+    def __init__(self, message: str, intent: str, session_id: str, db_context: str,
+                 entities: Optional[Dict] = None):
+        self.message = message
+        self.intent = intent
+        self.entities = entities
+        self.session_id = session_id
+        self.db_context = db_context
+        self.history = ""
+        self.cache_key = None
+        self.context_fingerprint = None
+        self.cached = None
+        self.prompt = None
 
 class DynamicChatbotService:
     def __init__(self):
-        self.gemini_available = GEMINI_AVAILABLE
-        self.client = None
-        self.conversation_history = {}
-        
-        if GEMINI_AVAILABLE:
-            try:
-                api_key = os.getenv("GEMINI_API_KEY")
-                if api_key:
-                    self.client = genai.Client(api_key=api_key)
-                    print("✓ Gemini AI initialized successfully")
-                else:
-                    print("Warning: GEMINI_API_KEY not found")
-                    self.gemini_available = False
-            except Exception as e:
-                print(f"Failed to initialize Gemini: {e}")
-                self.gemini_available = False
+        self.llm: LLMProvider = create_llm_provider()
+        self.sessions = create_session_store()
+        self.session_errors = 0
+        self.intent_classifier = IntentClassifier.from_config()
+        # Learned model when a trained weights file exists; keyword rules otherwise
+        self.intent_model = load_intent_model()
+        self.intent_model_min_confidence = float(os.getenv("INTENT_MODEL_MIN_CONFIDENCE", "0.5"))
+        self.faq_index = FAQIndex(self._load_faq_rows)
+        self.entity_extractor = EntityExtractor(self._load_course_rows)
+        self.bm25_index = BM25Index()
+        self.semantic_index = SemanticIndex()
+        self._hybrid_retriever = None
+        self.context_cache = ContextSnapshotCache()
+        self.prompt_builder = PromptBuilder()
+        self.response_cache = ResponseCache()
+        self.semantic_cache = SemanticCache()
+        self.llm_calls = 0
+        self.llm_flights = SingleFlight()
+        self.extractive_enabled = os.getenv("EXTRACTIVE_ENABLED", "1") not in ('0', 'false', 'no')
+        self.extractive_min_overlap = float(os.getenv("EXTRACTIVE_MIN_OVERLAP", "0.85"))
+        # Overrides for the retrieval mode's EXTRACTIVE_THRESHOLDS
+        self.extractive_min_score = float(os.environ["EXTRACTIVE_MIN_SCORE"]) if os.getenv("EXTRACTIVE_MIN_SCORE") else None
+        self.extractive_min_margin = float(os.environ["EXTRACTIVE_MIN_MARGIN"]) if os.getenv("EXTRACTIVE_MIN_MARGIN") else None
+        self.extractive_template = os.getenv("EXTRACTIVE_TEMPLATE", "{answer}")
+        try:
+            self.extractive_template.format(answer="", question="")
+        except (KeyError, IndexError, ValueError, AttributeError) as e:
+            print(f"Warning: invalid EXTRACTIVE_TEMPLATE ({type(e).__name__}: {e}), using {{answer}}")
+            self.extractive_template = "{answer}"
+        self.path_latency = answer_seconds
+        # Cached answers embed FAQ/course/assignment data, so drop them on writes
+        data_events.subscribe(self.response_cache.invalidate)
+        data_events.subscribe(self.semantic_cache.invalidate)
+        self.retrieval_mode = os.getenv("FAQ_RETRIEVAL_MODE", "legacy").lower()
+        if self.retrieval_mode not in CONTEXT_SCORE_THRESHOLDS:
+            print(f"Warning: unknown FAQ_RETRIEVAL_MODE '{self.retrieval_mode}', using legacy")
+            self.retrieval_mode = 'legacy'
+        if self.retrieval_mode == 'semantic' and not NUMPY_AVAILABLE:
+            print("Warning: semantic retrieval requires numpy, using legacy")
+            self.retrieval_mode = 'legacy'
     
     def get_db(self):
         """Get database session"""
         return SessionLocal()
     
-    def search_database_enhanced(self, query: str, limit: int = 5) -> List[Dict]:
+    def _load_faq_rows(self) -> List[Tuple]:
+        """Read every FAQ row for the in-memory index"""
+        faq = models.FAQ
+        with read_engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(
+                select(faq.faq_id, faq.question, faq.answer, faq.keywords, faq.category)
+                .order_by(faq.id)
+            )]
+    
+    def _load_course_rows(self) -> List[Tuple]:
+        """Course codes, names and faculty for the entity gazetteer"""
+        course = models.Course
+        with read_engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(
+                select(course.course_code, course.course_name, course.faculty_theory, course.faculty_lab)
+                .order_by(course.course_code)
+            )]
+    
+    def warm_up(self):
+        """Build in-memory indexes ahead of the first chat request"""
+        try:
+            self.faq_index.build()
+            self.entity_extractor.build()
+            if self.retrieval_mode == 'bm25':
+                self.bm25_index.ensure(self.faq_index)
+            elif self.retrieval_mode in ('semantic', 'hybrid'):
+                self._ensure_indexes()
+            print(f"✓ FAQ index built ({len(self.faq_index)} FAQs, {self.retrieval_mode} ranking)")
+        except Exception as e:
+            print(f"FAQ index build error: {e}")
+    
+    def _ensure_indexes(self):
+        """Bring every ranker in line with the current FAQ index"""
+        self.bm25_index.ensure(self.faq_index)
+        if NUMPY_AVAILABLE:
+            self.semantic_index.ensure(self.faq_index)
+    
+    def _category_faqs(self, terms, intent: Optional[str], limit: int) -> List[Dict]:
+        """FAQs whose category matches the intent (the old category LIKE lookup)"""
+        if intent not in CATEGORY_INTENTS:
+            return []
+        return [
+            {'faq_id': r.faq_id, 'question': r.question, 'answer': r.answer, 'score': 1.0}
+            for r in self.faq_index.by_category(intent, min(limit, 3))
+        ]
+    
+    @property
+    def hybrid_retriever(self) -> HybridRetriever:
+        if self._hybrid_retriever is None:
+            retrievers = {
+                'legacy': lambda terms, intent, depth: self.faq_index.search(terms.text, depth, terms),
+                'bm25': lambda terms, intent, depth: self.bm25_index.search(terms.text, depth, terms.tokens),
+                'category': self._category_faqs,
+            }
+            if NUMPY_AVAILABLE:
+                retrievers['semantic'] = (
+                    lambda terms, intent, depth: self.semantic_index.search(terms.text, depth, terms.tokens)
+                )
+            self._hybrid_retriever = HybridRetriever(retrievers)
+        return self._hybrid_retriever
+    
+    def search_database_enhanced(self, query: str, limit: int = 5, mode: Optional[str] = None,
+                                 intent: Optional[str] = None) -> List[Dict]:
         """
         Enhanced database search using multiple strategies
+        
+        mode selects the ranking: 'legacy' (additive heuristic), 'bm25',
+        'semantic' (embedding cosine) or 'hybrid' (all of them plus the
+        intent's FAQ category, fused); defaults to FAQ_RETRIEVAL_MODE
         """
+        mode = mode or self.retrieval_mode
+        started = time.perf_counter()
         try:
-            conn = sqlite3.connect('feedback.db')
-            cursor = conn.cursor()
-            
-            # Get all FAQs
-            cursor.execute("SELECT faq_id, question, answer, keywords FROM faqs")
-            all_faqs = cursor.fetchall()
-            conn.close()
-            
-            query_lower = query.lower()
-            scored_results = []
-            
-            for faq_id, question, answer, keywords in all_faqs:
-                score = 0
-                
-                # 1. Direct keyword matching in question
-                question_lower = question.lower()
-                if any(word in question_lower for word in query_lower.split()):
-                    score += 30
-                
-                # 2. Keyword field matching
-                if keywords:
-                    keywords_lower = keywords.lower()
-                    matching_keywords = sum(1 for word in query_lower.split() if word in keywords_lower)
-                    score += matching_keywords * 20
-                
-                # 3. FAQ ID matching (for specific queries)
-                faq_id_lower = faq_id.lower()
-                if any(word in faq_id_lower for word in query_lower.split()):
-                    score += 25
-                
-                # 4. Sequence similarity
-                similarity = SequenceMatcher(None, query_lower, question_lower).ratio()
-                score += similarity * 15
-                
-                # 5. Subject-specific matching
-                subjects = ['nlp', 'quantum', 'business', 'data mining', 'robotics', 'project']
-                for subject in subjects:
-                    if subject in query_lower and subject in faq_id_lower:
-                        score += 40
-                
-                # 6. Detail level matching
-                detail_keywords = ['module', 'clo', 'syllabus', 'textbook', 'reference', 'detailed', 'complete']
-                if any(keyword in query_lower for keyword in detail_keywords):
-                    if any(keyword in faq_id_lower for keyword in detail_keywords):
-                        score += 35
-                
-                if score > 0:
-                    scored_results.append({
-                        'faq_id': faq_id,
-                        'question': question,
-                        'answer': answer,
-                        'score': score
-                    })
-            
-            # Sort by score and return top results
-            scored_results.sort(key=lambda x: x['score'], reverse=True)
-            return scored_results[:limit]
-            
+            self.faq_index.ensure_fresh()
+            if mode == 'bm25':
+                self.bm25_index.ensure(self.faq_index)
+                return self.bm25_index.search(query, limit)
+            if mode == 'semantic':
+                self.semantic_index.ensure(self.faq_index)
+                return self.semantic_index.search(query, limit)
+            if mode == 'hybrid':
+                self._ensure_indexes()
+                return self.hybrid_retriever.search(query, limit, intent)
+            return self.faq_index.search(query, limit)
         except Exception as e:
             print(f"Enhanced search error: {e}")
             return []
+        finally:
+            _SEARCH_SECONDS.observe(time.perf_counter() - started)
     
-    def fetch_academic_context(self, db: Session, intent: str, entities: Dict, message: str = "") -> str:
-        """Dynamically fetch relevant academic data from database using enhanced search"""
-        context_parts = []
+    def _category_faq_block(self, intent: str):
+        """(faq_id, question, answer) for the intent's category FAQs"""
+        return self.context_cache.get(
+            f"faqs:{intent}", self.faq_index.generation,
+            lambda: [
+                (faq.faq_id, faq.question, faq.answer)
+                for faq in self.faq_index.by_category(intent, 3)
+            ]
+        )
+    
+    def _course_block(self, db: Session):
+        def build():
+            courses = db.query(models.Course).all()
+            if not courses:
+                return []
+            return ["\n**Available Courses:**"] + [
+                f"- {course.course_code}: {course.course_name} "
+                f"({course.credits} credits, Faculty: {course.faculty_theory})"
+                for course in courses
+            ]
+        return self.context_cache.get("courses", data_events.version('courses'), build)
+    
+    def _assignment_block(self, db: Session):
+        def build():
+            assignments = db.query(models.Assignment).order_by(
+                models.Assignment.deadline
+            ).limit(10).all()
+            if not assignments:
+                return []
+            return ["\n**Upcoming Assignments:**"] + [
+                f"- {assignment.title} ({assignment.course_code}) - "
+                f"Due: {assignment.deadline.strftime('%B %d, %Y')}, Marks: {assignment.marks}"
+                for assignment in assignments
+            ]
+        return self.context_cache.get("assignments", data_events.version('assignments'), build)
+    
+    def _semester_course_block(self, db: Session):
+        def build():
+            courses = db.query(models.Course).limit(5).all()
+            if not courses:
+                return []
+            return ["**7th Semester Courses:**"] + [
+                f"- {course.course_code}: {course.course_name}" for course in courses
+            ]
+        return self.context_cache.get("semester_courses", data_events.version('courses'), build)
+    
+    def fetch_context(self, db: Session, intent: str, entities: Dict, message: str = "") -> AcademicContext:
+        """Dynamically fetch relevant academic data from database using enhanced search
+        
+        Only the FAQ search runs per message; the course, assignment and
+        category FAQ blocks come pre-rendered from the context cache. FAQs
+        keep their retrieval scores so the prompt builder can rank them.
+        """
+        context = AcademicContext()
+        db_started = None
         
         try:
-            # Use enhanced search for better results
-            search_results = self.search_database_enhanced(message, limit=3)
+            # Use enhanced search for better results; hybrid retrieval already
+            # fuses the category FAQs in, so it gets the slots of both lookups
+            hybrid = self.retrieval_mode == 'hybrid'
+            if hybrid:
+                search_results = self.search_database_enhanced(message, limit=5, intent=intent)
+            else:
+                search_results = self.search_database_enhanced(message, limit=3)
+            
+            context.hits = search_results
             
             # Use enhanced search results if available
-            if search_results and search_results[0]['score'] > 15:  # Lower threshold for more results
-                context_parts.append("**Relevant Information:**")
+            included = set()
+            threshold = CONTEXT_SCORE_THRESHOLDS[self.retrieval_mode]
+            if search_results and search_results[0]['score'] > threshold:  # Lower threshold for more results
                 for result in search_results:
-                    context_parts.append(f"Q: {result['question']}")
-                    context_parts.append(f"A: {result['answer']}\n")
+                    included.add(result['faq_id'])
+                    context.add_faq("**Relevant Information:**", result['question'], result['answer'],
+                                    result['score'])
             
-            # ALWAYS also try basic category search for comprehensive coverage
-            if intent in ['timetable', 'exam', 'faculty', 'course', 'assignment']:
-                faqs = db.query(models.FAQ).filter(
-                    models.FAQ.category.like(f'%{intent}%')
-                ).limit(3).all()
-                
-                if faqs:
-                    if not context_parts:  # Only add header if no enhanced results
-                        context_parts.append("**Relevant FAQs:**")
-                    for faq in faqs:
-                        # Avoid duplicates
-                        faq_text = f"Q: {faq.question}\nA: {faq.answer}\n"
-                        if faq_text not in "\n".join(context_parts):
-                            context_parts.append(f"Q: {faq.question}")
-                            context_parts.append(f"A: {faq.answer}\n")
+            db_started = time.perf_counter()
             
-            # Fetch course information
+            # ALWAYS also try basic category search for comprehensive coverage;
+            # they rank below every search hit and only get a header of their
+            # own when there were none
+            if not hybrid and intent in CATEGORY_INTENTS:
+                for faq_id, question, answer in self._category_faq_block(intent):
+                    if faq_id not in included:
+                        context.add_faq("**Relevant FAQs:**", question, answer, float('-inf'))
+            
+            # Course information
             if intent == 'course' or entities.get('course'):
-                courses = db.query(models.Course).all()
-                if courses:
-                    context_parts.append("\n**Available Courses:**")
-                    for course in courses:
-                        context_parts.append(
-                            f"- {course.course_code}: {course.course_name} "
-                            f"({course.credits} credits, Faculty: {course.faculty_theory})"
-                        )
+                context.add_block(self._course_block(db))
             
-            # Fetch assignment information
+            # Assignment information
             if intent == 'assignment':
-                assignments = db.query(models.Assignment).order_by(
-                    models.Assignment.deadline
-                ).limit(10).all()
-                
-                if assignments:
-                    context_parts.append("\n**Upcoming Assignments:**")
-                    for assignment in assignments:
-                        deadline_str = assignment.deadline.strftime('%B %d, %Y')
-                        context_parts.append(
-                            f"- {assignment.title} ({assignment.course_code}) - "
-                            f"Due: {deadline_str}, Marks: {assignment.marks}"
-                        )
+                context.add_block(self._assignment_block(db))
             
-            # Fetch all courses for general queries
-            if not context_parts:
-                courses = db.query(models.Course).limit(5).all()
-                if courses:
-                    context_parts.append("**7th Semester Courses:**")
-                    for course in courses:
-                        context_parts.append(
-                            f"- {course.course_code}: {course.course_name}"
-                        )
+            # All courses for general queries
+            if not context:
+                context.add_block(self._semester_course_block(db))
             
         except Exception as e:
             print(f"Error fetching context: {e}")
         
-        return "\n".join(context_parts) if context_parts else "No specific data found."
+        if db_started is not None:
+            _CONTEXT_DB_SECONDS.observe(time.perf_counter() - db_started)
+        return context
+    
+    def fetch_academic_context(self, db: Session, intent: str, entities: Dict, message: str = "") -> str:
+        """The context of fetch_context rendered as one string"""
+        return self.fetch_context(db, intent, entities, message).render()
     
     def classify_intent(self, message: str) -> Tuple[str, float]:
         """Classify user intent"""
-        msg_lower = message.lower()
-        
-        # Intent patterns
-        if any(word in msg_lower for word in ['hello', 'hi', 'hey', 'greetings']):
-            return "greeting", 0.95
-        elif any(word in msg_lower for word in ['bye', 'goodbye', 'thanks', 'thank you']):
-            return "farewell", 0.95
-        elif any(word in msg_lower for word in ['timetable', 'schedule', 'class']):
-            return "timetable", 0.90
-        elif any(word in msg_lower for word in ['faculty', 'teacher', 'professor', 'hod']):
-            return "faculty", 0.90
-        elif any(word in msg_lower for word in ['exam', 'test', 'ia', 'assessment']):
-            return "exam", 0.90
-        elif any(word in msg_lower for word in ['assignment', 'deadline', 'seminar', 'term paper']):
-            return "assignment", 0.90
-        elif any(word in msg_lower for word in ['course', 'subject', 'syllabus']):
-            return "course", 0.90
-        elif any(word in msg_lower for word in ['attendance', 'policy']):
-            return "attendance", 0.90
-        else:
-            return "general", 0.70
+        started = time.perf_counter()
+        try:
+            if self.intent_model is not None:
+                intent, confidence = self.intent_model.predict(message)
+                if confidence >= self.intent_model_min_confidence:
+                    return intent, round(confidence, 4)
+            return self.intent_classifier.classify(message)
+        finally:
+            _CLASSIFY_SECONDS.observe(time.perf_counter() - started)
     
     def extract_entities(self, message: str, intent: str) -> Dict:
         """Extract entities from message"""
-        entities = {}
-        msg_lower = message.lower()
-        
-        # Days
-        days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
-        for day in days:
-            if day in msg_lower:
-                entities['day'] = day
-                break
+        started = time.perf_counter()
+        try:
+            return self.entity_extractor.extract(message)
+        finally:
+            _EXTRACT_SECONDS.observe(time.perf_counter() - started)
+    
+    def _history_turns(self, session_id: str) -> List[Tuple[str, str]]:
+        """Last three exchanges of the session as (user, bot) pairs"""
+        try:
+            return [(turn.user, turn.bot) for turn in self.sessions.get_history(session_id)[-3:]]
+        except Exception as e:
+            # An unreachable session store costs the conversation context,
+            # not the answer
+            self.session_errors += 1
+            print(f"Session store read error ({type(e).__name__}): {e}")
+            return []
+    
+    def build_prompt(self, message: str, context: AcademicContext,
+                     history_turns: List[Tuple[str, str]]) -> str:
+        """Assemble the Gemini prompt from database context and conversation
+        history, trimmed to the prompt token budget"""
+        started = time.perf_counter()
+        try:
+            return self.prompt_builder.build(message, context, history_turns)
+        finally:
+            _PROMPT_BUILD_SECONDS.observe(time.perf_counter() - started)
+    
+    def _begin_turn(self, message: str, intent: str, session_id: str, context: AcademicContext,
+                    entities: Optional[Dict] = None) -> ChatTurn:
+        """Resolve the answer from the caches, or build the prompt for the LLM"""
+        db_context = context.render()
+        turn = ChatTurn(message, intent, session_id, db_context, entities)
+        history_turns = self._history_turns(session_id)
+        turn.history = format_history(history_turns)
         
-        # Courses
-        course_keywords = {
-            'nlp': '22AML71',
-            'natural language': '22AML71',
-            'quantum': '22AML72',
-            'business intelligence': '22AML73',
-            'bi': '22AML73',
-            'data mining': '22AML74A',
-            'dmdw': '22AML74A'
-        }
+        # Identical question, context and history: reuse the earlier answer
+        turn.cache_key = self.response_cache.make_key(message, intent, db_context, turn.history)
+        turn.cached = self.response_cache.get(turn.cache_key)
+        # Near-duplicate question asked against the same context and history
+        turn.context_fingerprint = fingerprint(f"{db_context}\x1f{turn.history}")
+        if turn.cached is None:
+            turn.cached = self.semantic_cache.lookup(message, turn.context_fingerprint, entities)
         
-        for keyword, code in course_keywords.items():
-            if keyword in msg_lower:
-                entities['course'] = code
-                break
+        if turn.cached is not None:
+            self._update_history(session_id, message, turn.cached)
+        else:
+            turn.prompt = self.build_prompt(message, context, history_turns)
+        return turn
+    
+    def _finish_turn(self, turn: ChatTurn, text: Optional[str]) -> str:
+        """Cache and record a generated answer"""
+        if not text:
+            return "⚠️ Unable to generate response. Please try again."
+        bot_response = text.strip()
+        self.response_cache.put(turn.cache_key, bot_response)
+        self.semantic_cache.add(turn.message, turn.context_fingerprint, bot_response, turn.entities)
+        self._update_history(turn.session_id, turn.message, bot_response)
+        return bot_response
+    
+    def _extractive_answer(self, message: str, context: AcademicContext) -> Optional[str]:
+        """The top FAQ's answer when it clearly is the question asked, else None
         
-        return entities
+        Besides the score and margin thresholds, the FAQ's question must share
+        most of its words with the message (Jaccard over content tokens), so
+        a strong hit for a different question still goes to the LLM.
+        """
+        if not self.extractive_enabled or not context.hits:
+            return None
+        min_score, min_margin = EXTRACTIVE_THRESHOLDS[self.retrieval_mode]
+        if self.extractive_min_score is not None:
+            min_score = self.extractive_min_score
+        if self.extractive_min_margin is not None:
+            min_margin = self.extractive_min_margin
+        top = context.hits[0]
+        runner_up = context.hits[1]['score'] if len(context.hits) > 1 else 0.0
+        if top['score'] < min_score or top['score'] <= 0:
+            return None
+        if (top['score'] - runner_up) / top['score'] < min_margin:
+            return None
+        asked, stored = set(tokenize(message)), set(tokenize(top['question']))
+        if not asked or len(asked & stored) / len(asked | stored) < self.extractive_min_overlap:
+            return None
+        return self.extractive_template.format(answer=top['answer'].strip(), question=top['question'])
+    
+    def _fallback_answer(self, session_id: str, message: str, context: AcademicContext) -> str:
+        """FAQ-only answer for when the LLM call failed: the best search hit
+        if it cleared the context threshold, else a try-again notice"""
+        hits = context.hits
+        if hits and hits[0]['score'] > CONTEXT_SCORE_THRESHOLDS[self.retrieval_mode]:
+            text = FALLBACK_FAQ_TEMPLATE.format(question=hits[0]['question'], answer=hits[0]['answer'].strip())
+        else:
+            text = FALLBACK_MESSAGE
+        self._update_history(session_id, message, text)
+        return text
+    
+    def _observe(self, source: str, started: float) -> str:
+        """Record the turn's latency under its answer source"""
+        self.path_latency[source].observe(time.perf_counter() - started)
+        return source
     
     def generate_response(self, message: str, intent: str, entities: Dict, session_id: str, db: Session = None) -> str:
         """Generate response using ONLY Gemini AI with database context"""
+        return self.generate_answer(message, intent, entities, session_id, db)[0]
+    
+    def generate_answer(self, message: str, intent: str, entities: Dict, session_id: str,
+                        db: Session = None) -> Tuple[str, str]:
+        """generate_response, returning (answer, source) where source is one of ANSWER_SOURCES"""
+        started = time.perf_counter()
         
         # Get database session if not provided
         if db is None:
@@ -245,79 +470,152 @@ class DynamicChatbotService:
         
         try:
             # Fetch relevant data from database
-            db_context = self.fetch_academic_context(db, intent, entities, message)
+            context = self.fetch_context(db, intent, entities, message)
             
-            # Check if Gemini is available
-            if not self.gemini_available or not self.client:
-                return "⚠️ AI service is currently unavailable. Please ensure GEMINI_API_KEY is configured correctly."
+            # A dominant FAQ hit is answered verbatim, without the LLM
+            text = self._extractive_answer(message, context)
+            if text is not None:
+                self._update_history(session_id, message, text)
+                return text, self._observe('extractive', started)
             
-            # If no relevant database context found, let Gemini use its knowledge as last resort
-            use_gemini_knowledge = len(db_context.strip()) < 50 or "No specific data found" in db_context
+            # Check if Gemini is available
+            if not self.llm.available:
+                return UNAVAILABLE_MESSAGE, self._observe('unavailable', started)
             
             # Use Gemini AI for ALL responses (including greetings)
             try:
-                history = self.conversation_history.get(session_id, [])
-                context_messages = "\n".join([
-                    f"User: {h['user']}\nBot: {h['bot']}" 
-                    for h in history[-3:]
-                ])
+                turn = self._begin_turn(message, intent, session_id, context, entities)
+                if turn.cached is not None:
+                    return turn.cached, self._observe('cached', started)
                 
-                if use_gemini_knowledge:
-                    prompt = f"""You are an AI assistant for Global Academy of Technology, Department of AI & ML, 7th Semester.
-
-**Context:** The specific information requested is not available in the current database, but you can provide general academic guidance.
-
-**Previous Conversation:**
-{context_messages if context_messages else "No previous conversation"}
-
-**Student Question:** "{message}"
-
-**Instructions:**
-- The database doesn't have specific details for this query
-- Provide helpful general information based on your knowledge of academic institutions
-- Be honest that specific details aren't available in the database
-- Suggest contacting the department office for specific information
-- Keep responses helpful and professional
-- For faculty questions, mention common academic roles and suggest contacting the department
-
-**Response:**"""
-                else:
-                    prompt = f"""You are an AI assistant for Global Academy of Technology, Department of AI & ML, 7th Semester.
-
-**Database Information:**
-{db_context}
-
-**Previous Conversation:**
-{context_messages if context_messages else "No previous conversation"}
-
-**Student Question:** "{message}"
-
-**Instructions:**
-- You MUST use the database information provided above to answer questions
-- Provide specific details from the database (course codes, faculty names, dates, deadlines, etc.)
-- Be helpful, friendly, and professional
-- Format responses with bullet points or lists when showing multiple items
-- Keep responses concise but informative (2-5 sentences for simple queries, more for complex ones)
-
-**Response:**"""
+                # Students asking the same thing at once share one Gemini call
+                text = self.llm_flights.do(fingerprint(turn.prompt), lambda: self._call_llm(turn.prompt))
+                return self._finish_turn(turn, text), self._observe('generated', started)
+                    
+            except Exception as e:
+                print(f"LLM error ({type(e).__name__}): {e}")
+                return self._fallback_answer(session_id, message, context), self._observe('fallback', started)
+            
+        finally:
+            if db:
+                db.close()
+    
+    async def agenerate_response(self, message: str, intent: str, entities: Dict, session_id: str,
+                                 db: Session = None) -> str:
+        """Async generate_response: DB work runs on the bounded pool and Gemini
+        is awaited, so the event loop never blocks on either"""
+        return (await self.agenerate_answer(message, intent, entities, session_id, db))[0]
+    
+    async def agenerate_answer(self, message: str, intent: str, entities: Dict, session_id: str,
+                               db: Session = None) -> Tuple[str, str]:
+        """Async generate_answer"""
+        started = time.perf_counter()
+        if db is None:
+            db = self.get_db()
+        
+        try:
+            context = await run_blocking(self.fetch_context, db, intent, entities, message)
+            
+            text = self._extractive_answer(message, context)
+            if text is not None:
+                await run_blocking(self._update_history, session_id, message, text)
+                return text, self._observe('extractive', started)
+            
+            if not self.llm.available:
+                return UNAVAILABLE_MESSAGE, self._observe('unavailable', started)
+            
+            try:
+                # History may be rehydrated from the database, so off the loop too
+                turn = await run_blocking(self._begin_turn, message, intent, session_id, context, entities)
+                if turn.cached is not None:
+                    return turn.cached, self._observe('cached', started)
                 
-                response = self.client.models.generate_content(
-                    model='gemini-2.5-flash',
-                    contents=prompt
-                )
+                text = await self.llm_flights.ado(fingerprint(turn.prompt), lambda: self._acall_llm(turn.prompt))
+                return self._finish_turn(turn, text), self._observe('generated', started)
+            
+            except Exception as e:
+                print(f"LLM error ({type(e).__name__}): {e}")
+                text = await run_blocking(self._fallback_answer, session_id, message, context)
+                return text, self._observe('fallback', started)
+        
+        finally:
+            if db:
+                db.close()
+    
+    
+    def _call_llm(self, prompt: str) -> Optional[str]:
+        """One LLM call; the answer text, or None for an empty response"""
+        self.llm_calls += 1
+        started = time.perf_counter()
+        try:
+            return self.llm.generate(prompt)
+        finally:
+            _LLM_SECONDS.observe(time.perf_counter() - started)
+    
+    async def _acall_llm(self, prompt: str) -> Optional[str]:
+        self.llm_calls += 1
+        started = time.perf_counter()
+        try:
+            return await self.llm.agenerate(prompt)
+        finally:
+            _LLM_SECONDS.observe(time.perf_counter() - started)
+    
+    async def astream_response(self, message: str, intent: str, entities: Dict, session_id: str,
+                               db: Session = None, meta: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Streaming agenerate_response: yields answer text as Gemini produces it
+        and records the turn in the caches and history once the stream ends
+        
+        meta, when given, receives the answer's "source" before the last chunk.
+        """
+        started = time.perf_counter()
+        meta = {} if meta is None else meta
+        if db is None:
+            db = self.get_db()
+        
+        try:
+            context = await run_blocking(self.fetch_context, db, intent, entities, message)
+            
+            text = self._extractive_answer(message, context)
+            if text is not None:
+                await run_blocking(self._update_history, session_id, message, text)
+                meta['source'] = self._observe('extractive', started)
+                yield text
+                return
+            
+            if not self.llm.available:
+                meta['source'] = self._observe('unavailable', started)
+                yield UNAVAILABLE_MESSAGE
+                return
+            
+            parts = []
+            try:
+                turn = await run_blocking(self._begin_turn, message, intent, session_id, context, entities)
+                if turn.cached is not None:
+                    meta['source'] = self._observe('cached', started)
+                    yield turn.cached
+                    return
                 
-                if response and response.text:
-                    bot_response = response.text.strip()
-                    self._update_history(session_id, message, bot_response)
-                    return bot_response
+                self.llm_calls += 1
+                llm_started = time.perf_counter()
+                try:
+                    async for text in self.llm.astream(turn.prompt):
+                        parts.append(text)
+                        yield text
+                finally:
+                    _LLM_SECONDS.observe(time.perf_counter() - llm_started)
+                meta['source'] = self._observe('generated', started)
+                if not parts:
+                    yield self._finish_turn(turn, None)
                 else:
-                    return "⚠️ Unable to generate response. Please try again."
-                    
-            except Exception as e:
-                error_msg = f"⚠️ Error communicating with AI service: {str(e)}"
-                print(f"Gemini error: {e}")
-                return error_msg
+                    self._finish_turn(turn, "".join(parts))
             
+            except Exception as e:
+                print(f"LLM error ({type(e).__name__}): {e}")
+                text = await run_blocking(self._fallback_answer, session_id, message, context)
+                meta['source'] = self._observe('fallback', started)
+                # Chunks already streamed stay; the notice follows them
+                yield ("\n\n" if parts else "") + text
+        
         finally:
             if db:
                 db.close()
@@ -325,23 +623,35 @@ class DynamicChatbotService:
     
     def _update_history(self, session_id: str, user_msg: str, bot_msg: str):
         """Update conversation history"""
-        if session_id not in self.conversation_history:
-            self.conversation_history[session_id] = []
-        
-        self.conversation_history[session_id].append({
-            'user': user_msg,
-            'bot': bot_msg,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # Keep only last 10 exchanges
-        if len(self.conversation_history[session_id]) > 10:
-            self.conversation_history[session_id] = self.conversation_history[session_id][-10:]
+        try:
+            self.sessions.append(session_id, user_msg, bot_msg)
+        except Exception as e:
+            self.session_errors += 1
+            print(f"Session store write error ({type(e).__name__}): {e}")
+    
+    def stats(self) -> Dict:
+        """Cache counters for sizing and monitoring"""
+        return {
+            "response_cache": self.response_cache.stats(),
+            "semantic_cache": self.semantic_cache.stats(),
+            "context_cache": self.context_cache.stats(),
+            "last_prompt": self.prompt_builder.last_stats.as_dict() if self.prompt_builder.last_stats else None,
+            "llm_calls": self.llm_calls,
+            "llm_calls_saved": self.response_cache.hits + self.semantic_cache.hits + self.llm_flights.shared,
+            "llm_flights": self.llm_flights.stats(),
+            "llm": self.llm.describe(),
+            "answer_paths": {source: hist.stats() for source, hist in self.path_latency.items()},
+            "hybrid_retrieval": self._hybrid_retriever.stats() if self._hybrid_retriever else None,
+            "sessions": {**self.sessions.stats(), "errors": self.session_errors},
+        }
+    
+    def shutdown(self):
+        """Flush write-behind state before the worker exits"""
+        self.sessions.close()
     
     def clear_session(self, session_id: str):
         """Clear conversation history"""
-        if session_id in self.conversation_history:
-            del self.conversation_history[session_id]
+        self.sessions.clear(session_id)
 
 # Singleton instance
 dynamic_chatbot_service = DynamicChatbotService()
@@ -0,0 +1,19 @@
+"""
+Bounded thread pool for blocking work called from async endpoints
+SQLAlchemy sessions and the sync Gemini SDK block; running them here keeps
+the event loop free, and the pool size caps how many run at once per worker
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import os
+
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+
+blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable on the bounded pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_pool, partial(func, *args, **kwargs))
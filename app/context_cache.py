@@ -0,0 +1,65 @@
+"""
+Pre-rendered prompt context blocks
+The course list, upcoming assignments and per-intent category FAQs are the
+same for every chat turn until the underlying rows change, so each block is
+rendered once and reused while its data version is unchanged. A TTL bounds
+staleness for writes made by other processes, which bump no version here
+"""
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import os
+import threading
+import time
+
+# Rendered block: context lines ready to be joined into the prompt, or for
+# FAQ blocks (faq_id, question, answer) entries so callers can
+# dedupe by ID
+Block = Tuple
+
+
+class _Snapshot:
+    __slots__ = ('block', 'version', 'expires')
+
+    def __init__(self, block: Block, version: Hashable, expires: float):
+        self.block = block
+        self.version = version
+        self.expires = expires
+
+
+class ContextSnapshotCache:
+    """Rendered context blocks keyed by name, rebuilt when their version changes"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("CONTEXT_CACHE_TTL_SECONDS", "300")
+        )
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, name: str, version: Hashable, build: Callable[[], Block]) -> Block:
+        """Cached block, rebuilt if its version moved or the TTL passed"""
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None and snapshot.version == version and snapshot.expires > time.monotonic():
+            self.hits += 1
+            return snapshot.block
+        # Concurrent misses may both build; the last one wins, which is harmless
+        block = tuple(build())
+        with self._lock:
+            self._snapshots[name] = _Snapshot(block, version, time.monotonic() + self.ttl_seconds)
+            self.builds += 1
+        return block
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.builds
+        return {
+            "blocks": len(self._snapshots),
+            "hits": self.hits,
+            "builds": self.builds,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -0,0 +1,71 @@
+"""
+Data change tracking for in-process caches
+Bumps a per-table version counter whenever a committed ORM session touched
+FAQs, courses or assignments, so indexes and caches know when to refresh
+"""
+from typing import Callable, Dict, List
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import models
+
+TRACKED_TABLES = {
+    models.FAQ.__tablename__,
+    models.Course.__tablename__,
+    models.Assignment.__tablename__,
+}
+
+_versions: Dict[str, int] = {table: 0 for table in TRACKED_TABLES}
+_listeners: List[Callable[[str], None]] = []
+_lock = threading.Lock()
+
+
+def version(table: str) -> int:
+    """Current version of a tracked table"""
+    return _versions.get(table, 0)
+
+
+def versions() -> Dict[str, int]:
+    """Snapshot of all table versions"""
+    return dict(_versions)
+
+
+def bump(table: str):
+    """Mark a table as changed and notify subscribers"""
+    with _lock:
+        _versions[table] = _versions.get(table, 0) + 1
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback(table)
+        except Exception as e:
+            print(f"Data change listener error: {e}")
+
+
+def subscribe(callback: Callable[[str], None]):
+    """Register a callback invoked with the table name after each change"""
+    with _lock:
+        _listeners.append(callback)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_tables(session, flush_context):
+    changed = session.info.setdefault("changed_tables", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table in TRACKED_TABLES:
+            changed.add(table)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_changed_tables(session):
+    changed = session.info.pop("changed_tables", None)
+    for table in changed or ():
+        bump(table)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tables(session):
+    session.info.pop("changed_tables", None)
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -6,13 +6,82 @@ import os
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./academic_chatbot.db")
 print(f"Using database: {DATABASE_URL}")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+# PRAGMAs applied to every new SQLite connection, per SQLITE_PROFILE.
+# "tuned" lets readers run alongside the chat_history writer (WAL), fsyncs
+# only at checkpoints (synchronous=NORMAL is durable in WAL mode except on
+# power loss), and waits for a busy writer instead of failing with
+# "database is locked"
+SQLITE_PROFILES = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024))),
+        # Negative values are KiB
+        "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "65536")),
+        "temp_store": "MEMORY",
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    },
+}
+
+
+def apply_sqlite_profile(sqlite_engine, profile: str):
+    """Run the profile's PRAGMAs on each connection the engine opens"""
+    if profile not in SQLITE_PROFILES:
+        print(f"Warning: unknown SQLITE_PROFILE '{profile}', using default")
+        profile = "default"
+    pragmas = SQLITE_PROFILES[profile]
+    if not pragmas:
+        return
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def create_sqlite_engine(url: str, profile: str = "default"):
+    sqlite_engine = create_engine(url, connect_args={"check_same_thread": False})
+    apply_sqlite_profile(sqlite_engine, profile)
+    return sqlite_engine
+
+
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default").lower()
+
+if "sqlite" in DATABASE_URL:
+    engine = create_sqlite_engine(DATABASE_URL, SQLITE_PROFILE)
+else:
+    engine = create_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _create_read_engine():
+    """Pooled engine for read-only bulk loads (FAQ and course indexes)
+
+    On SQLite its connections refuse writes and memory-map the database file,
+    so index rebuilds read pages straight from the OS page cache. Other
+    databases share the main engine.
+    """
+    if "sqlite" not in DATABASE_URL:
+        return engine
+    read_engine = create_sqlite_engine(DATABASE_URL, SQLITE_PROFILE)
+    mmap_bytes = int(os.getenv("SQLITE_READ_MMAP_BYTES", str(64 * 1024 * 1024)))
+
+    @event.listens_for(read_engine, "connect")
+    def _read_only_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only = ON")
+        cursor.execute(f"PRAGMA mmap_size = {mmap_bytes}")
+        cursor.close()
+
+    return read_engine
+
+
+read_engine = _create_read_engine()
+
 Base = declarative_base()
 
 def get_db():
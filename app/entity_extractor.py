@@ -0,0 +1,351 @@
+"""
+Gazetteer-based entity extraction
+Course codes, names, initials and faculty names come from the courses table
+and are loaded into a token trie together with days and assessment names.
+A message is tokenized once and matched leftmost-longest against the trie, so
+matches always fall on word boundaries ("bi" no longer fires on "ability")
+and every entity in the message is found in one pass. Dates and date ranges
+are picked up by a single regex
+"""
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import os
+import re
+import threading
+import time
+
+from . import data_events
+from .concurrency import blocking_pool
+from .text_processing import STOPWORDS
+
+# Row layout returned by the loader: (course_code, course_name, faculty_theory, faculty_lab)
+CourseRow = Tuple[str, str, Optional[str], Optional[str]]
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Phrase -> canonical assessment name. "see" is also an English verb, so it
+# only counts when written in capitals (see CASE_SENSITIVE_PHRASES)
+ASSESSMENTS = {
+    'ia1': 'IA1', 'ia 1': 'IA1', 'internal assessment 1': 'IA1',
+    'ia2': 'IA2', 'ia 2': 'IA2', 'internal assessment 2': 'IA2',
+    'ia3': 'IA3', 'ia 3': 'IA3', 'internal assessment 3': 'IA3',
+    'see': 'SEE', 'semester end exam': 'SEE', 'semester end examination': 'SEE',
+    'cie': 'CIE', 'continuous internal evaluation': 'CIE',
+    'lab exam': 'Lab Exam', 'lab exams': 'Lab Exam',
+}
+CASE_SENSITIVE_PHRASES = {'see': 'SEE'}
+
+# Words too generic to identify a course on their own or as part of its initials
+NAME_STOPWORDS = {'and', 'of', 'the', 'in', 'for', 'to', 'with', 'ii', 'i', 'iii', 'phase'}
+GENERIC_WORDS = {'data', 'major', 'minor', 'open', 'advanced', 'applied', 'introduction', 'business', 'lab'}
+FACULTY_TITLES = {'prof', 'dr', 'mr', 'mrs', 'ms'}
+
+_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+_MONTH = (r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?")
+_DAY = r"(?:[12]\d|3[01]|0?[1-9])(?:st|nd|rd|th)?"
+_YEAR = r"(?:19|20)\d{2}"
+_RANGE_SEP = r"\s*(?:-|–|to|until|till|through)\s*"
+_DATE = (rf"(?:{_MONTH}\s+{_DAY}(?:,?\s+{_YEAR})?"
+         rf"|{_DAY}\s+(?:of\s+)?{_MONTH}(?:,?\s+{_YEAR})?"
+         rf"|{_YEAR}-\d{{1,2}}-\d{{1,2}}"
+         rf"|\d{{1,2}}/\d{{1,2}}/{_YEAR})")
+DATE_PATTERN = re.compile(
+    rf"\b(?:"
+    # Oct 6-8, 2025
+    rf"(?P<m1>{_MONTH})\s+(?P<d1>{_DAY}){_RANGE_SEP}(?P<d2>{_DAY})(?:,?\s+(?P<y1>{_YEAR}))?"
+    # 6-8 Oct 2025
+    rf"|(?P<d3>{_DAY}){_RANGE_SEP}(?P<d4>{_DAY})\s+(?:of\s+)?(?P<m2>{_MONTH})(?:,?\s+(?P<y2>{_YEAR}))?"
+    # Nov 20 to Nov 22, or a single date
+    rf"|(?P<start>{_DATE})(?:{_RANGE_SEP}(?P<end>{_DATE}))?"
+    rf")\b",
+    re.IGNORECASE
+)
+_DATE_PARTS = re.compile(
+    rf"^(?:(?P<m1>{_MONTH})\s+(?P<d1>{_DAY})(?:,?\s+(?P<y1>{_YEAR}))?"
+    rf"|(?P<d2>{_DAY})\s+(?:of\s+)?(?P<m2>{_MONTH})(?:,?\s+(?P<y2>{_YEAR}))?"
+    rf"|(?P<iy>{_YEAR})-(?P<im>\d{{1,2}})-(?P<id>\d{{1,2}})"
+    rf"|(?P<sd>\d{{1,2}})/(?P<sm>\d{{1,2}})/(?P<sy>{_YEAR}))$",
+    re.IGNORECASE
+)
+
+
+def _month(text: str) -> int:
+    return _MONTHS[text.lower().rstrip('.')[:3]]
+
+
+def _day(text: str) -> int:
+    return int(re.match(r"\d+", text).group())
+
+
+def _iso(year: int, month: int, day: int) -> Optional[str]:
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def _parse_date(text: str, default_year: int) -> Optional[str]:
+    m = _DATE_PARTS.match(text.strip())
+    if m is None:
+        return None
+    if m.group('m1'):
+        return _iso(int(m.group('y1') or default_year), _month(m.group('m1')), _day(m.group('d1')))
+    if m.group('m2'):
+        return _iso(int(m.group('y2') or default_year), _month(m.group('m2')), _day(m.group('d2')))
+    if m.group('iy'):
+        return _iso(int(m.group('iy')), int(m.group('im')), int(m.group('id')))
+    # dd/mm/yyyy, the local convention
+    return _iso(int(m.group('sy')), int(m.group('sm')), int(m.group('sd')))
+
+
+def extract_dates(message: str, default_year: Optional[int] = None) -> List[Dict]:
+    """Dates and date ranges as {"text", "start", "end"} with ISO dates"""
+    year = default_year or date.today().year
+    found = []
+    for m in DATE_PATTERN.finditer(message):
+        if m.group('m1'):
+            month, y = _month(m.group('m1')), int(m.group('y1') or year)
+            start, end = _iso(y, month, _day(m.group('d1'))), _iso(y, month, _day(m.group('d2')))
+        elif m.group('m2'):
+            month, y = _month(m.group('m2')), int(m.group('y2') or year)
+            start, end = _iso(y, month, _day(m.group('d3'))), _iso(y, month, _day(m.group('d4')))
+        else:
+            start = _parse_date(m.group('start'), year)
+            end = _parse_date(m.group('end'), year) if m.group('end') else start
+        if start is None or end is None:
+            continue
+        found.append({'text': m.group().strip(), 'start': start, 'end': end})
+    return found
+
+
+def _words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+class _Node:
+    __slots__ = ('children', 'value')
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # (entity type, canonical value)
+        self.value: Optional[Tuple[str, str]] = None
+
+
+class Gazetteer:
+    """Token trie mapping phrases to (entity type, canonical value)"""
+
+    def __init__(self):
+        self.root = _Node()
+        self.size = 0
+
+    def add(self, phrase: str, entity_type: str, value: str):
+        """Register a phrase; the first registration of a phrase wins"""
+        words = _words(phrase)
+        if not words:
+            return
+        node = self.root
+        for word in words:
+            node = node.children.setdefault(word, _Node())
+        if node.value is None:
+            node.value = (entity_type, value)
+            self.size += 1
+
+    def scan(self, message: str) -> List[Tuple[str, str, str]]:
+        """Leftmost-longest matches as (entity type, value, matched text)"""
+        spans = [(m.group(), m.start(), m.end()) for m in WORD_PATTERN.finditer(message.lower())]
+        matches = []
+        i = 0
+        while i < len(spans):
+            node, best, best_end = self.root, None, i
+            for j in range(i, len(spans)):
+                node = node.children.get(spans[j][0])
+                if node is None:
+                    break
+                if node.value is not None:
+                    best, best_end = node.value, j + 1
+            if best is None:
+                i += 1
+                continue
+            text = message[spans[i][1]:spans[best_end - 1][2]]
+            required = CASE_SENSITIVE_PHRASES.get(text.lower())
+            if required is None or text == required:
+                matches.append((best[0], best[1], text))
+            i = best_end
+        return matches
+
+
+def _initials(words: List[str]) -> str:
+    return "".join(w[0] for w in words if w not in NAME_STOPWORDS and not w.isdigit())
+
+
+def _faculty_names(field: Optional[str]) -> List[str]:
+    if not field or field.strip().upper() in ('TBD', 'NA', 'N/A'):
+        return []
+    return [name.strip() for name in field.split(',') if name.strip()]
+
+
+def build_gazetteer(courses: Iterable[CourseRow]) -> Gazetteer:
+    """Gazetteer for the given courses plus the static vocabularies
+
+    Phrases are registered from most to least specific across all courses,
+    so an exact name beats another course's shortened name or initials.
+    """
+    courses = list(courses)
+    gazetteer = Gazetteer()
+    names = [(code, re.sub(r"\(.*?\)", " ", name or "")) for code, name, _, _ in courses]
+
+    for code, _, _, _ in courses:
+        gazetteer.add(code, 'course', code)
+    for code, name, _, _ in courses:
+        gazetteer.add(name or "", 'course', code)
+    for code, short_name in names:
+        gazetteer.add(short_name, 'course', code)
+        # "Data Mining & Data Warehousing" is also asked about as either half
+        for part in re.split(r"&|\band\b", short_name):
+            if len(_words(part)) > 1:
+                gazetteer.add(part, 'course', code)
+    for code, short_name in names:
+        words = _words(short_name)
+        if len(words) > 2:
+            gazetteer.add(" ".join(words[:2]), 'course', code)
+        initials = _initials(words)
+        # "am" (Addictive Manufacturing) would fire on "I am"
+        if len(initials) > 1 and initials not in STOPWORDS:
+            gazetteer.add(initials, 'course', code)
+
+    # A distinctive first word ("quantum") identifies a course on its own
+    first_words: Dict[str, List[str]] = {}
+    for code, short_name in names:
+        words = _words(short_name)
+        if words:
+            first_words.setdefault(words[0], []).append(code)
+    for word, codes in first_words.items():
+        if len(codes) == 1 and len(word) > 4 and word not in GENERIC_WORDS:
+            gazetteer.add(word, 'course', codes[0])
+
+    faculty = []
+    for _, _, theory, lab in courses:
+        for name in _faculty_names(theory) + _faculty_names(lab):
+            if name not in faculty:
+                faculty.append(name)
+    for name in faculty:
+        words = [w for w in _words(name) if w not in FACULTY_TITLES]
+        if not words:
+            continue
+        gazetteer.add(name, 'faculty', name)
+        gazetteer.add(" ".join(words), 'faculty', name)
+        # "Roopa BS" is also written "Roopa B S"
+        spelled = [" ".join(w) if len(w) <= 3 and w.isalpha() and w != words[0] else w for w in words]
+        gazetteer.add(" ".join(spelled), 'faculty', name)
+        if len(words[0]) > 2:
+            gazetteer.add(words[0], 'faculty', name)
+
+    for day in DAYS:
+        gazetteer.add(day, 'day', day)
+    for phrase, value in ASSESSMENTS.items():
+        gazetteer.add(phrase, 'assessment', value)
+    return gazetteer
+
+
+class EntityExtractor:
+    """Extracts courses, faculty, days, assessments and dates from a message
+
+    The gazetteer is rebuilt when the courses table changes in-process or
+    after ENTITY_REFRESH_SECONDS for changes made by other processes. Only
+    the first build runs on the caller; refreshes run on the blocking pool
+    while extract keeps using the current gazetteer, which is swapped in
+    whole once the new one is ready, so extract never waits on the database.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[CourseRow]], refresh_interval: Optional[float] = None):
+        self.loader = loader
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(
+            os.getenv("ENTITY_REFRESH_SECONDS", "300")
+        )
+        self.gazetteer = build_gazetteer([])
+        self._lock = threading.Lock()
+        self._built = False
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._refreshing = False
+        data_events.subscribe(self._on_data_change)
+
+    def build(self):
+        version = data_events.version('courses')
+        gazetteer = build_gazetteer(self.loader())
+        with self._lock:
+            self.gazetteer = gazetteer
+            self._built = True
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+
+    def _on_data_change(self, table: str):
+        if table == 'courses' and self._built:
+            self.refresh_in_background()
+
+    def refresh_in_background(self):
+        """Start a rebuild on the blocking pool unless one is already running"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            blocking_pool.submit(self._refresh)
+        except RuntimeError:
+            # Pool shut down at exit
+            self._refreshing = False
+
+    def _refresh(self):
+        try:
+            self._rebuild()
+        finally:
+            self._refreshing = False
+
+    def _rebuild(self):
+        try:
+            self.build()
+        except Exception as e:
+            # Keep serving the previous gazetteer until the next refresh
+            print(f"Entity gazetteer build error: {e}")
+            self._built = True
+            self._loaded_version = data_events.version('courses')
+            self._loaded_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if not self._built:
+            # Nothing to serve yet; warm_up builds it at startup
+            self._rebuild()
+        elif (self._loaded_version != data_events.version('courses')
+                or time.monotonic() - self._loaded_at > self.refresh_interval):
+            self.refresh_in_background()
+
+    def extract(self, message: str) -> Dict:
+        """JSON-serializable entities; "course" and "day" keep the first match"""
+        self.ensure_fresh()
+        grouped: Dict[str, List[str]] = {}
+        for entity_type, value, _ in self.gazetteer.scan(message):
+            values = grouped.setdefault(entity_type, [])
+            if value not in values:
+                values.append(value)
+
+        entities: Dict = {}
+        if 'day' in grouped:
+            entities['day'] = grouped['day'][0]
+            entities['days'] = grouped['day']
+        if 'course' in grouped:
+            entities['course'] = grouped['course'][0]
+            entities['courses'] = grouped['course']
+        if 'faculty' in grouped:
+            entities['faculty'] = grouped['faculty']
+        if 'assessment' in grouped:
+            entities['assessments'] = grouped['assessment']
+        dates = extract_dates(message)
+        if dates:
+            entities['dates'] = dates
+        return entities
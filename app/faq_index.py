@@ -0,0 +1,342 @@
+"""
+In-memory inverted index over the FAQ table
+Built once at startup and refreshed incrementally on the blocking pool, so a
+chat turn only scores FAQs that share a token with the query instead of
+re-reading the whole table, and never waits for a reload
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import os
+import threading
+import time
+
+from . import data_events
+from .concurrency import blocking_pool
+from .text_processing import QueryTerms
+from .fuzzy_match import FuzzyMatcher, trigram_signature
+
+SUBJECT_TERMS = ['nlp', 'quantum', 'business', 'data mining', 'robotics', 'project']
+DETAIL_TERMS = ['module', 'clo', 'syllabus', 'textbook', 'reference', 'detailed', 'complete']
+
+# Row layout returned by the loader: (faq_id, question, answer, keywords, category)
+FAQRow = Tuple[str, str, str, Optional[str], Optional[str]]
+
+# Vocabulary tokens are indexed by every substring up to this length, so a
+# short query word is one lookup and a longer one intersects its n-grams
+GRAM_SIZE = 3
+
+
+def token_grams(token: str) -> Set[str]:
+    """All substrings of the token of length 1..GRAM_SIZE"""
+    return {
+        token[i:i + n]
+        for n in range(1, GRAM_SIZE + 1)
+        for i in range(len(token) - n + 1)
+    }
+
+
+class FAQRecord:
+    """A single FAQ with its lowercased search fields precomputed"""
+    __slots__ = (
+        'faq_id', 'question', 'answer', 'keywords', 'category', 'order',
+        'question_lower', 'keywords_lower', 'faq_id_lower', 'category_lower',
+        'tokens', 'subjects', 'has_detail', 'trigrams',
+    )
+
+    def __init__(self, row: FAQRow, order: int):
+        faq_id, question, answer, keywords, category = row
+        self.faq_id = faq_id
+        self.question = question
+        self.answer = answer
+        self.keywords = keywords
+        self.category = category
+        self.order = order
+
+        self.question_lower = question.lower()
+        self.keywords_lower = keywords.lower() if keywords else ''
+        self.faq_id_lower = faq_id.lower()
+        self.category_lower = category.lower() if category else ''
+
+        # Whitespace tokens: a query word (which never contains whitespace) is a
+        # substring of a field exactly when it is a substring of one of these
+        self.tokens = set(self.question_lower.split())
+        self.tokens.update(self.keywords_lower.split())
+        self.tokens.update(self.faq_id_lower.split())
+
+        self.subjects = {s for s in SUBJECT_TERMS if s in self.faq_id_lower}
+        self.has_detail = any(k in self.faq_id_lower for k in DETAIL_TERMS)
+        self.trigrams = trigram_signature(self.question_lower)
+
+    def as_row(self) -> FAQRow:
+        return (self.faq_id, self.question, self.answer, self.keywords, self.category)
+
+
+class FAQIndex:
+    """Token -> FAQ postings with the legacy heuristic scorer applied to candidates only"""
+
+    def __init__(self, loader: Callable[[], Iterable[FAQRow]], refresh_interval: Optional[float] = None,
+                 fuzzy: Optional[FuzzyMatcher] = None):
+        self.loader = loader
+        self.fuzzy = fuzzy or FuzzyMatcher()
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(
+            os.getenv("FAQ_INDEX_REFRESH_SECONDS", "60")
+        )
+        self.records: Dict[str, FAQRecord] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        # n-gram -> vocabulary tokens containing it, for substring lookups
+        self.grams: Dict[str, Set[str]] = {}
+        self.subject_postings: Dict[str, Set[str]] = {s: set() for s in SUBJECT_TERMS}
+        self.detail_postings: Set[str] = set()
+
+        self._match_cache: Dict[str, Tuple[str, ...]] = {}
+        self._next_order = 0
+        self.generation = 0
+        self._lock = threading.RLock()
+        self._built = False
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._refreshing = False
+        data_events.subscribe(self._on_data_change)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # ------------------------------------------------------------------
+    # Building and incremental maintenance
+    # ------------------------------------------------------------------
+
+    def build(self):
+        """(Re)load all FAQs from the loader and apply the differences"""
+        version = data_events.version('faqs')
+        rows = list(self.loader())
+        self.sync(rows)
+        self._loaded_version = version
+        self._loaded_at = time.monotonic()
+        self._built = True
+
+    def _on_data_change(self, table: str):
+        if table == 'faqs' and self._built:
+            self.refresh_in_background()
+
+    def refresh_in_background(self):
+        """Start a reload on the blocking pool unless one is already running"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            blocking_pool.submit(self._refresh)
+        except RuntimeError:
+            # Pool shut down at exit
+            self._refreshing = False
+
+    def _refresh(self):
+        try:
+            self._rebuild()
+        finally:
+            self._refreshing = False
+
+    def _rebuild(self):
+        try:
+            self.build()
+        except Exception as e:
+            # Keep serving the previous index until the next refresh
+            print(f"FAQ index build error: {e}")
+            self._built = True
+            self._loaded_version = data_events.version('faqs')
+            self._loaded_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Reload if FAQs were written in-process or the refresh interval elapsed
+
+        Only the very first build runs inline; later reloads happen on the
+        blocking pool while queries keep using the current index
+        """
+        if not self._built:
+            self._rebuild()
+        elif (self._loaded_version != data_events.version('faqs')
+                or time.monotonic() - self._loaded_at > self.refresh_interval):
+            self.refresh_in_background()
+
+    def sync(self, rows: Iterable[FAQRow]):
+        """Upsert changed rows and drop FAQs that no longer exist"""
+        with self._lock:
+            seen = set()
+            for row in rows:
+                seen.add(row[0])
+                existing = self.records.get(row[0])
+                if existing is None or existing.as_row() != tuple(row):
+                    self.upsert(row)
+            for faq_id in [f for f in self.records if f not in seen]:
+                self.remove(faq_id)
+
+    def upsert(self, row: FAQRow):
+        """Add a new FAQ or replace the stored version of an existing one"""
+        with self._lock:
+            existing = self.records.get(row[0])
+            if existing is not None:
+                order = existing.order
+                self._unlink(existing)
+            else:
+                order = self._next_order
+                self._next_order += 1
+
+            record = FAQRecord(tuple(row), order)
+            self.records[record.faq_id] = record
+            self.generation += 1
+            for token in record.tokens:
+                if token not in self.postings:
+                    self._match_cache.clear()
+                    self.postings[token] = set()
+                    for gram in token_grams(token):
+                        self.grams.setdefault(gram, set()).add(token)
+                self.postings[token].add(record.faq_id)
+            for subject in record.subjects:
+                self.subject_postings[subject].add(record.faq_id)
+            if record.has_detail:
+                self.detail_postings.add(record.faq_id)
+
+    def remove(self, faq_id: str):
+        with self._lock:
+            record = self.records.pop(faq_id, None)
+            if record is not None:
+                self._unlink(record)
+                self.generation += 1
+
+    def _unlink(self, record: FAQRecord):
+        for token in record.tokens:
+            bucket = self.postings.get(token)
+            if bucket is None:
+                continue
+            bucket.discard(record.faq_id)
+            if not bucket:
+                del self.postings[token]
+                self._match_cache.clear()
+                for gram in token_grams(token):
+                    tokens = self.grams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self.grams[gram]
+        for subject in record.subjects:
+            self.subject_postings[subject].discard(record.faq_id)
+        self.detail_postings.discard(record.faq_id)
+
+    def snapshot(self) -> List[FAQRecord]:
+        """Current FAQs in table order, for rankers that build their own structures"""
+        with self._lock:
+            return sorted(self.records.values(), key=lambda record: record.order)
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def _tokens_containing(self, word: str) -> Tuple[str, ...]:
+        """Vocabulary tokens that contain the query word as a substring"""
+        matches = self._match_cache.get(word)
+        if matches is None:
+            if len(word) <= GRAM_SIZE:
+                matches = tuple(self.grams.get(word, ()))
+            else:
+                # Every token containing the word contains all of its n-grams;
+                # intersect from the rarest and confirm the survivors
+                buckets = sorted(
+                    (self.grams.get(word[i:i + GRAM_SIZE], set())
+                     for i in range(len(word) - GRAM_SIZE + 1)),
+                    key=len,
+                )
+                shortlist = set(buckets[0])
+                for bucket in buckets[1:]:
+                    if not shortlist:
+                        break
+                    shortlist &= bucket
+                matches = tuple(token for token in shortlist if word in token)
+            if len(self._match_cache) > 4096:
+                self._match_cache.clear()
+            self._match_cache[word] = matches
+        return matches
+
+    def by_category(self, category: str, limit: int) -> List[FAQRecord]:
+        """In-memory equivalent of FAQ.category LIKE '%category%'"""
+        needle = category.lower()
+        with self._lock:
+            matches = [r for r in self.records.values() if needle in r.category_lower]
+        matches.sort(key=lambda record: record.order)
+        return matches[:limit]
+
+    def candidates(self, query_lower: str) -> Set[str]:
+        """FAQs that can earn more than the similarity-only score"""
+        found: Set[str] = set()
+        for word in set(query_lower.split()):
+            for token in self._tokens_containing(word):
+                found.update(self.postings[token])
+        for subject in SUBJECT_TERMS:
+            if subject in query_lower:
+                found.update(self.subject_postings[subject])
+        if any(keyword in query_lower for keyword in DETAIL_TERMS):
+            found.update(self.detail_postings)
+        return found
+
+    @staticmethod
+    def score(record: FAQRecord, query_lower: str, query_words: List[str], similarity: float) -> float:
+        """Legacy additive score of one FAQ against the query"""
+        score = 0
+
+        # 1. Direct keyword matching in question
+        if any(word in record.question_lower for word in query_words):
+            score += 30
+
+        # 2. Keyword field matching
+        if record.keywords_lower:
+            matching_keywords = sum(1 for word in query_words if word in record.keywords_lower)
+            score += matching_keywords * 20
+
+        # 3. FAQ ID matching (for specific queries)
+        if any(word in record.faq_id_lower for word in query_words):
+            score += 25
+
+        # 4. Sequence similarity (computed by the bounded fuzzy stage)
+        score += similarity * 15
+
+        # 5. Subject-specific matching
+        for subject in record.subjects:
+            if subject in query_lower:
+                score += 40
+
+        # 6. Detail level matching
+        if record.has_detail and any(keyword in query_lower for keyword in DETAIL_TERMS):
+            score += 35
+
+        return score
+
+    def search(self, query: str, limit: int = 5, terms: Optional[QueryTerms] = None) -> List[Dict]:
+        """Top FAQs for the query under the legacy additive score"""
+        terms = terms or QueryTerms(query)
+        query_lower, query_words = terms.lower, terms.words
+
+        with self._lock:
+            candidate_ids = self.candidates(query_lower)
+            records = [self.records[faq_id] for faq_id in candidate_ids]
+
+            # FAQs without lexical evidence only score on similarity (< 15), so
+            # they are only needed when the candidates cannot fill the page
+            if len(records) < limit:
+                records.extend(record for faq_id, record in self.records.items()
+                               if faq_id not in candidate_ids)
+
+        similarities = self.fuzzy.similarities(query_lower, records)
+        scored = [
+            (self.score(record, query_lower, query_words, similarity), record)
+            for record, similarity in zip(records, similarities)
+        ]
+
+        scored = [item for item in scored if item[0] > 0]
+        scored.sort(key=lambda item: (-item[0], item[1].order))
+        return [
+            {
+                'faq_id': record.faq_id,
+                'question': record.question,
+                'answer': record.answer,
+                'score': score
+            }
+            for score, record in scored[:limit]
+        ]
@@ -0,0 +1,67 @@
+"""
+Bounded fuzzy matching stage for FAQ questions
+Character trigram signatures give a cheap similarity estimate for every
+candidate; the full SequenceMatcher ratio only runs on a capped shortlist
+"""
+from typing import FrozenSet, List, Optional, Sequence
+from difflib import SequenceMatcher
+import heapq
+import os
+
+
+def trigram_signature(text: str) -> FrozenSet[str]:
+    """Set of character trigrams of the padded, whitespace-collapsed text"""
+    padded = f"  {' '.join(text.split())} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class FuzzyMatcher:
+    """Similarity between a query and FAQ questions with a bounded amount of difflib work"""
+
+    def __init__(self, max_candidates: Optional[int] = None, use_quick_ratio: Optional[bool] = None,
+                 min_ratio: Optional[float] = None):
+        self.max_candidates = max_candidates if max_candidates is not None else int(
+            os.getenv("FUZZY_MAX_CANDIDATES", "50")
+        )
+        self.use_quick_ratio = use_quick_ratio if use_quick_ratio is not None else (
+            os.getenv("FUZZY_QUICK_RATIO", "1") not in ('0', 'false', 'no')
+        )
+        self.min_ratio = min_ratio if min_ratio is not None else float(os.getenv("FUZZY_MIN_RATIO", "0.2"))
+
+    @staticmethod
+    def estimate(query_signature: FrozenSet[str], signature: FrozenSet[str]) -> float:
+        """Dice coefficient of two trigram signatures"""
+        total = len(query_signature) + len(signature)
+        if not total:
+            return 0.0
+        return 2.0 * len(query_signature & signature) / total
+
+    def similarities(self, query_lower: str, records: Sequence) -> List[float]:
+        """Similarity in [0, 1] of the query against each record's question_lower
+
+        Every record gets the trigram estimate; the max_candidates best
+        estimates are then replaced by SequenceMatcher.ratio(), except where
+        the quick_ratio upper bound is already below min_ratio.
+        """
+        query_signature = trigram_signature(query_lower)
+        scores = [self.estimate(query_signature, record.trigrams) for record in records]
+
+        if len(records) > self.max_candidates:
+            shortlist = heapq.nlargest(self.max_candidates, range(len(records)), key=scores.__getitem__)
+        else:
+            shortlist = range(len(records))
+
+        # ratio() is not symmetric; keep the query as seq1 like the original scorer
+        matcher = SequenceMatcher(None)
+        matcher.set_seq1(query_lower)
+        for i in shortlist:
+            matcher.set_seq2(records[i].question_lower)
+            if self.use_quick_ratio:
+                bound = matcher.real_quick_ratio()
+                if bound >= self.min_ratio:
+                    bound = matcher.quick_ratio()
+                if bound < self.min_ratio:
+                    scores[i] = min(scores[i], bound)
+                    continue
+            scores[i] = matcher.ratio()
+        return scores
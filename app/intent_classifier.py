@@ -0,0 +1,125 @@
+"""
+Rule-based intent classification
+All keyword lists are compiled into one word-boundary regex, so a message is
+scanned once for every intent and "hi" no longer matches inside "this" (nor "ia" inside "via").
+Keyword tables live in intent_keywords.json (or INTENT_KEYWORDS_PATH): one
+per chatbot service, where the order of the intents is their priority when
+several match. Only keywords listed under "suffixed" also match with a
+plural or number suffix ("exams", "ia2"), so "hi" stays out of "his"
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import json
+import os
+import re
+
+DEFAULT_KEYWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_keywords.json")
+
+# Plurals ("exams", "classes") and numbered assessments ("ia1", "ia-2"),
+# for suffixed keywords only
+_SUFFIX = r"(?:es|s|-?\d+)?"
+
+# Confidence adjustments for the evidence behind a match
+EXTRA_HIT_BONUS = 0.02
+MAX_HIT_BONUS = 0.04
+COMPETING_INTENT_PENALTY = 0.05
+MAX_CONFIDENCE = 0.99
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    confidence: float
+    # intent -> keywords found in the message, for every intent that matched
+    hits: Dict[str, List[str]]
+
+
+def _keyword_pattern(keyword: str) -> str:
+    return r"\s+".join(re.escape(word) for word in keyword.lower().split())
+
+
+def _alternation(keywords: Iterable[str]) -> str:
+    # (?!) never matches, standing in for an empty list
+    return "|".join(_keyword_pattern(k) for k in keywords) or "(?!)"
+
+
+class IntentClassifier:
+    """Single-pass keyword matcher with priority resolution"""
+
+    def __init__(self, intents: List[Dict], default_intent: str = "general",
+                 default_confidence: float = 0.70, suffixed: Iterable[str] = ()):
+        self.default_intent = default_intent
+        self.default_confidence = default_confidence
+        self.priority = {spec["intent"]: rank for rank, spec in enumerate(intents)}
+        self.base_confidence = {spec["intent"]: float(spec["confidence"]) for spec in intents}
+
+        self._keyword_intents: Dict[str, str] = {}
+        for spec in intents:
+            for keyword in spec["keywords"]:
+                # The first intent listing a keyword owns it
+                self._keyword_intents.setdefault(" ".join(keyword.lower().split()), spec["intent"])
+        suffixed = {" ".join(keyword.lower().split()) for keyword in suffixed}
+        # Two alternations, suffixed keywords and the rest, each longest first
+        # so "thank you" wins over a shorter keyword at the same position; the
+        # groups capture the keyword without its suffix
+        by_length = sorted(self._keyword_intents, key=len, reverse=True)
+        with_suffix = _alternation(k for k in by_length if k in suffixed)
+        without_suffix = _alternation(k for k in by_length if k not in suffixed)
+        # Cheap first-character check before trying the alternation at each word boundary
+        initials = "".join(sorted({re.escape(k[0]) for k in self._keyword_intents}))
+        self.pattern = re.compile(
+            rf"\b(?=[{initials}])(?:({with_suffix}){_SUFFIX}|({without_suffix}))\b"
+        ) if self._keyword_intents else None
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = None, table: str = "intents") -> "IntentClassifier":
+        """Classifier for one keyword table of the config: "intents" for the
+        dynamic service, "static_intents" for the static one"""
+        path = path or os.getenv("INTENT_KEYWORDS_PATH", DEFAULT_KEYWORDS_PATH)
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        default = config.get("default", {})
+        return cls(
+            config[table],
+            default.get("intent", "general"),
+            float(default.get("confidence", 0.70)),
+            config.get("suffixed", ())
+        )
+
+    def _keywords(self, message: str) -> List[str]:
+        """Keywords found in the message, in order, without their suffixes"""
+        return [suffixed or plain for suffixed, plain in self.pattern.findall(message.lower())]
+
+    def match(self, message: str) -> IntentMatch:
+        found = self._keywords(message) if self.pattern is not None else None
+        if not found:
+            return IntentMatch(self.default_intent, self.default_confidence, {})
+
+        hits: Dict[str, List[str]] = {}
+        keyword_intents = self._keyword_intents
+        for keyword in found:
+            intent = keyword_intents.get(keyword)
+            if intent is None:
+                # Multi-word keyword matched across other whitespace
+                keyword = " ".join(keyword.split())
+                intent = keyword_intents[keyword]
+            hits.setdefault(intent, []).append(keyword)
+
+        intent = min(hits, key=self.priority.__getitem__) if len(hits) > 1 else next(iter(hits))
+        bonus = min(MAX_HIT_BONUS, EXTRA_HIT_BONUS * (len(hits[intent]) - 1))
+        penalty = COMPETING_INTENT_PENALTY * (len(hits) - 1)
+        confidence = self.base_confidence[intent] + bonus - penalty
+        confidence = max(self.default_confidence, min(MAX_CONFIDENCE, confidence))
+        return IntentMatch(intent, round(confidence, 2), hits)
+
+    def classify(self, message: str) -> Tuple[str, float]:
+        """(intent, confidence); match() also returns the keywords behind it"""
+        if self.pattern is None:
+            return self.default_intent, self.default_confidence
+        found = self._keywords(message)
+        if not found:
+            return self.default_intent, self.default_confidence
+        if len(found) == 1:
+            # Single hit, the common case: no evidence to weigh
+            intent = self._keyword_intents.get(found[0]) or self._keyword_intents[" ".join(found[0].split())]
+            return intent, self.base_confidence[intent]
+        result = self.match(message)
+        return result.intent, result.confidence
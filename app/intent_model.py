@@ -0,0 +1,155 @@
+"""
+Trainable intent model
+Multinomial logistic regression over feature-hashed word uni/bigrams and
+character trigrams, trained offline with train_intent_model.py and stored as
+a small .npz file. Inference touches only the weight rows of the message's
+features, so a prediction costs tens of microseconds
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+import os
+import random
+import zlib
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from .text_processing import TOKEN_PATTERN
+
+MODEL_FORMAT_VERSION = 1
+
+
+# Hashed features of one word (unigram + character trigrams) per dimension;
+# the vocabulary of a chat service is small, so this stays tiny
+_WORD_FEATURE_CACHE: Dict[Tuple[str, int], List[Tuple[int, float]]] = {}
+_WORD_FEATURE_CACHE_LIMIT = 50000
+
+
+def _hash_feature(feature: str, weight: float, dim: int) -> Tuple[int, float]:
+    # crc32 is stable across processes, unlike hash()
+    h = zlib.crc32(feature.encode('utf-8'))
+    return h % dim, (weight if (h >> 31) & 1 else -weight)
+
+
+def _word_features(word: str, dim: int) -> List[Tuple[int, float]]:
+    key = (word, dim)
+    features = _WORD_FEATURE_CACHE.get(key)
+    if features is None:
+        padded = f"<{word}>"
+        features = [_hash_feature(f"w:{word}", 1.0, dim)]
+        features.extend(_hash_feature(f"c:{padded[i:i + 3]}", 0.3, dim) for i in range(len(padded) - 2))
+        if len(_WORD_FEATURE_CACHE) >= _WORD_FEATURE_CACHE_LIMIT:
+            _WORD_FEATURE_CACHE.clear()
+        _WORD_FEATURE_CACHE[key] = features
+    return features
+
+
+def hashed_features(text: str, dim: int) -> Tuple[List[int], List[float]]:
+    """Signed feature-hashing of one message, L2-normalized
+
+    Stopwords are kept: "hi", "thanks" and "who" carry intent even though
+    they carry no retrieval signal.
+    """
+    words = TOKEN_PATTERN.findall(text.lower())
+    combined: Dict[int, float] = {}
+    for word in words:
+        for index, value in _word_features(word, dim):
+            combined[index] = combined.get(index, 0.0) + value
+    for a, b in zip(words, words[1:]):
+        index, value = _hash_feature(f"b:{a} {b}", 0.7, dim)
+        combined[index] = combined.get(index, 0.0) + value
+    norm = math.sqrt(sum(v * v for v in combined.values())) or 1.0
+    return list(combined), [v / norm for v in combined.values()]
+
+
+class IntentModel:
+    """Softmax classifier over hashed n-gram features"""
+
+    def __init__(self, labels: Sequence[str], weights: "np.ndarray", bias: "np.ndarray"):
+        self.labels = list(labels)
+        self.weights = weights
+        self.bias = bias
+        self.dim = weights.shape[0]
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], dim: int = 4096,
+              epochs: int = 50, learning_rate: float = 1.0, l2: float = 1e-5,
+              seed: int = 13) -> "IntentModel":
+        """Plain SGD on the cross-entropy, one example at a time"""
+        classes = sorted(set(labels))
+        class_index = {label: i for i, label in enumerate(classes)}
+        rows = [hashed_features(text, dim) for text in texts]
+        targets = [class_index[label] for label in labels]
+
+        weights = np.zeros((dim, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        order = list(range(len(rows)))
+        rng = random.Random(seed)
+        step = 0
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            for i in order:
+                indices, values = rows[i]
+                values = np.asarray(values, dtype=np.float32)
+                logits = values @ weights[indices] + bias
+                probs = np.exp(logits - logits.max())
+                probs /= probs.sum()
+                probs[targets[i]] -= 1.0
+
+                lr = learning_rate / (1.0 + 0.01 * step)
+                step += 1
+                weights[indices] -= lr * (np.outer(values, probs) + l2 * weights[indices])
+                bias -= lr * probs
+        return cls(classes, weights, bias)
+
+    def predict_proba(self, text: str) -> "np.ndarray":
+        indices, values = hashed_features(text, self.dim)
+        if indices:
+            logits = np.asarray(values, dtype=np.float32) @ self.weights[indices] + self.bias
+        else:
+            logits = self.bias.copy()
+        probs = np.exp(logits - logits.max())
+        return probs / probs.sum()
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probs = self.predict_proba(text)
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def save(self, path: str, dtype: str = "float16"):
+        """Write the weights; float16 halves the file at no measurable accuracy cost"""
+        np.savez_compressed(
+            path,
+            format_version=np.array(MODEL_FORMAT_VERSION),
+            labels=np.array(self.labels),
+            weights=self.weights.astype(dtype),
+            bias=self.bias.astype(np.float32)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentModel":
+        with np.load(path) as data:
+            if int(data["format_version"]) != MODEL_FORMAT_VERSION:
+                raise ValueError(f"unsupported intent model format in {path}")
+            return cls(
+                [str(label) for label in data["labels"]],
+                data["weights"].astype(np.float32),
+                data["bias"].astype(np.float32)
+            )
+
+
+def load_intent_model(path: Optional[str] = None) -> Optional[IntentModel]:
+    """Model from INTENT_MODEL_PATH, or None when there is none to use"""
+    path = path or os.getenv("INTENT_MODEL_PATH", "intent_model.npz")
+    if not NUMPY_AVAILABLE or not os.path.exists(path):
+        return None
+    try:
+        model = IntentModel.load(path)
+    except Exception as e:
+        print(f"Warning: could not load intent model {path}: {e}")
+        return None
+    print(f"✓ Intent model loaded ({len(model.labels)} intents, {model.dim} features)")
+    return model
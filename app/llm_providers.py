@@ -0,0 +1,455 @@
+"""
+LLM backends behind one interface
+GeminiProvider calls the Gemini API. OfflineProvider needs no network or
+key: it answers deterministically from the FAQ context already in the
+prompt, so the whole chat pipeline can be load-tested on a laptop.
+SimulatedProvider wraps either one with configurable latency and failures.
+
+LLM_PROVIDER selects gemini (default) or offline; LLM_SIM_LATENCY_MS,
+LLM_SIM_JITTER_MS and LLM_SIM_ERROR_RATE wrap it in the simulator, and
+ResilientProvider puts limits, deadlines, retries and a circuit breaker
+around whatever was chosen
+"""
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import inspect
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+try:
+    from google import genai
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+from .concurrency import run_blocking
+from .resilience import CircuitBreaker, ConcurrencyLimiter, backoff_delay, is_retryable
+from .text_processing import tokenize
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+
+class LLMProviderError(Exception):
+    """An LLM call failed"""
+    retryable = True
+
+
+class LLMProvider:
+    """Text in, text out. Subclasses implement generate; the async and
+    streaming variants default to running it on the blocking pool"""
+
+    name = "base"
+    model = None
+
+    def __init__(self):
+        self.available = True
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def _count(self):
+        with self._calls_lock:
+            self.calls += 1
+
+    def generate(self, prompt: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str) -> Optional[str]:
+        return await run_blocking(self.generate, prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        text = await self.agenerate(prompt)
+        if text:
+            yield text
+
+    def describe(self) -> dict:
+        return {"provider": self.name, "model": self.model, "available": self.available, "calls": self.calls}
+
+
+class GeminiProvider(LLMProvider):
+    """google-genai client for GEMINI_API_KEY"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+        super().__init__()
+        self.model = model or GEMINI_MODEL
+        self.client = None
+        self.available = False
+        if not GEMINI_AVAILABLE:
+            print("Warning: Google Gemini SDK not available")
+            return
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            print("Warning: GEMINI_API_KEY not found")
+            return
+        try:
+            self.client = genai.Client(api_key=api_key)
+            self.available = True
+            print("✓ Gemini AI initialized successfully")
+        except Exception as e:
+            print(f"Failed to initialize Gemini: {e}")
+
+    def generate(self, prompt: str) -> Optional[str]:
+        self._count()
+        response = self.client.models.generate_content(model=self.model, contents=prompt)
+        return response.text if response else None
+
+    async def agenerate(self, prompt: str) -> Optional[str]:
+        if not hasattr(self.client, 'aio'):
+            return await super().agenerate(prompt)
+        self._count()
+        response = await self.client.aio.models.generate_content(model=self.model, contents=prompt)
+        return response.text if response else None
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Text chunks as Gemini produces them"""
+        self._count()
+        if hasattr(self.client, 'aio'):
+            stream = self.client.aio.models.generate_content_stream(model=self.model, contents=prompt)
+            # Newer SDKs return an awaitable that resolves to the async iterator
+            if inspect.isawaitable(stream):
+                stream = await stream
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        else:
+            # Sync SDK: pull each chunk on the blocking pool
+            stream = iter(self.client.models.generate_content_stream(model=self.model, contents=prompt))
+            while True:
+                chunk = await run_blocking(next, stream, None)
+                if chunk is None:
+                    break
+                if chunk.text:
+                    yield chunk.text
+
+
+_QUESTION = re.compile(r'\*\*Student Question:\*\* "(.*)"\n\n\*\*Instructions:\*\*', re.S)
+_DATABASE_SECTION = re.compile(r'\*\*Database Information:\*\*\n(.*?)\n\n\*\*Previous Conversation:\*\*', re.S)
+_FAQ = re.compile(r'^Q: (.*)\nA: (.*)$', re.M)
+
+
+class OfflineProvider(LLMProvider):
+    """Deterministic answers from the prompt's own database context
+
+    The FAQ whose question shares the most words with the student's question
+    is answered verbatim; without FAQs the structured data lines are listed.
+    The same prompt always gives the same answer, so response caching and
+    request coalescing behave as they do with Gemini.
+    """
+
+    name = "offline"
+    model = "offline-faq"
+
+    FALLBACK = ("I couldn't find that in the department database. "
+                "Please contact the department office for specific information.")
+
+    @staticmethod
+    def _parse(prompt: str) -> Tuple[str, List[Tuple[str, str]], List[str]]:
+        question = _QUESTION.search(prompt)
+        section = _DATABASE_SECTION.search(prompt)
+        context = section.group(1) if section else ""
+        data_lines = [line for line in context.splitlines() if line.startswith("- ")]
+        return (question.group(1) if question else prompt), _FAQ.findall(context), data_lines
+
+    def generate(self, prompt: str) -> Optional[str]:
+        self._count()
+        question, faqs, data_lines = self._parse(prompt)
+        asked = set(tokenize(question))
+        if faqs:
+            # max() keeps the first of equally good FAQs, i.e. the best ranked
+            best_question, best_answer = max(faqs, key=lambda faq: len(asked & set(tokenize(faq[0]))))
+            return best_answer
+        if data_lines:
+            return "Here is what the department database lists:\n" + "\n".join(data_lines)
+        return self.FALLBACK
+
+    async def agenerate(self, prompt: str) -> Optional[str]:
+        # Pure CPU and microseconds long, so no trip to the blocking pool
+        return self.generate(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        text = self.generate(prompt)
+        for word in re.findall(r"\S+\s*", text):
+            yield word
+
+
+class SimulatedProvider(LLMProvider):
+    """Adds latency (base ± uniform jitter) and random failures to a provider"""
+
+    name = "simulated"
+
+    def __init__(self, inner: LLMProvider, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        super().__init__()
+        self.inner = inner
+        self.model = inner.model
+        self.available = inner.available
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.failures = 0
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._random_lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+        return delay, fail
+
+    def _fail(self):
+        self.failures += 1
+        raise LLMProviderError("simulated upstream failure")
+
+    def generate(self, prompt: str) -> Optional[str]:
+        self._count()
+        delay, fail = self._draw()
+        time.sleep(delay)
+        if fail:
+            self._fail()
+        return self.inner.generate(prompt)
+
+    async def agenerate(self, prompt: str) -> Optional[str]:
+        self._count()
+        delay, fail = self._draw()
+        await asyncio.sleep(delay)
+        if fail:
+            self._fail()
+        return await self.inner.agenerate(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        self._count()
+        delay, fail = self._draw()
+        # Time to first token
+        await asyncio.sleep(delay)
+        if fail:
+            self._fail()
+        async for chunk in self.inner.astream(prompt):
+            yield chunk
+
+    def describe(self) -> dict:
+        return {
+            **self.inner.describe(),
+            "calls": self.calls,
+            "simulated": {
+                "latency_ms": self.latency * 1000,
+                "jitter_ms": self.jitter * 1000,
+                "error_rate": self.error_rate,
+                "failures": self.failures,
+            },
+        }
+
+
+class ResilientProvider(LLMProvider):
+    """Concurrency limit, deadline, retries and a circuit breaker around a provider
+
+    A call waits at most LLM_QUEUE_TIMEOUT_SECONDS for one of the
+    LLM_MAX_IN_FLIGHT slots, then gets LLM_TIMEOUT_SECONDS in total: each
+    attempt gets what is left, and transient failures are retried up to
+    LLM_RETRIES times after a jittered backoff. Transient failures feed the
+    breaker; while it is open calls fail at once with CircuitOpenError.
+    The installed Gemini SDK has no request timeout, so a sync attempt that
+    overruns is abandoned on its thread rather than cancelled.
+    """
+
+    name = "resilient"
+
+    def __init__(self, inner: LLMProvider, max_in_flight: Optional[int] = None,
+                 timeout: Optional[float] = None, retries: Optional[int] = None,
+                 queue_timeout: Optional[float] = None, breaker: Optional[CircuitBreaker] = None):
+        super().__init__()
+        self.inner = inner
+        self.model = inner.model
+        self.available = inner.available
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+        self.retries = retries if retries is not None else int(os.getenv("LLM_RETRIES", "2"))
+        self.backoff_base = float(os.getenv("LLM_RETRY_BASE_MS", "200")) / 1000
+        self.backoff_cap = float(os.getenv("LLM_RETRY_MAX_MS", "2000")) / 1000
+        max_in_flight = max_in_flight or int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+        self.limiter = ConcurrencyLimiter(
+            max_in_flight,
+            queue_timeout if queue_timeout is not None else float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "5"))
+        )
+        self.breaker = breaker or CircuitBreaker(
+            int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+        )
+        # Sync attempts run here so they can be timed out; abandoned ones
+        # keep a thread until the SDK returns, hence the headroom
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight * 2, thread_name_prefix="llm")
+        self._random = random.Random()
+        self.retried = 0
+        self.timeouts = 0
+
+    def _record(self, error: Optional[BaseException]):
+        # Only transient failures say anything about the endpoint's health;
+        # any other error leaves the breaker as it was, bar freeing a probe
+        if error is None:
+            self.breaker.record_success()
+        elif is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+
+    def _retry_delay(self, attempt: int, error: Exception, deadline: float) -> Optional[float]:
+        """Record a failed attempt; the backoff before the next one, or None
+        when the error is final"""
+        self._record(error)
+        if attempt >= self.retries or not is_retryable(error):
+            return None
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap, self._random)
+        if time.monotonic() + delay >= deadline:
+            return None
+        self.retried += 1
+        return delay
+
+    def _timed_out(self) -> TimeoutError:
+        self.timeouts += 1
+        return TimeoutError(f"LLM call exceeded {self.timeout:g}s")
+
+    def generate(self, prompt: str) -> Optional[str]:
+        self._count()
+        self.limiter.acquire()
+        try:
+            deadline = time.monotonic() + self.timeout
+            for attempt in range(self.retries + 1):
+                self.breaker.before_call()
+                try:
+                    future = self._executor.submit(self.inner.generate, prompt)
+                    try:
+                        text = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                    except FutureTimeoutError:
+                        raise self._timed_out() from None
+                except Exception as e:
+                    delay = self._retry_delay(attempt, e, deadline)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    continue
+                self._record(None)
+                return text
+        finally:
+            self.limiter.release()
+
+    async def agenerate(self, prompt: str) -> Optional[str]:
+        self._count()
+        semaphore = await self.limiter.aacquire()
+        try:
+            deadline = time.monotonic() + self.timeout
+            for attempt in range(self.retries + 1):
+                self.breaker.before_call()
+                try:
+                    try:
+                        text = await asyncio.wait_for(
+                            self.inner.agenerate(prompt), max(0.0, deadline - time.monotonic())
+                        )
+                    except asyncio.TimeoutError:
+                        raise self._timed_out() from None
+                except asyncio.CancelledError:
+                    # The caller went away; that says nothing about the endpoint
+                    self.breaker.release_probe()
+                    raise
+                except Exception as e:
+                    delay = self._retry_delay(attempt, e, deadline)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                self._record(None)
+                return text
+        finally:
+            self.limiter.arelease(semaphore)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """The deadline covers the first chunk; a failed attempt is retried
+        only while nothing has been yielded"""
+        self._count()
+        semaphore = await self.limiter.aacquire()
+        recorded = False
+        try:
+            deadline = time.monotonic() + self.timeout
+            for attempt in range(self.retries + 1):
+                self.breaker.before_call()
+                stream = self.inner.astream(prompt).__aiter__()
+                try:
+                    try:
+                        first = await asyncio.wait_for(
+                            stream.__anext__(), max(0.0, deadline - time.monotonic())
+                        )
+                    except asyncio.TimeoutError:
+                        raise self._timed_out() from None
+                except StopAsyncIteration:
+                    self._record(None)
+                    recorded = True
+                    return
+                except Exception as e:
+                    delay = self._retry_delay(attempt, e, deadline)
+                    if delay is None:
+                        recorded = True
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                break
+
+            yield first
+            try:
+                async for chunk in stream:
+                    yield chunk
+            except Exception as e:
+                self._record(e)
+                recorded = True
+                raise
+            self._record(None)
+            recorded = True
+        finally:
+            if not recorded:
+                # Cancelled, or the consumer stopped reading early
+                self.breaker.release_probe()
+            self.limiter.arelease(semaphore)
+
+    def describe(self) -> dict:
+        return {
+            **self.inner.describe(),
+            "calls": self.calls,
+            "breaker": self.breaker.stats(),
+            "limiter": self.limiter.stats(),
+            "timeout_seconds": self.timeout,
+            "retries": self.retries,
+            "retried": self.retried,
+            "timeouts": self.timeouts,
+        }
+
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'offline': OfflineProvider,
+}
+
+
+def create_llm_provider(name: Optional[str] = None) -> LLMProvider:
+    """Provider named by LLM_PROVIDER, wrapped in the simulator when any
+    LLM_SIM_* setting is non-zero, behind the resilience layer unless
+    LLM_RESILIENCE=0"""
+    name = (name or os.getenv("LLM_PROVIDER", "gemini")).lower()
+    if name not in PROVIDERS:
+        print(f"Warning: unknown LLM_PROVIDER '{name}', using gemini")
+        name = 'gemini'
+    provider = PROVIDERS[name]()
+    if name != 'gemini':
+        print(f"✓ LLM provider: {name}")
+
+    latency_ms = float(os.getenv("LLM_SIM_LATENCY_MS", "0"))
+    jitter_ms = float(os.getenv("LLM_SIM_JITTER_MS", "0"))
+    error_rate = float(os.getenv("LLM_SIM_ERROR_RATE", "0"))
+    if latency_ms or jitter_ms or error_rate:
+        seed = os.getenv("LLM_SIM_SEED")
+        provider = SimulatedProvider(provider, latency_ms, jitter_ms, error_rate,
+                                     int(seed) if seed is not None else None)
+        print(f"✓ LLM simulator: {latency_ms:.0f}±{jitter_ms:.0f} ms, error rate {error_rate:.0%}")
+    if os.getenv("LLM_RESILIENCE", "1") not in ('0', 'false', 'no'):
+        provider = ResilientProvider(provider)
+    return provider
@@ -1,24 +1,35 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import select, or_, and_, type_coerce, String
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List
 import uuid
+import base64
 from datetime import datetime, timedelta
 import json
+import math
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-from .database import engine, Base, get_db
+from .database import engine, read_engine, Base, get_db, SessionLocal
 from . import models, auth
 from .chatbot_service_dynamic import dynamic_chatbot_service
+from .chat_writer import chat_writer, ChatHistoryWriter
+from .concurrency import run_blocking
+from .metrics import REGISTRY
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# create_all skips indexes added to tables that already exist
+for index in models.ChatHistory.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
+
 app = FastAPI(
     title="Academic Chatbot API",
     description="NLP-powered chatbot for academic queries",
@@ -34,6 +45,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    # Build search indexes once per worker instead of on the first chat turn
+    dynamic_chatbot_service.warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    dynamic_chatbot_service.shutdown()
+    # Write queued chat turns before the worker exits
+    chat_writer.close()
+
 # Pydantic models
 class ChatRequest(BaseModel):
     message: str
@@ -46,6 +68,7 @@ class ChatResponse(BaseModel):
     entities: dict
     session_id: str
     timestamp: str
+    source: str = "generated"  # extractive | cached | generated | fallback | unavailable
 
 class UserResponse(BaseModel):
     id: int
@@ -75,10 +98,16 @@ async def health_check(db: Session = Depends(get_db)):
     except:
         faq_count = course_count = assignment_count = 0
         db_healthy = False
+    llm = dynamic_chatbot_service.llm.describe()
+    breaker_state = llm.get("breaker", {}).get("state", "closed")
     
     return {
-        "status": "healthy" if db_healthy else "degraded",
-        "gemini_available": dynamic_chatbot_service.gemini_available,
+        "status": "healthy" if db_healthy and breaker_state == "closed" else "degraded",
+        "gemini_available": llm["provider"] == "gemini" and llm["available"],
+        "llm_provider": llm,
+        "llm_breaker": breaker_state,
+        "llm_queue_depth": llm.get("limiter", {}).get("queued", 0),
+        "llm_in_flight": llm.get("limiter", {}).get("in_flight", 0),
         "database": {
             "healthy": db_healthy,
             "faqs": faq_count,
@@ -88,6 +117,85 @@ async def health_check(db: Session = Depends(get_db)):
         "timestamp": datetime.now().isoformat()
     }
 
+def _pool_samples(pool):
+    """(state, connections) of a SQLAlchemy pool; pools without a fixed
+    size (NullPool, SingletonThreadPool) report what they can"""
+    for state, method in (("checked_out", "checkedout"), ("checked_in", "checkedin"),
+                          ("overflow", "overflow")):
+        counter = getattr(pool, method, None)
+        if callable(counter):
+            # QueuePool.overflow() counts down from -size while the pool fills
+            yield state, max(counter(), 0)
+
+
+def _collect_metrics():
+    """Gauges and counters read from the components' own counters at scrape time"""
+    service = dynamic_chatbot_service
+    response, semantic, context = (
+        service.response_cache.stats(), service.semantic_cache.stats(), service.context_cache.stats()
+    )
+    caches = (
+        ("response", response["hits"], response["misses"], response["entries"]),
+        ("semantic", semantic["hits"], semantic["lookups"] - semantic["hits"], semantic["entries"]),
+        ("context", context["hits"], context["builds"], context["blocks"]),
+    )
+    yield ("chatbot_cache_hits_total", "counter", "Cache lookups answered from the cache",
+           [({"cache": name}, hits) for name, hits, _, _ in caches])
+    yield ("chatbot_cache_misses_total", "counter", "Cache lookups that missed",
+           [({"cache": name}, misses) for name, _, misses, _ in caches])
+    yield ("chatbot_cache_hit_ratio", "gauge", "Hits over lookups since start",
+           [({"cache": name}, hits / (hits + misses) if hits + misses else 0.0)
+            for name, hits, misses, _ in caches])
+    yield ("chatbot_cache_entries", "gauge", "Entries currently cached",
+           [({"cache": name}, entries) for name, _, _, entries in caches])
+    
+    sessions = service.sessions.stats()
+    # NaN rather than no sample when a shared store cannot be counted right now
+    yield ("chatbot_sessions", "gauge", "Conversations held by the session store",
+           [({}, sessions["sessions"] if sessions.get("sessions") is not None else math.nan)])
+    yield ("chatbot_session_pending_turns", "gauge", "Session turns waiting to be flushed",
+           [({}, sessions.get("pending"))])
+    
+    llm = service.llm.describe()
+    breaker = llm.get("breaker", {})
+    limiter = llm.get("limiter", {})
+    yield ("chatbot_llm_calls_total", "counter", "Calls made to the LLM provider",
+           [({}, service.llm_calls)])
+    yield ("chatbot_llm_calls_saved_total", "counter", "Answers that needed no LLM call of their own",
+           [({}, service.response_cache.hits + service.semantic_cache.hits + service.llm_flights.shared)])
+    yield ("chatbot_llm_in_flight", "gauge", "LLM calls holding a concurrency slot",
+           [({}, limiter.get("in_flight"))])
+    yield ("chatbot_llm_queued", "gauge", "LLM calls waiting for a concurrency slot",
+           [({}, limiter.get("queued"))])
+    yield ("chatbot_llm_breaker_state", "gauge", "1 for the circuit breaker's current state",
+           [({"state": state}, int(breaker.get("state") == state))
+            for state in ("closed", "open", "half_open")] if breaker else [])
+    
+    writer = chat_writer.stats()
+    yield ("chatbot_history_queue_depth", "gauge", "Chat turns waiting to be saved",
+           [({}, writer["queued"])])
+    yield ("chatbot_history_written_total", "counter", "Chat turns saved to chat_history",
+           [({}, writer["written"])])
+    yield ("chatbot_history_failed_total", "counter", "Chat turns that could not be saved",
+           [({}, writer["failed"])])
+    
+    engines = [("main", engine)] + ([("read", read_engine)] if read_engine is not engine else [])
+    yield ("chatbot_db_pool_connections", "gauge", "Database pool connections by state",
+           [({"engine": name, "state": state}, value)
+            for name, pool_engine in engines for state, value in _pool_samples(pool_engine.pool)])
+    yield ("chatbot_db_pool_size", "gauge", "Connections the database pool keeps open",
+           [({"engine": name}, pool_engine.pool.size())
+            for name, pool_engine in engines if callable(getattr(pool_engine.pool, "size", None))])
+
+
+REGISTRY.add_collector(_collect_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition: per-stage and per-answer-path latency
+    histograms, cache hit rates, session store, LLM and database pool gauges"""
+    return PlainTextResponse(REGISTRY.expose(), media_type="text/plain; version=0.0.4")
+
 # Authentication endpoints
 @app.post("/api/auth/register", response_model=auth.Token)
 async def register(user: auth.UserCreate, db: Session = Depends(get_db)):
@@ -180,12 +288,12 @@ async def chat(
         entities = dynamic_chatbot_service.extract_entities(request.message, intent)
         
         # Generate response with database context
-        response_text = dynamic_chatbot_service.generate_response(
+        response_text, source = await dynamic_chatbot_service.agenerate_answer(
             request.message, intent, entities, session_id, db
         )
         
-        # Save to database
-        chat_record = models.ChatHistory(
+        # Save to database (batched off the request path)
+        await chat_writer.asubmit(ChatHistoryWriter.make_row(
             user_id=current_user.id,
             session_id=session_id,
             user_message=request.message,
@@ -193,9 +301,7 @@ async def chat(
             intent=intent,
             confidence=confidence,
             entities=json.dumps(entities)
-        )
-        db.add(chat_record)
-        db.commit()
+        ))
         
         return ChatResponse(
             response=response_text,
@@ -203,42 +309,152 @@ async def chat(
             confidence=confidence,
             entities=entities,
             session_id=session_id,
-            timestamp=datetime.now().isoformat()
+            timestamp=datetime.now().isoformat(),
+            source=source
         )
     
     except Exception as e:
         print(f"Chat error: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing chat: {str(e)}"
+            detail="Error processing chat"
+        )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/chatbot/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Chatbot endpoint streaming the answer as Server-Sent Events
+    
+    Events: "meta" (intent, confidence, entities, session_id) first, then
+    "token" chunks of the answer, then "done" (timestamp, source) once the
+    turn is queued for saving.
+    """
+    session_id = request.session_id or str(uuid.uuid4())
+    intent, confidence = dynamic_chatbot_service.classify_intent(request.message)
+    entities = dynamic_chatbot_service.extract_entities(request.message, intent)
+    user_id = current_user.id
+    
+    async def events():
+        yield _sse("meta", {
+            "intent": intent,
+            "confidence": confidence,
+            "entities": entities,
+            "session_id": session_id
+        })
+        
+        # The stream outlives the request's dependencies, so it owns its session
+        db = SessionLocal()
+        try:
+            chunks = []
+            answer_meta = {}
+            async for text in dynamic_chatbot_service.astream_response(
+                request.message, intent, entities, session_id, db, answer_meta
+            ):
+                chunks.append(text)
+                yield _sse("token", {"text": text})
+            
+            await chat_writer.asubmit(ChatHistoryWriter.make_row(
+                user_id=user_id,
+                session_id=session_id,
+                user_message=request.message,
+                bot_response="".join(chunks).strip(),
+                intent=intent,
+                confidence=confidence,
+                entities=json.dumps(entities)
+            ))
+            yield _sse("done", {
+                "timestamp": datetime.now().isoformat(),
+                "source": answer_meta.get("source", "generated")
+            })
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield _sse("error", {"detail": "Error processing chat"})
+        finally:
+            db.close()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _encode_cursor(sort_value, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+def _decode_cursor(cursor: str, raw_sort_key: bool):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (sort_value if raw_sort_key else datetime.fromisoformat(sort_value)), int(row_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
 
 @app.get("/api/chatbot/history")
 async def get_chat_history(
     limit: int = 50,
+    cursor: Optional[str] = None,
+    session_id: Optional[str] = None,
+    intent: Optional[str] = None,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get user's chat history"""
+    """Get user's chat history, newest first
+    
+    Pages are keyset-paginated on (created_at, id): pass the returned
+    next_cursor to get the following page. Every page is an index range scan
+    on (user_id, created_at, id), however deep.
+    """
+    limit = max(1, min(limit, 200))
+    table = models.ChatHistory
+    # SQLite keeps timestamps as text, with or without microseconds depending
+    # on who wrote the row; compare the stored text, which is the index order
+    raw_sort_key = db.bind.dialect.name == "sqlite"
+    sort_key = type_coerce(table.created_at, String) if raw_sort_key else table.created_at
+    
+    query = select(
+        table.id, table.session_id, table.user_message, table.bot_response,
+        table.intent, table.confidence, table.created_at, sort_key.label("sort_key")
+    ).where(table.user_id == current_user.id)
+    if session_id:
+        query = query.where(table.session_id == session_id)
+    if intent:
+        query = query.where(table.intent == intent)
+    if cursor:
+        sort_value, row_id = _decode_cursor(cursor, raw_sort_key)
+        query = query.where(or_(
+            sort_key < sort_value,
+            and_(sort_key == sort_value, table.id < row_id)
+        ))
+    query = query.order_by(sort_key.desc(), table.id.desc()).limit(limit + 1)
+    
     try:
-        history = db.query(models.ChatHistory)\
-            .filter(models.ChatHistory.user_id == current_user.id)\
-            .order_by(models.ChatHistory.created_at.desc())\
-            .limit(limit)\
-            .all()
+        rows = (await run_blocking(db.execute, query)).all()
+        page = rows[:limit]
+        next_cursor = _encode_cursor(page[-1].sort_key, page[-1].id) if len(rows) > limit else None
         
         return {
             "history": [
                 {
-                    "id": chat.id,
-                    "user_message": chat.user_message,
-                    "bot_response": chat.bot_response,
-                    "intent": chat.intent,
-                    "confidence": chat.confidence,
-                    "created_at": chat.created_at.isoformat()
+                    "id": row.id,
+                    "session_id": row.session_id,
+                    "user_message": row.user_message,
+                    "bot_response": row.bot_response,
+                    "intent": row.intent,
+                    "confidence": row.confidence,
+                    "created_at": row.created_at.isoformat() if row.created_at else None
                 }
-                for chat in history
-            ]
+                for row in page
+            ],
+            "next_cursor": next_cursor
         }
     except Exception as e:
         raise HTTPException(
@@ -261,6 +477,13 @@ async def clear_session(
             detail=f"Error clearing session: {str(e)}"
         )
 
+@app.get("/api/chatbot/stats")
+async def get_chatbot_stats():
+    """Cache hit rates and the number of Gemini calls they saved"""
+    stats = dynamic_chatbot_service.stats()
+    stats["chat_writer"] = chat_writer.stats()
+    return stats
+
 @app.get("/api/chatbot/quick-actions")
 async def get_quick_actions(db: Session = Depends(get_db)):
     """Get dynamic quick action buttons based on database"""
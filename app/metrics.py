@@ -0,0 +1,262 @@
+"""
+Latency histograms and their Prometheus text exposition
+Fixed cumulative buckets, Prometheus-style, so recording a sample is one
+bisect and a few increments and memory stays constant however much traffic
+is observed. Quantiles are estimated by interpolating inside a bucket.
+
+Recording takes no lock: each thread increments a shard of its own (the
+event loop, the blocking pool's workers and the chat writer each get one)
+and readers sum the shards. Labeled families create one child per label
+value up front, so a hot path holds a child and never builds a label set
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import math
+import threading
+import time
+
+# Seconds; dense below 100 ms where the cached and extractive paths live,
+# sparse up to the tens of seconds a slow LLM call can take
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1,
+    0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, 30.0,
+)
+
+# Stages of a chat request, in pipeline order
+CHAT_STAGES = (
+    'auth',             # JWT decode and user lookup
+    'classify',         # classify_intent
+    'extract',          # extract_entities
+    'search',           # search_database_enhanced
+    'context_db',       # course/assignment/category blocks of fetch_context
+    'prompt_build',     # PromptBuilder.build
+    'llm',              # LLM call, or the whole stream when streaming
+    'history_commit',   # chat_history insert and commit
+)
+
+
+class _Shard:
+    """One thread's counts; only that thread writes to it"""
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram:
+    """Counts of observed values per bucket, plus their sum"""
+
+    def __init__(self, buckets: Optional[Sequence[float]] = None):
+        self.buckets = tuple(sorted(buckets or LATENCY_BUCKETS))
+        self._shards: List[_Shard] = []
+        self._local = threading.local()
+        # Only taken the first time a thread observes
+        self._lock = threading.Lock()
+
+    def _new_shard(self) -> _Shard:
+        # One slot per upper bound, plus the +Inf bucket
+        shard = _Shard(len(self.buckets) + 1)
+        self._local.shard = shard
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def observe(self, value: float):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard.counts[bisect_left(self.buckets, value)] += 1
+        shard.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the wall time of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(per-bucket counts, sum) across all threads"""
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for shard in list(self._shards):
+            for index, n in enumerate(shard.counts):
+                counts[index] += n
+            total += shard.sum
+        return counts, total
+
+    @property
+    def counts(self) -> List[int]:
+        return self.snapshot()[0]
+
+    @property
+    def count(self) -> int:
+        return sum(self.snapshot()[0])
+
+    @property
+    def sum(self) -> float:
+        return self.snapshot()[1]
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile; values past the last bound report that bound"""
+        return self._quantile(self.counts, q)
+
+    def _quantile(self, counts: Sequence[int], q: float) -> float:
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, n in enumerate(counts):
+            if n and seen + n >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def cumulative(self, counts: Optional[Sequence[int]] = None) -> Sequence[int]:
+        """Observations at or below each bound, the +Inf bucket last"""
+        total = 0
+        cumulative = []
+        for n in (self.counts if counts is None else counts):
+            total += n
+            cumulative.append(total)
+        return cumulative
+
+    def stats(self) -> Dict:
+        counts, total = self.snapshot()
+        count = sum(counts)
+        return {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(self._quantile(counts, 0.50) * 1000, 3),
+            "p95_ms": round(self._quantile(counts, 0.95) * 1000, 3),
+            "p99_ms": round(self._quantile(counts, 0.99) * 1000, 3),
+        }
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+class HistogramVec:
+    """A histogram family with one label, its children created up front
+
+    family['llm'] is a dict lookup returning a Histogram; values outside
+    label_values raise KeyError rather than growing the family.
+    """
+
+    def __init__(self, name: str, help: str, label: str, label_values: Sequence[str],
+                 buckets: Optional[Sequence[float]] = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.children: Dict[str, Histogram] = {
+            value: Histogram(buckets) for value in label_values
+        }
+        # Label text rendered once, not per scrape
+        self._labels = {value: f'{label}="{_escape(value)}"' for value in label_values}
+
+    def __getitem__(self, value: str) -> Histogram:
+        return self.children[value]
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def items(self):
+        return self.children.items()
+
+    def values(self):
+        return self.children.values()
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, histogram in self.children.items():
+            labels = self._labels[value]
+            counts, total = histogram.snapshot()
+            cumulative = histogram.cumulative(counts)
+            bounds = histogram.buckets + (math.inf,)
+            for bound, n in zip(bounds, cumulative):
+                lines.append(f'{self.name}_bucket{{{labels},le="{_format_bound(bound)}"}} {n}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative[-1]}")
+        return lines
+
+
+# A collected metric: (name, type, help, [(labels, value), ...]) where
+# labels is a {name: value} dict, empty for an unlabeled sample
+Sample = Tuple[str, str, str, Iterable[Tuple[Dict[str, str], float]]]
+
+
+def expose_family(name: str, kind: str, help: str,
+                  samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    """Text exposition lines of one gauge or counter family"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        if labels:
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+        else:
+            lines.append(f"{name} {_format_value(value)}")
+    return lines
+
+
+class Registry:
+    """Histogram families recorded as requests run, plus collectors that
+    read the components' own counters when scraped"""
+
+    def __init__(self):
+        self.families: List[HistogramVec] = []
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def register(self, family: HistogramVec) -> HistogramVec:
+        self.families.append(family)
+        return family
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self.collectors.append(collector)
+
+    def expose(self) -> str:
+        """Everything in the Prometheus text format (version 0.0.4)"""
+        lines: List[str] = []
+        for family in self.families:
+            lines.extend(family.expose())
+        for collector in self.collectors:
+            try:
+                for name, kind, help, samples in collector():
+                    lines.extend(expose_family(name, kind, help, samples))
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+chat_stage_seconds = REGISTRY.register(HistogramVec(
+    "chatbot_stage_seconds", "Time spent in each stage of a chat request", "stage", CHAT_STAGES
+))
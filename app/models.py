@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -28,6 +28,11 @@ class ChatHistory(Base):
     confidence = Column(Float)
     entities = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Serves the per-user history page: filter, order and keyset in one index
+        Index("ix_chat_history_user_created_id", "user_id", "created_at", "id"),
+    )
 
 class FAQ(Base):
     __tablename__ = "faqs"
@@ -0,0 +1,312 @@
+"""
+Token-budget-aware prompt assembly
+The academic context is kept as ranked sections (FAQ answers with their
+retrieval scores, structured data lines) rather than one string, so that when
+context and history together exceed PROMPT_TOKEN_BUDGET the builder can drop
+or shorten the least useful parts instead of sending an oversized prompt.
+Token counts are a local estimate; no tokenizer round-trip is made
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import re
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+ELLIPSIS = "…"
+
+KNOWLEDGE_TEMPLATE = """You are an AI assistant for Global Academy of Technology, Department of AI & ML, 7th Semester.
+
+**Context:** The specific information requested is not available in the current database, but you can provide general academic guidance.
+
+**Previous Conversation:**
+{history}
+
+**Student Question:** "{message}"
+
+**Instructions:**
+- The database doesn't have specific details for this query
+- Provide helpful general information based on your knowledge of academic institutions
+- Be honest that specific details aren't available in the database
+- Suggest contacting the department office for specific information
+- Keep responses helpful and professional
+- For faculty questions, mention common academic roles and suggest contacting the department
+
+**Response:**"""
+
+CONTEXT_TEMPLATE = """You are an AI assistant for Global Academy of Technology, Department of AI & ML, 7th Semester.
+
+**Database Information:**
+{db_context}
+
+**Previous Conversation:**
+{history}
+
+**Student Question:** "{message}"
+
+**Instructions:**
+- You MUST use the database information provided above to answer questions
+- Provide specific details from the database (course codes, faculty names, dates, deadlines, etc.)
+- Be helpful, friendly, and professional
+- Format responses with bullet points or lists when showing multiple items
+- Keep responses concise but informative (2-5 sentences for simple queries, more for complex ones)
+
+**Response:**"""
+
+NO_DATA = "No specific data found."
+NO_HISTORY = "No previous conversation"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count: one per punctuation mark, one per four
+    characters of each word (short words count as one)"""
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PIECES.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at a word boundary so it fits max_tokens, marking the cut"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    used = 0
+    end = 0
+    for match in _TOKEN_PIECES.finditer(text):
+        used += (len(match.group()) + 3) // 4
+        if used > max_tokens - 1:
+            break
+        end = match.end()
+    return text[:end].rstrip() + ELLIPSIS
+
+
+class ContextSection:
+    """One block of the context: a header line and its items
+
+    FAQ items are "Q: ..\\nA: ..\\n" strings ranked by score; data items are
+    "- .." lines kept in their original order.
+    """
+    __slots__ = ('kind', 'header', 'items', 'scores')
+
+    def __init__(self, kind: str, header: Optional[str]):
+        self.kind = kind
+        self.header = header
+        self.items: List[str] = []
+        self.scores: List[float] = []
+
+    def lines(self, items: Optional[Sequence[str]] = None) -> List[str]:
+        lines = [self.header] if self.header is not None else []
+        lines.extend(self.items if items is None else items)
+        return lines
+
+
+class AcademicContext:
+    """Database context for one turn, rendered to the prompt string on demand"""
+
+    def __init__(self):
+        self.sections: List[ContextSection] = []
+        # Raw FAQ search results, best first, whether or not they made the cut
+        self.hits: List[Dict] = []
+
+    def faq_section(self, header: str) -> ContextSection:
+        """The FAQ section, created under header if there is none yet"""
+        for section in self.sections:
+            if section.kind == 'faq':
+                return section
+        section = ContextSection('faq', header)
+        self.sections.append(section)
+        return section
+
+    def add_faq(self, header: str, question: str, answer: str, score: float = 0.0):
+        section = self.faq_section(header)
+        section.items.append(f"Q: {question}\nA: {answer}\n")
+        section.scores.append(score)
+
+    def add_block(self, block: Sequence[str]):
+        """Pre-rendered data block: header line followed by item lines"""
+        if not block:
+            return
+        section = ContextSection('data', block[0])
+        section.items.extend(block[1:])
+        self.sections.append(section)
+
+    def __bool__(self) -> bool:
+        return bool(self.sections)
+
+    def render(self, selected: Optional[Dict[int, List[str]]] = None) -> str:
+        """The context string; selected maps section positions to the items to keep"""
+        lines = []
+        for i, section in enumerate(self.sections):
+            items = selected.get(i) if selected is not None else None
+            if selected is not None and not items:
+                continue
+            lines.extend(section.lines(items))
+        return "\n".join(lines) if lines else NO_DATA
+
+
+class PromptStats:
+    __slots__ = ('chars', 'tokens', 'budget', 'faq_tokens', 'data_tokens', 'history_tokens',
+                 'dropped_faqs', 'dropped_lines', 'dropped_turns', 'truncated')
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.chars = self.tokens = 0
+        self.faq_tokens = self.data_tokens = self.history_tokens = 0
+        self.dropped_faqs = self.dropped_lines = self.dropped_turns = 0
+        self.truncated = False
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def format_history(turns: Sequence[Tuple[str, str]]) -> str:
+    return "\n".join(f"User: {user}\nBot: {bot}" for user, bot in turns)
+
+
+class PromptBuilder:
+    """Fits instructions, ranked FAQs, structured data and history into a token budget
+
+    The template and the question are always sent whole. What remains of
+    the budget is split by PROMPT_FAQ_SHARE / PROMPT_DATA_SHARE /
+    PROMPT_HISTORY_SHARE; a part that needs less than its share hands the
+    rest to the others, FAQs first. When everything fits the prompt is
+    exactly the untrimmed one.
+    """
+
+    # A truncated FAQ answer shorter than this is noise, so it is dropped instead
+    MIN_PARTIAL_TOKENS = 24
+
+    def __init__(self, budget: Optional[int] = None, faq_share: Optional[float] = None,
+                 data_share: Optional[float] = None, history_share: Optional[float] = None):
+        self.budget = budget or int(os.getenv("PROMPT_TOKEN_BUDGET", "2000"))
+        self.shares = {
+            'faq': faq_share if faq_share is not None else float(os.getenv("PROMPT_FAQ_SHARE", "0.5")),
+            'data': data_share if data_share is not None else float(os.getenv("PROMPT_DATA_SHARE", "0.3")),
+            'history': history_share if history_share is not None else float(
+                os.getenv("PROMPT_HISTORY_SHARE", "0.2")
+            ),
+        }
+        self.log = os.getenv("PROMPT_LOG", "1") not in ('0', 'false', 'no')
+        self.last_stats: Optional[PromptStats] = None
+
+    @staticmethod
+    def uses_knowledge_template(db_context: str) -> bool:
+        # If no relevant database context found, let Gemini use its knowledge as last resort
+        return len(db_context.strip()) < 50 or "No specific data found" in db_context
+
+    def _allocate(self, available: int, needs: Dict[str, int]) -> Dict[str, int]:
+        """Per-part token allowance: shares first, leftovers to the parts still short"""
+        total_share = sum(self.shares.values()) or 1.0
+        grants = {
+            part: min(need, int(available * self.shares[part] / total_share))
+            for part, need in needs.items()
+        }
+        spare = available - sum(grants.values())
+        for part in ('faq', 'data', 'history'):
+            extra = min(spare, needs[part] - grants[part])
+            grants[part] += extra
+            spare -= extra
+        return grants
+
+    def _fit_faqs(self, section: ContextSection, allowance: int, stats: PromptStats) -> List[str]:
+        ranked = sorted(range(len(section.items)), key=lambda i: -section.scores[i])
+        kept, used = [], 0
+        for position, i in enumerate(ranked):
+            item = section.items[i]
+            cost = estimate_tokens(item)
+            if used + cost <= allowance:
+                kept.append(item)
+                used += cost
+                continue
+            room = allowance - used
+            if room >= self.MIN_PARTIAL_TOKENS:
+                kept.append(truncate_to_tokens(item.rstrip("\n"), room) + "\n")
+                stats.truncated = True
+                position += 1
+            stats.dropped_faqs += len(ranked) - position
+            break
+        return kept
+
+    def _fit_lines(self, section: ContextSection, allowance: int, stats: PromptStats) -> List[str]:
+        kept, used = [], 0
+        for position, line in enumerate(section.items):
+            cost = estimate_tokens(line)
+            # Keep room for the summary line of whatever is left out
+            if used + cost + 6 > allowance and position < len(section.items) - 1:
+                remaining = len(section.items) - position
+                stats.dropped_lines += remaining
+                # A block with no room for a single line is left out entirely
+                if kept:
+                    kept.append(f"- {ELLIPSIS} and {remaining} more")
+                break
+            kept.append(line)
+            used += cost
+        return kept
+
+    def _fit_history(self, turns: Sequence[Tuple[str, str]], allowance: int,
+                     stats: PromptStats) -> List[Tuple[str, str]]:
+        """Most recent turns first; a long bot reply is shortened rather than
+        losing the turn"""
+        kept, used = [], 0
+        for user, bot in reversed(turns):
+            cost = estimate_tokens(f"User: {user}\nBot: {bot}")
+            if used + cost > allowance:
+                room = allowance - used - estimate_tokens(f"User: {user}\nBot:")
+                if room >= self.MIN_PARTIAL_TOKENS:
+                    kept.append((user, truncate_to_tokens(bot, room)))
+                    stats.truncated = True
+                stats.dropped_turns += len(turns) - len(kept)
+                break
+            kept.append((user, bot))
+            used += cost
+        return list(reversed(kept))
+
+    def build(self, message: str, context: AcademicContext,
+              turns: Sequence[Tuple[str, str]]) -> str:
+        stats = PromptStats(self.budget)
+        full_context = context.render()
+        use_knowledge = self.uses_knowledge_template(full_context)
+        template = KNOWLEDGE_TEMPLATE if use_knowledge else CONTEXT_TEMPLATE
+
+        faq_sections = [] if use_knowledge else [
+            (i, s) for i, s in enumerate(context.sections) if s.kind == 'faq'
+        ]
+        data_sections = [] if use_knowledge else [
+            (i, s) for i, s in enumerate(context.sections) if s.kind == 'data'
+        ]
+        needs = {
+            'faq': sum(estimate_tokens("\n".join(s.lines())) for _, s in faq_sections),
+            'data': sum(estimate_tokens("\n".join(s.lines())) for _, s in data_sections),
+            'history': estimate_tokens(format_history(turns)),
+        }
+        fixed = estimate_tokens(template.format(db_context="", history="", message=message))
+        available = max(0, self.budget - fixed)
+
+        if sum(needs.values()) <= available:
+            db_context, history = full_context, format_history(turns)
+            stats.faq_tokens, stats.data_tokens = needs['faq'], needs['data']
+        else:
+            grants = self._allocate(available, needs)
+            selected = {}
+            for kind, parts, fit in (('faq', faq_sections, self._fit_faqs),
+                                     ('data', data_sections, self._fit_lines)):
+                for i, section in parts:
+                    header_cost = estimate_tokens(section.header or "")
+                    selected[i] = fit(section, max(0, grants[kind] - header_cost), stats)
+                    cost = estimate_tokens("\n".join(section.lines(selected[i])))
+                    grants[kind] -= cost
+                    setattr(stats, f"{kind}_tokens", getattr(stats, f"{kind}_tokens") + cost)
+            db_context = context.render(selected)
+            history = format_history(self._fit_history(turns, grants['history'], stats))
+        stats.history_tokens = estimate_tokens(history)
+
+        prompt = template.format(
+            db_context=db_context,
+            history=history if history else NO_HISTORY,
+            message=message
+        )
+        stats.chars = len(prompt)
+        stats.tokens = estimate_tokens(prompt)
+        self.last_stats = stats
+        if self.log:
+            dropped = stats.dropped_faqs + stats.dropped_lines + stats.dropped_turns
+            print(f"Prompt: {stats.chars} chars, ~{stats.tokens}/{stats.budget} tokens "
+                  f"(faq {stats.faq_tokens}, data {stats.data_tokens}, history {stats.history_tokens})"
+                  + (f", trimmed {dropped} items" if dropped or stats.truncated else ""))
+        return prompt
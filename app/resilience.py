@@ -0,0 +1,203 @@
+"""
+Failure-handling primitives for calls to an upstream service
+CircuitBreaker stops calling an endpoint that keeps failing and lets a single
+probe through once it has had time to recover; ConcurrencyLimiter caps calls
+in flight and bounds how long a caller queues for a slot; backoff_delay and
+is_retryable drive retries
+"""
+from typing import Dict, Optional
+import asyncio
+import random
+import threading
+import time
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# HTTP statuses worth another attempt: timeouts, rate limiting, server errors
+RETRYABLE_STATUS = frozenset([408, 429, 500, 502, 503, 504])
+
+# Failures to reach the endpoint at all. OSError covers socket errors and
+# requests (which the Gemini SDK uses); httpx errors derive from Exception
+TRANSPORT_ERRORS = (OSError, asyncio.TimeoutError) + ((httpx.TransportError,) if HTTPX_AVAILABLE else ())
+
+
+class CircuitOpenError(Exception):
+    """The breaker is open; the call was not attempted"""
+
+
+class QueueTimeoutError(Exception):
+    """No in-flight slot became free within the queue timeout"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient failures: timeouts, transport errors and retryable HTTP statuses"""
+    if isinstance(error, (CircuitOpenError, QueueTimeoutError)):
+        return False
+    # google-genai APIError and most HTTP client errors carry the status as
+    # .code or .status_code; requests' HTTPError on its response
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    if isinstance(error, TRANSPORT_ERRORS):
+        return True
+    return bool(getattr(error, 'retryable', False))
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: random.Random = random) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]"""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures, stays open for
+    reset_seconds, then admits one probe call: success closes it, failure
+    reopens it"""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError("circuit breaker is open")
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """Give up a half-open probe without a verdict, so another can run"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class ConcurrencyLimiter:
+    """At most max_in_flight concurrent holders; callers queue up to
+    queue_timeout seconds for a slot
+
+    Threads wait on a semaphore and coroutines on an asyncio.Semaphore of
+    the running loop, each sized max_in_flight; a worker serves chat from
+    one event loop, so the async side is the one that matters.
+    """
+
+    def __init__(self, max_in_flight: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self._threads = threading.BoundedSemaphore(max_in_flight)
+        self._loop = None
+        self._tasks: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.queue_timeouts = 0
+
+    def _adjust(self, in_flight: int = 0, queued: int = 0):
+        with self._lock:
+            self.in_flight += in_flight
+            self.queued += queued
+
+    def acquire(self):
+        self._adjust(queued=1)
+        try:
+            acquired = self._threads.acquire(timeout=self.queue_timeout)
+        finally:
+            self._adjust(queued=-1)
+        if not acquired:
+            self.queue_timeouts += 1
+            raise QueueTimeoutError(f"no LLM slot free within {self.queue_timeout:g}s")
+        self._adjust(in_flight=1)
+
+    def release(self):
+        self._adjust(in_flight=-1)
+        self._threads.release()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # asyncio primitives belong to one loop; a new loop (tests,
+            # benchmarks calling asyncio.run repeatedly) gets its own
+            self._loop, self._tasks = loop, asyncio.Semaphore(self.max_in_flight)
+        return self._tasks
+
+    async def aacquire(self) -> asyncio.Semaphore:
+        semaphore = self._semaphore()
+        self._adjust(queued=1)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queue_timeouts += 1
+            raise QueueTimeoutError(f"no LLM slot free within {self.queue_timeout:g}s") from None
+        finally:
+            self._adjust(queued=-1)
+        self._adjust(in_flight=1)
+        return semaphore
+
+    def arelease(self, semaphore: asyncio.Semaphore):
+        self._adjust(in_flight=-1)
+        semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "queue_timeout_seconds": self.queue_timeout,
+            "queue_timeouts": self.queue_timeouts,
+        }
@@ -0,0 +1,123 @@
+"""
+LRU + TTL cache for generated chat answers
+Keys combine the normalized question, the intent, a hash of the database
+context and the recent history window, so an answer is only reused when the
+model would have seen the same prompt inputs
+"""
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import hashlib
+import os
+import re
+import threading
+import time
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Rough per-entry bookkeeping cost on top of the key and value strings
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(_PUNCTUATION.sub(" ", question.lower()).split())
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with TTL expiry and a byte budget"""
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.enabled = os.getenv("RESPONSE_CACHE_ENABLED", "1") not in ('0', 'false', 'no')
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("RESPONSE_CACHE_ENTRIES", "1024")
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024))
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")
+        )
+        # key -> (value, size in bytes, expiry on the monotonic clock)
+        self._entries: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(question: str, intent: str, db_context: str, history: str) -> str:
+        parts = (normalize_question(question), intent, fingerprint(db_context), fingerprint(history))
+        return fingerprint("\x1f".join(parts))
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: str):
+        if not self.enabled:
+            return
+        size = len(key) + len(value.encode('utf-8')) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, table: Optional[str] = None):
+        """Drop every entry; called when FAQs, courses or assignments change"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,149 @@
+"""
+Hybrid FAQ retrieval
+Runs the lexical, BM25, semantic and category retrievers concurrently over a
+single tokenization of the query and fuses their rankings. Each retriever has
+a latency budget; results that arrive after it are dropped, so one slow
+retriever cannot hold up the chat response. Each retriever has threads of its
+own, and while all of them are still busy with earlier queries it is skipped,
+so a retriever that is slow on every query only ever costs itself
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional, Tuple
+import os
+import threading
+import time
+
+from .text_processing import QueryTerms
+
+# Intents that have a matching FAQ category
+CATEGORY_INTENTS = ['timetable', 'exam', 'faculty', 'course', 'assignment']
+
+DEFAULT_WEIGHTS = {'legacy': 1.0, 'bm25': 1.0, 'semantic': 1.0, 'category': 0.5}
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "legacy=1,bm25=1.5" into a weight table on top of the defaults"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        weights[name.strip()] = float(value)
+    return weights
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict]], weights: Dict[str, float], k: int = 60) -> Dict[str, float]:
+    """sum(weight / (k + rank)) over every ranking a FAQ appears in"""
+    fused: Dict[str, float] = {}
+    for name, results in rankings.items():
+        weight = weights.get(name, 1.0)
+        for rank, result in enumerate(results, start=1):
+            fused[result['faq_id']] = fused.get(result['faq_id'], 0.0) + weight / (k + rank)
+    return fused
+
+
+def weighted_score_fusion(rankings: Dict[str, List[Dict]], weights: Dict[str, float]) -> Dict[str, float]:
+    """Min-max normalize each retriever's scores, then take the weighted sum"""
+    fused: Dict[str, float] = {}
+    for name, results in rankings.items():
+        if not results:
+            continue
+        weight = weights.get(name, 1.0)
+        scores = [result['score'] for result in results]
+        low, high = min(scores), max(scores)
+        span = (high - low) or 1.0
+        for result in results:
+            normalized = (result['score'] - low) / span if high > low else 1.0
+            fused[result['faq_id']] = fused.get(result['faq_id'], 0.0) + weight * normalized
+    return fused
+
+
+class HybridRetriever:
+    """Concurrent retrievers with per-retriever latency budgets and rank fusion"""
+
+    def __init__(self, retrievers: Dict[str, Callable[[QueryTerms, Optional[str], int], List[Dict]]],
+                 budgets_ms: Optional[Dict[str, float]] = None):
+        self.retrievers = retrievers
+        self.fusion = os.getenv("HYBRID_FUSION", "rrf").lower()
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+        self.depth = int(os.getenv("HYBRID_DEPTH", "20"))
+        self.weights = _parse_weights(os.getenv("HYBRID_WEIGHTS", ""))
+        default_budget = float(os.getenv("HYBRID_BUDGET_MS", "50"))
+        self.budgets_ms = {name: default_budget for name in retrievers}
+        self.budgets_ms.update(budgets_ms or {})
+        self.threads = int(os.getenv("HYBRID_RETRIEVER_THREADS", "4"))
+        # Over budget, and not run because all its threads were busy
+        self.dropped: Dict[str, int] = {name: 0 for name in retrievers}
+        self.skipped: Dict[str, int] = {name: 0 for name in retrievers}
+        self._running: Dict[str, int] = {name: 0 for name in retrievers}
+        self._lock = threading.Lock()
+        self._executors = {
+            name: ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix=f"retriever-{name}")
+            for name in retrievers
+        }
+
+    def _submit(self, name: str, terms: QueryTerms, intent: Optional[str]):
+        """Start the retriever, or None while all of its threads are taken"""
+        with self._lock:
+            if self._running[name] >= self.threads:
+                self.skipped[name] += 1
+                return None
+            self._running[name] += 1
+        future = self._executors[name].submit(self.retrievers[name], terms, intent, self.depth)
+        future.add_done_callback(lambda _: self._finished(name))
+        return future
+
+    def _finished(self, name: str):
+        with self._lock:
+            self._running[name] -= 1
+
+    def search(self, query: str, limit: int = 5, intent: Optional[str] = None) -> List[Dict]:
+        """Fused top FAQs; each result lists the retrievers that returned it"""
+        terms = QueryTerms(query)
+        start = time.monotonic()
+        futures = {}
+        for name in self.retrievers:
+            future = self._submit(name, terms, intent)
+            if future is not None:
+                futures[name] = future
+
+        rankings: Dict[str, List[Dict]] = {}
+        for name, future in sorted(futures.items(), key=lambda item: self.budgets_ms[item[0]]):
+            remaining = start + self.budgets_ms[name] / 1000 - time.monotonic()
+            try:
+                rankings[name] = future.result(timeout=max(0.0, remaining))
+            except FutureTimeout:
+                # Stops it if it never started; a running call finishes on
+                # its own thread and is counted against the retriever
+                future.cancel()
+                self.dropped[name] += 1
+            except Exception as e:
+                print(f"Retriever '{name}' failed: {e}")
+
+        if self.fusion == 'weighted':
+            fused = weighted_score_fusion(rankings, self.weights)
+        else:
+            fused = reciprocal_rank_fusion(rankings, self.weights, self.rrf_k)
+
+        details: Dict[str, Tuple[Dict, List[str]]] = {}
+        for name, results in rankings.items():
+            for result in results:
+                entry = details.setdefault(result['faq_id'], (result, []))
+                entry[1].append(name)
+
+        ranked = sorted(fused.items(), key=lambda item: -item[1])[:limit]
+        return [
+            {
+                'faq_id': faq_id,
+                'question': details[faq_id][0]['question'],
+                'answer': details[faq_id][0]['answer'],
+                'score': score,
+                'sources': details[faq_id][1]
+            }
+            for faq_id, score in ranked
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "dropped": dict(self.dropped),
+            "skipped": dict(self.skipped),
+            "running": dict(self._running),
+        }
@@ -0,0 +1,187 @@
+"""
+Near-duplicate query cache in front of the LLM
+Questions are reduced to MinHash signatures of their content words and
+indexed with LSH banding, so "nlp see exam, when is it?" can reuse the answer
+given to "When is the NLP SEE exam?" when both were asked against the same
+context. Similar wording is not enough on its own: the words that pick one
+answer over another (numbers such as "ia2" or "7th", and the days,
+assessments, courses, faculty and dates the entity extractor found) must be
+the same in both questions
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import os
+import random
+import threading
+import time
+
+from .text_processing import tokenize
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _shingles(text: str) -> Set[str]:
+    """Content words, so word order and filler words do not matter"""
+    return set(tokenize(text))
+
+
+# Entity types whose values must match exactly for a cached answer to apply
+EXACT_ENTITY_TYPES = ('days', 'assessments', 'courses', 'faculty', 'dates')
+
+
+def exact_terms(text: str, entities: Optional[Dict] = None) -> Tuple[str, ...]:
+    """Digit-bearing words and extracted entities of a question, which a
+    near-duplicate must share exactly"""
+    terms = {word for word in tokenize(text) if any(c.isdigit() for c in word)}
+    for entity_type in EXACT_ENTITY_TYPES:
+        for value in (entities or {}).get(entity_type, ()):
+            if isinstance(value, dict):
+                value = f"{value.get('start')}..{value.get('end')}"
+            terms.add(f"{entity_type}:{value}")
+    return tuple(sorted(terms))
+
+
+def _base_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class _Entry:
+    __slots__ = ('signature', 'context', 'exact', 'answer', 'expires')
+
+    def __init__(self, signature, context, exact, answer, expires):
+        self.signature = signature
+        self.context = context
+        self.exact = exact
+        self.answer = answer
+        self.expires = expires
+
+
+class SemanticCache:
+    """Bounded MinHash/LSH index from answered questions to their answers"""
+
+    def __init__(self, num_perm: Optional[int] = None, bands: Optional[int] = None,
+                 threshold: Optional[float] = None, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "1") not in ('0', 'false', 'no')
+        self.num_perm = num_perm or int(os.getenv("SEMANTIC_CACHE_PERMUTATIONS", "64"))
+        self.bands = bands or int(os.getenv("SEMANTIC_CACHE_BANDS", "32"))
+        if self.num_perm % self.bands:
+            raise ValueError("SEMANTIC_CACHE_PERMUTATIONS must be a multiple of SEMANTIC_CACHE_BANDS")
+        self.rows = self.num_perm // self.bands
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8")
+        )
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_ENTRIES", "2048"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600")
+        )
+
+        rng = random.Random(1)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(self.num_perm)
+        ]
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[int, ...], Set[int]]] = [{} for _ in range(self.bands)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        shingles = _shingles(text)
+        if not shingles:
+            return None
+        hashes = [_base_hash(s) for s in shingles]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _bands_of(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def lookup(self, question: str, context: str, entities: Optional[Dict] = None) -> Optional[str]:
+        """Cached answer of the most similar question asked against the same
+        context, with the same exact_terms"""
+        if not self.enabled:
+            return None
+        signature = self.signature(question)
+        exact = exact_terms(question, entities)
+        with self._lock:
+            self.lookups += 1
+            if signature is None:
+                return None
+            candidates: Set[int] = set()
+            for band, key in self._bands_of(signature):
+                candidates.update(self._buckets[band].get(key, ()))
+
+            now = time.monotonic()
+            best_id, best_similarity = None, self.threshold
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.context != context or entry.exact != exact or entry.expires < now:
+                    continue
+                similarity = sum(x == y for x, y in zip(signature, entry.signature)) / self.num_perm
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].answer
+
+    def add(self, question: str, context: str, answer: str, entities: Optional[Dict] = None):
+        if not self.enabled:
+            return
+        signature = self.signature(question)
+        if signature is None:
+            return
+        exact = exact_terms(question, entities)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(signature, context, exact, answer,
+                                             time.monotonic() + self.ttl_seconds)
+            for band, key in self._bands_of(signature):
+                self._buckets[band].setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for band, key in self._bands_of(entry.signature):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def invalidate(self, table: Optional[str] = None):
+        with self._lock:
+            self._entries.clear()
+            self._buckets = [{} for _ in range(self.bands)]
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,239 @@
+"""
+Dense-vector semantic retrieval over FAQs
+Each FAQ is embedded once with a local CPU encoder (a sentence-transformers
+model when installed and selected, otherwise hashed bag-of-n-grams) and the
+vectors are kept in a memory-mapped, versioned .npy file so restarts do not
+re-embed the corpus. Vector files are named by their contents and the meta
+file names the one it describes, so workers building at the same time can
+never pair one's vectors with another's meta
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from .text_processing import tokenize
+
+# Bump whenever the encoders or the on-disk layout change
+INDEX_FORMAT_VERSION = 2
+
+
+class HashedNgramEncoder:
+    """Feature-hashed word uni/bigrams and character trigrams, L2-normalized"""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hashed-ngram-{dim}"
+
+    def _features(self, words: Sequence[str]) -> List[Tuple[str, float]]:
+        features = [(f"w:{w}", 1.0) for w in words]
+        features.extend((f"b:{a} {b}", 0.7) for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.extend((f"c:{padded[i:i + 3]}", 0.3) for i in range(len(padded) - 2))
+        return features
+
+    def encode(self, texts: Sequence[str]) -> "np.ndarray":
+        return self.encode_tokens([tokenize(text) for text in texts])
+
+    def encode_tokens(self, token_lists: Sequence[Sequence[str]]) -> "np.ndarray":
+        """Encode already tokenized texts"""
+        vectors = np.zeros((len(token_lists), self.dim), dtype=np.float32)
+        for row, words in enumerate(token_lists):
+            for feature, weight in self._features(words):
+                # crc32 is stable across processes, unlike hash()
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += weight if (h >> 31) & 1 else -weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerEncoder:
+    """Local sentence-transformers model pinned to CPU"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name.replace('/', '_')}"
+
+    def encode(self, texts: Sequence[str]) -> "np.ndarray":
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=64, normalize_embeddings=True),
+            dtype=np.float32
+        )
+
+
+def load_encoder():
+    """Encoder selected by SEMANTIC_ENCODER, falling back to hashed n-grams"""
+    choice = os.getenv("SEMANTIC_ENCODER", "hashed").lower()
+    if choice in ('sentence-transformers', 'st'):
+        model_name = os.getenv("SEMANTIC_MODEL", "all-MiniLM-L6-v2")
+        try:
+            return SentenceTransformerEncoder(model_name)
+        except Exception as e:
+            print(f"Warning: sentence-transformers encoder unavailable ({e}), using hashed n-grams")
+    return HashedNgramEncoder(int(os.getenv("SEMANTIC_DIM", "1024")))
+
+
+def _document_text(record) -> str:
+    return f"{record.question}\n{record.keywords or ''}\n{record.answer}"
+
+
+def _content_hash(record) -> str:
+    return hashlib.sha1(_document_text(record).encode('utf-8')).hexdigest()
+
+
+class SemanticIndex:
+    """Memory-mapped FAQ embedding matrix with matrix-vector top-k search"""
+
+    def __init__(self, index_dir: Optional[str] = None, encoder=None):
+        self.index_dir = index_dir or os.getenv("SEMANTIC_INDEX_DIR", ".semantic_index")
+        self._encoder = encoder
+        self.generation = -1
+        self.records: List = []
+        self.matrix = None
+        self._lock = threading.Lock()
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = load_encoder()
+        return self._encoder
+
+    def _paths(self) -> Tuple[str, str]:
+        """(vectors file prefix, meta path)"""
+        base = os.path.join(self.index_dir, f"faq_vectors.{self.encoder.name}.v{INDEX_FORMAT_VERSION}")
+        return base + ".", base + ".json"
+
+    def _replace(self, path: str, write, suffix: str, mode: str = "wb"):
+        """Write to a temp file of this process's own, then rename it over path"""
+        with tempfile.NamedTemporaryFile(mode, dir=self.index_dir, suffix=suffix, delete=False) as f:
+            tmp_path = f.name
+            try:
+                write(f)
+            except BaseException:
+                f.close()
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+
+    def ensure(self, faq_index):
+        """Sync the vectors with the FAQ index contents"""
+        if self.generation != faq_index.generation:
+            with self._lock:
+                if self.generation != faq_index.generation:
+                    generation = faq_index.generation
+                    self.build(faq_index.snapshot())
+                    self.generation = generation
+
+    def build(self, records: Sequence):
+        """Load vectors from disk, embedding only FAQs that are new or changed"""
+        records = list(records)
+        hashes = [_content_hash(record) for record in records]
+        vectors_prefix, meta_path = self._paths()
+
+        cached: Dict[str, int] = {}
+        stored = None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get('format_version') == INDEX_FORMAT_VERSION and meta.get('encoder') == self.encoder.name:
+                stored = np.load(os.path.join(self.index_dir, meta['vectors']), mmap_mode='r')
+                if stored.shape[0] != len(meta['content_hashes']):
+                    raise ValueError("vectors do not match their meta")
+                cached = {h: i for i, h in enumerate(meta['content_hashes'])}
+        except (OSError, ValueError, KeyError):
+            stored = None
+
+        if stored is not None and hashes == meta['content_hashes']:
+            self.records, self.matrix = records, stored
+            return
+
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        matrix = np.zeros((len(records), self.encoder.dim), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            if h in cached:
+                matrix[i] = stored[cached[h]]
+        for start in range(0, len(missing), 256):
+            batch = missing[start:start + 256]
+            matrix[batch] = self.encoder.encode([_document_text(records[i]) for i in batch])
+        print(f"Semantic index: embedded {len(missing)} of {len(records)} FAQs")
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        digest = hashlib.sha1("\n".join(hashes).encode()).hexdigest()[:16]
+        vectors_path = vectors_prefix + digest + ".npy"
+        self._replace(vectors_path, lambda f: np.save(f, matrix), ".npy")
+        self._replace(meta_path, lambda f: json.dump({
+            'format_version': INDEX_FORMAT_VERSION,
+            'encoder': self.encoder.name,
+            'dim': self.encoder.dim,
+            'vectors': os.path.basename(vectors_path),
+            'faq_ids': [record.faq_id for record in records],
+            'content_hashes': hashes,
+        }, f), ".json", "w")
+        self._remove_stale(vectors_prefix, vectors_path)
+
+        try:
+            matrix = np.load(vectors_path, mmap_mode='r')
+        except (OSError, ValueError):
+            # Removed by a worker that installed newer vectors meanwhile
+            pass
+        self.records, self.matrix = records, matrix
+
+    def _remove_stale(self, vectors_prefix: str, keep: str):
+        """Best effort: files still mapped (on Windows) or already gone are skipped"""
+        directory, prefix = os.path.split(vectors_prefix)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith(prefix) and name.endswith(".npy") and path != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def top_k_batch(self, queries: Sequence[str], limit: int,
+                    tokens: Optional[Sequence[Sequence[str]]] = None) -> List[List[Tuple[int, float]]]:
+        """(document index, cosine) pairs per query, from one matrix product
+
+        tokens, when given, are the queries' tokenize() output; encoders
+        that work on tokens reuse them instead of tokenizing again.
+        """
+        records, matrix = self.records, self.matrix
+        if matrix is None or not len(records) or limit <= 0:
+            return [[] for _ in queries]
+        if tokens is not None and hasattr(self.encoder, 'encode_tokens'):
+            query_vectors = self.encoder.encode_tokens(tokens)
+        else:
+            query_vectors = self.encoder.encode(queries)
+        scores = query_vectors @ matrix.T
+        k = min(limit, len(records))
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top], kind='stable')]
+            results.append([(int(i), float(row[i])) for i in top if row[i] > 0])
+        return results
+
+    def search(self, query: str, limit: int = 5, tokens: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Top FAQs by cosine similarity, same result shape as the legacy search"""
+        records = self.records
+        return [
+            {
+                'faq_id': records[doc].faq_id,
+                'question': records[doc].question,
+                'answer': records[doc].answer,
+                'score': score
+            }
+            for doc, score in self.top_k_batch([query], limit, [tokens] if tokens is not None else None)[0]
+        ]
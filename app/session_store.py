@@ -0,0 +1,445 @@
+"""
+Conversation history stores
+Bounded replacements for the per-process history dict: a capped LRU store
+with idle expiry, a variant that rehydrates sessions from chat_history, and
+stores shared by every worker (SQLite in WAL mode, or a Redis-compatible
+server) with write-behind batching
+"""
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import select
+
+from .database import SessionLocal
+from . import models
+
+
+class Turn:
+    """One user/bot exchange"""
+    __slots__ = ('user', 'bot', 'timestamp')
+
+    def __init__(self, user: str, bot: str, timestamp: Optional[float] = None):
+        self.user = user
+        self.bot = bot
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+
+class SessionStore:
+    """Interface used by DynamicChatbotService for conversation context"""
+
+    def get_history(self, session_id: str) -> List[Turn]:
+        """Most recent turns of a session, oldest first"""
+        raise NotImplementedError
+
+    def append(self, session_id: str, user_msg: str, bot_msg: str):
+        raise NotImplementedError
+
+    def clear(self, session_id: str):
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {}
+
+    def close(self):
+        """Flush pending writes and release resources"""
+
+
+class _Session:
+    __slots__ = ('turns', 'last_access')
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.last_access = time.monotonic()
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store capped by session count, with LRU and idle-TTL eviction"""
+
+    def __init__(self, max_sessions: Optional[int] = None, idle_ttl: Optional[float] = None,
+                 max_turns: Optional[int] = None):
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+        self.max_turns = max_turns or int(os.getenv("SESSION_MAX_TURNS", "10"))
+        # Ordered by last access, least recent first
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _touch(self, session_id: str) -> Optional[_Session]:
+        """Fetch a live session and mark it most recently used (lock held)"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if now - session.last_access > self.idle_ttl:
+            del self._sessions[session_id]
+            self.expirations += 1
+            return None
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire_idle(self):
+        """Drop idle sessions from the least recently used end (lock held)"""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.expirations += 1
+
+    def _load(self, session_id: str) -> Optional[List[Turn]]:
+        """Hook for stores that can rehydrate a session missing from memory"""
+        return None
+
+    def get_history(self, session_id: str) -> List[Turn]:
+        with self._lock:
+            session = self._touch(session_id)
+            if session is not None:
+                return list(session.turns)
+        turns = self._load(session_id)
+        if not turns:
+            return []
+        with self._lock:
+            session = self._touch(session_id)
+            if session is None:
+                session = self._insert(session_id)
+                session.turns.extend(turns)
+            return list(session.turns)
+
+    def _insert(self, session_id: str) -> _Session:
+        """Create a session, evicting the least recently used beyond the cap (lock held)"""
+        self._expire_idle()
+        session = self._sessions[session_id] = _Session(self.max_turns)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+        return session
+
+    def append(self, session_id: str, user_msg: str, bot_msg: str):
+        turn = Turn(user_msg, bot_msg)
+        with self._lock:
+            session = self._touch(session_id) or self._insert(session_id)
+            session.turns.append(turn)
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": type(self).__name__,
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class DatabaseSessionStore(InMemorySessionStore):
+    """In-memory store that rehydrates unknown sessions from the chat_history table
+
+    The chat endpoints already persist every turn to chat_history, so a
+    session started on another worker (or before a restart) is picked up
+    from there the first time this worker sees it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rehydrated = 0
+
+    def _load(self, session_id: str) -> Optional[List[Turn]]:
+        table = models.ChatHistory
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(table.user_message, table.bot_response, table.created_at)
+                .where(table.session_id == session_id)
+                .order_by(table.id.desc())
+                .limit(self.max_turns)
+            ).all()
+        except Exception as e:
+            print(f"Session rehydrate error: {e}")
+            return None
+        finally:
+            db.close()
+        if rows:
+            self.rehydrated += 1
+        return [
+            Turn(user, bot, created_at.timestamp() if created_at else None)
+            for user, bot, created_at in reversed(rows)
+        ]
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["rehydrated"] = self.rehydrated
+        return stats
+
+
+class WriteBehindSessionStore(SessionStore):
+    """Base for shared stores: reads are one round trip, appends are batched
+
+    Appends go to a local buffer that a background thread flushes every
+    SESSION_FLUSH_INTERVAL_MS or as soon as SESSION_FLUSH_BATCH turns are
+    waiting. Reads merge the buffer in, so a worker always sees its own
+    writes; other workers see them after the next flush. While the backend
+    is down the buffer keeps at most SESSION_MAX_PENDING turns, dropping the
+    oldest.
+    """
+
+    def __init__(self, max_turns: Optional[int] = None, idle_ttl: Optional[float] = None):
+        self.max_turns = max_turns or int(os.getenv("SESSION_MAX_TURNS", "10"))
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+        self.flush_interval = float(os.getenv("SESSION_FLUSH_INTERVAL_MS", "50")) / 1000
+        self.flush_batch = int(os.getenv("SESSION_FLUSH_BATCH", "64"))
+        self.max_pending = int(os.getenv("SESSION_MAX_PENDING", "10000"))
+        self._pending: List[Tuple[str, Turn]] = []
+        self._pending_lock = threading.Lock()
+        # Held from taking a batch to writing it, so clear() cannot run
+        # between the two and have the batch resurrect the cleared turns
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self.flushes = 0
+        self.flushed_turns = 0
+        self.dropped = 0
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # Backend operations -------------------------------------------------
+
+    def _read(self, session_id: str) -> List[Turn]:
+        raise NotImplementedError
+
+    def _write(self, batch: List[Tuple[str, Turn]]):
+        raise NotImplementedError
+
+    def _delete(self, session_id: str):
+        raise NotImplementedError
+
+    # SessionStore --------------------------------------------------------
+
+    def get_history(self, session_id: str) -> List[Turn]:
+        turns = self._read(session_id)
+        with self._pending_lock:
+            turns.extend(turn for sid, turn in self._pending if sid == session_id)
+        return turns[-self.max_turns:]
+
+    def _trim_pending(self):
+        # Caller holds _pending_lock
+        excess = len(self._pending) - self.max_pending
+        if excess > 0:
+            del self._pending[:excess]
+            self.dropped += excess
+
+    def append(self, session_id: str, user_msg: str, bot_msg: str):
+        with self._pending_lock:
+            self._pending.append((session_id, Turn(user_msg, bot_msg)))
+            self._trim_pending()
+            if len(self._pending) >= self.flush_batch:
+                self._wakeup.set()
+
+    def clear(self, session_id: str):
+        with self._flush_lock:
+            with self._pending_lock:
+                self._pending = [(sid, turn) for sid, turn in self._pending if sid != session_id]
+            # Synchronous, so a clear is visible to every worker immediately
+            self._delete(session_id)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                self._write(batch)
+                self.flushes += 1
+                self.flushed_turns += len(batch)
+            except Exception as e:
+                print(f"Session flush error: {e}")
+                # Retried with the next flush, within the max_pending cap
+                with self._pending_lock:
+                    self._pending[:0] = batch
+                    self._trim_pending()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+
+    def _count(self) -> int:
+        """Sessions currently stored in the backend"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        try:
+            sessions = self._count()
+        except Exception:
+            # Backend unreachable; its errors already surface on reads and flushes
+            sessions = None
+        return {
+            "backend": type(self).__name__,
+            "sessions": sessions,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_turns": self.flushed_turns,
+            "dropped": self.dropped,
+            "idle_ttl_seconds": self.idle_ttl,
+        }
+
+
+class SQLiteSessionStore(WriteBehindSessionStore):
+    """Session turns in a local SQLite file in WAL mode, shared by all workers on the host"""
+
+    def __init__(self, path: Optional[str] = None, **kwargs):
+        self.path = path or os.getenv("SESSION_DB_PATH", "sessions.db")
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_turns ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT NOT NULL,"
+            " user_msg TEXT NOT NULL,"
+            " bot_msg TEXT NOT NULL,"
+            " ts REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_session_turns_session ON session_turns (session_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_session_turns_ts ON session_turns (ts)")
+        conn.commit()
+        self._last_sweep = time.monotonic()
+        super().__init__(**kwargs)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(DISTINCT session_id) FROM session_turns").fetchone()[0]
+
+    def _count(self) -> int:
+        return len(self)
+
+    def _read(self, session_id: str) -> List[Turn]:
+        rows = self._connection().execute(
+            "SELECT user_msg, bot_msg, ts FROM session_turns"
+            " WHERE session_id = ? AND ts >= ? ORDER BY id DESC LIMIT ?",
+            (session_id, time.time() - self.idle_ttl, self.max_turns)
+        ).fetchall()
+        return [Turn(user, bot, ts) for user, bot, ts in reversed(rows)]
+
+    def _write(self, batch: List[Tuple[str, Turn]]):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO session_turns (session_id, user_msg, bot_msg, ts) VALUES (?, ?, ?, ?)",
+                [(sid, turn.user, turn.bot, turn.timestamp) for sid, turn in batch]
+            )
+            # Keep only the newest max_turns turns of every session just written
+            conn.executemany(
+                "DELETE FROM session_turns WHERE session_id = ? AND id NOT IN ("
+                " SELECT id FROM session_turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                [(sid, sid, self.max_turns) for sid in {sid for sid, _ in batch}]
+            )
+            if time.monotonic() - self._last_sweep > 60:
+                conn.execute("DELETE FROM session_turns WHERE ts < ?", (time.time() - self.idle_ttl,))
+                self._last_sweep = time.monotonic()
+
+    def _delete(self, session_id: str):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["path"] = self.path
+        return stats
+
+
+class RedisSessionStore(WriteBehindSessionStore):
+    """Session turns in Redis lists, one key per session
+
+    client is anything implementing the redis-py calls used here
+    (pipeline, rpush, ltrim, expire, lrange, delete, ping, scan_iter), so a local stand-in
+    such as fakeredis works for tests.
+    """
+
+    def __init__(self, client, prefix: str = "chat:session:", **kwargs):
+        self.client = client
+        self.prefix = prefix
+        super().__init__(**kwargs)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def _read(self, session_id: str) -> List[Turn]:
+        raw = self.client.lrange(self._key(session_id), -self.max_turns, -1)
+        return [Turn(*json.loads(item)) for item in raw]
+
+    def _write(self, batch: List[Tuple[str, Turn]]):
+        pipe = self.client.pipeline()
+        touched = set()
+        for sid, turn in batch:
+            pipe.rpush(self._key(sid), json.dumps([turn.user, turn.bot, turn.timestamp]))
+            touched.add(sid)
+        ttl = max(1, int(self.idle_ttl))
+        for sid in touched:
+            pipe.ltrim(self._key(sid), -self.max_turns, -1)
+            pipe.expire(self._key(sid), ttl)
+        pipe.execute()
+
+    def _delete(self, session_id: str):
+        self.client.delete(self._key(session_id))
+
+    def _count(self) -> int:
+        # SCAN walks the keyspace in batches instead of blocking Redis like KEYS
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}*", count=1000))
+
+
+def create_session_store() -> SessionStore:
+    """Session store selected by SESSION_STORE (memory | database | sqlite | redis)"""
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "database":
+        return DatabaseSessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "redis":
+        try:
+            import redis
+            client = redis.Redis.from_url(os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0"))
+            # from_url does not connect; make an unreachable server fail here
+            client.ping()
+            return RedisSessionStore(client)
+        except Exception as e:
+            print(f"Warning: Redis session store unavailable ({e}), using memory")
+            return InMemorySessionStore()
+    if backend != "memory":
+        print(f"Warning: unknown SESSION_STORE '{backend}', using memory")
+    return InMemorySessionStore()
@@ -0,0 +1,133 @@
+"""
+Single-flight coalescing of identical in-flight work
+When many students ask the same question at the same moment, their prompts
+are identical; the first caller for a key (the leader) makes the upstream
+call and everyone arriving while it runs waits for that result instead of
+making their own. Sync callers (threads) and async callers (tasks) share the
+same flights, and a leader's exception is raised in every waiter
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import asyncio
+import os
+import threading
+
+
+class SingleFlightTimeout(TimeoutError):
+    """A waiter gave up on a flight; the flight itself keeps running"""
+
+
+class SingleFlight:
+    """Registry of in-flight calls keyed by a caller-chosen fingerprint"""
+
+    def __init__(self, timeout_seconds: Optional[float] = None, enabled: Optional[bool] = None):
+        self.timeout_seconds = timeout_seconds if timeout_seconds is not None else float(
+            os.getenv("SINGLEFLIGHT_TIMEOUT_SECONDS", "60")
+        )
+        self.enabled = enabled if enabled is not None else (
+            os.getenv("SINGLEFLIGHT_ENABLED", "1") not in ('0', 'false', 'no')
+        )
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _join(self, key: Hashable):
+        """(future, is_leader) for key, registering a new flight if none is running"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _land(self, key: Hashable, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        # Unregister first: a caller arriving after this starts a fresh flight
+        # rather than receiving a result computed before its request
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+        if error is not None:
+            self.errors += 1
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """fn() for the leader; the leader's result (or exception) for everyone else
+
+        timeout bounds how long a waiter blocks; the leader runs fn to
+        completion on its own thread.
+        """
+        if not self.enabled:
+            return fn()
+        future, leader = self._join(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._land(key, future, error=e)
+                raise
+            self._land(key, future, result)
+            return result
+        try:
+            return future.result(timeout=self.timeout_seconds if timeout is None else timeout)
+        except FutureTimeoutError as e:
+            if future.done():
+                raise  # the leader's own error
+            raise self._timed_out(key) from e
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                  timeout: Optional[float] = None) -> Any:
+        """Async do(): fn() is awaited as a task of its own
+
+        Cancelling or timing out a caller, the leader included, does not
+        cancel the shared call, so the other waiters still get its result.
+        """
+        if not self.enabled:
+            return await fn()
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(fn())
+
+            def land(task: "asyncio.Task"):
+                if task.cancelled():
+                    self._land(key, future, error=RuntimeError("identical in-flight request was cancelled"))
+                elif task.exception() is not None:
+                    self._land(key, future, error=task.exception())
+                else:
+                    self._land(key, future, task.result())
+            task.add_done_callback(land)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                self.timeout_seconds if timeout is None else timeout
+            )
+        except asyncio.TimeoutError as e:
+            if future.done():
+                raise
+            raise self._timed_out(key) from e
+
+    def _timed_out(self, key: Hashable) -> SingleFlightTimeout:
+        self.timeouts += 1
+        return SingleFlightTimeout(f"timed out waiting for an identical in-flight request ({key})")
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "timeout_seconds": self.timeout_seconds,
+        }
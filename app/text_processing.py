@@ -0,0 +1,34 @@
+"""
+Shared text normalization for the retrieval components
+"""
+from typing import List
+import re
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset([
+    'a', 'about', 'all', 'am', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by',
+    'can', 'could', 'did', 'do', 'does', 'for', 'from', 'give', 'has', 'have',
+    'how', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'please',
+    's', 'show', 'so', 'tell', 'that', 'the', 'their', 'there', 'these', 'this',
+    'to', 'us', 'was', 'we', 'were', 'what', 'whats', 'which', 'will', 'with',
+    'would', 'you', 'your',
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens with stopwords removed"""
+    if not text:
+        return []
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class QueryTerms:
+    """One tokenization pass over a query, shared by every retriever"""
+    __slots__ = ('text', 'lower', 'words', 'tokens')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        self.words = self.lower.split()
+        self.tokens = tokenize(text)
@@ -0,0 +1,65 @@
+"""
+Concurrent chat throughput: blocking pipeline vs the async pipeline
+
+Fires N concurrent chat turns at one event loop, the way uvicorn serves them
+from a single worker, against the offline LLM provider behind a fixed
+simulated latency.
+"blocking" calls generate_response inside the coroutine (the old endpoint);
+"async" awaits agenerate_response.
+
+Usage (from the repository root, after seeding feedback.db):
+    python -m benchmarks.async_chat --requests 50 --latency-ms 500
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./feedback.db')
+
+from app.chatbot_service_dynamic import DynamicChatbotService
+from app.llm_providers import OfflineProvider, SimulatedProvider
+
+
+def make_service(latency, error_rate=0.0):
+    service = DynamicChatbotService()
+    # Offline answers behind the simulator stand in for Gemini
+    service.llm = SimulatedProvider(OfflineProvider(), latency_ms=latency * 1000, error_rate=error_rate, seed=1)
+    # Every request must reach the LLM
+    service.response_cache.enabled = False
+    service.semantic_cache.enabled = False
+    service.extractive_enabled = False
+    service.warm_up()
+    return service
+
+
+async def run(service, mode, requests):
+    async def one(i):
+        message = "When is the SEE exam for NLP?"
+        intent, _ = service.classify_intent(message)
+        entities = service.extract_entities(message, intent)
+        if mode == "blocking":
+            return service.generate_response(message, intent, entities, str(uuid.uuid4()))
+        return await service.agenerate_response(message, intent, entities, str(uuid.uuid4()))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat throughput benchmark")
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=500)
+    args = parser.parse_args()
+
+    service = make_service(args.latency_ms / 1000)
+    print(f"{args.requests} concurrent requests, simulated LLM latency {args.latency_ms:.0f} ms\n")
+    for mode in ("blocking", "async"):
+        elapsed = asyncio.run(run(service, mode, args.requests))
+        print(f"{mode:>9}: {elapsed:7.2f} s total, {args.requests / elapsed:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+/api/chatbot/chat latency with inline chat_history commits vs the write-behind writer
+
+Drives the real FastAPI app in-process (httpx ASGI transport, N concurrent
+clients) against a copy of feedback.db with the offline LLM provider, so
+the numbers isolate the request path.
+"inline" writes every turn on the request (the writer disabled); "batched"
+queues it for the background writer. After each run the writer is flushed
+and the saved rows are counted to confirm nothing was lost.
+
+Usage (from the repository root, after seeding feedback.db):
+    python -m benchmarks.chat_latency --requests 300 --concurrency 16 --profile tuned
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+# Next to feedback.db rather than in /tmp, which may be RAM-backed
+_workdir = tempfile.mkdtemp(prefix="chat-latency-", dir=".")
+shutil.copy("feedback.db", os.path.join(_workdir, "feedback.db"))
+os.environ['DATABASE_URL'] = f"sqlite:///{_workdir}/feedback.db"
+if "--profile" in sys.argv:
+    os.environ['SQLITE_PROFILE'] = sys.argv[sys.argv.index("--profile") + 1]
+
+import httpx
+
+from app.main import app
+from app.chat_writer import chat_writer
+from app.chatbot_service_dynamic import dynamic_chatbot_service
+from app.database import SessionLocal
+from app import models
+from app.llm_providers import OfflineProvider
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(client, headers, user_id, name, requests, concurrency):
+    db = SessionLocal()
+    before = db.query(models.ChatHistory).filter(models.ChatHistory.user_id == user_id).count()
+    db.close()
+
+    latencies = []
+    pending = iter(range(requests))
+
+    async def worker():
+        for i in pending:
+            start = time.perf_counter()
+            response = await client.post('/api/chatbot/chat', headers=headers,
+                                         json={'message': f"When is the SEE exam for NLP? ({name} {i})"})
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    chat_writer.flush()
+    db = SessionLocal()
+    saved = db.query(models.ChatHistory).filter(models.ChatHistory.user_id == user_id).count() - before
+    db.close()
+    print(f"{name:>8}: p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.2f} ms  rows saved {saved}/{requests}")
+
+
+async def bench(args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        username = "bench" + uuid.uuid4().hex[:6]
+        response = await client.post('/api/auth/register', json={
+            'username': username, 'email': f"{username}@example.com",
+            'password': 'bench', 'full_name': 'Bench'
+        })
+        headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+        user_id = (await client.get('/api/auth/me', headers=headers)).json()['id']
+
+        chat_writer.enabled = False
+        await run(client, headers, user_id, "inline", args.requests, args.concurrency)
+        chat_writer.enabled = True
+        await run(client, headers, user_id, "batched", args.requests, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--profile', default=os.getenv('SQLITE_PROFILE', 'default'),
+                        help='SQLITE_PROFILE for the copied database')
+    args = parser.parse_args()
+
+    dynamic_chatbot_service.llm = OfflineProvider()
+    dynamic_chatbot_service.warm_up()
+    asyncio.run(bench(args))
+    chat_writer.close()
+    print(f"writer: {chat_writer.stats()}")
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+FAQ access cost per chat turn: fresh sqlite3 connection vs pooled read engine vs in-process index
+
+"connect" is the old path (sqlite3.connect on a relative path, read every
+FAQ, close); "pooled" runs the same read on a checked-out connection of the
+read-only engine; "category-sql" is the per-turn category LIKE query through
+the ORM session; "in-process" is the FAQ index lookup that replaced it and
+touches no SQL at all.
+
+Usage (from the repository root, after seeding feedback.db):
+    python -m benchmarks.db_access --repeat 2000
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./feedback.db')
+
+from sqlalchemy import event
+
+from app.database import DATABASE_URL, SessionLocal, read_engine
+from app import models
+from app.chatbot_service_dynamic import DynamicChatbotService
+
+connects = {'count': 0}
+
+
+@event.listens_for(read_engine, "connect")
+def _count_connect(dbapi_connection, connection_record):
+    connects['count'] += 1
+
+
+def raw_connect(path):
+    def load():
+        connects['count'] += 1
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT faq_id, question, answer, keywords, category FROM faqs").fetchall()
+        finally:
+            conn.close()
+    return load
+
+
+def category_sql():
+    db = SessionLocal()
+    try:
+        return db.query(models.FAQ).filter(models.FAQ.category.like('%exam%')).limit(3).all()
+    finally:
+        db.close()
+
+
+def run(name, func, repeat):
+    before = connects['count']
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    opened = connects['count'] - before
+    print(f"{name:>12}: {repeat / elapsed:>10.0f} ops/s  {elapsed / repeat * 1e6:8.1f} us/op  "
+          f"connections opened: {opened}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    service = DynamicChatbotService()
+    service.faq_index.build()
+
+    run("connect", raw_connect(DATABASE_URL.replace('sqlite:///', '')), args.repeat)
+    run("pooled", service._load_faq_rows, args.repeat)
+    run("category-sql", category_sql, args.repeat)
+    run("in-process", lambda: service.faq_index.by_category('exam', 3), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Share of chat traffic the extractive fast path absorbs, and its latency
+
+Replays a mix of questions through agenerate_answer against the offline LLM
+provider behind a simulated latency: every seeded FAQ question verbatim and
+lowercased without punctuation (paraphrases a student might type), plus
+questions no FAQ answers. Caches are off so each turn takes its real path.
+Prints the per-path latency histograms with the fast path off and on.
+
+Usage (from the repository root, after seeding feedback.db):
+    python -m benchmarks.extractive --latency-ms 800 --mode bm25
+"""
+import argparse
+import asyncio
+import os
+import re
+import uuid
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./feedback.db')
+
+from app.database import SessionLocal
+from app import models
+from app.metrics import Histogram
+from benchmarks.async_chat import make_service
+
+OPEN_QUESTIONS = [
+    "Can you explain how the NLP syllabus connects to the major project?",
+    "What should I revise first for the exams?",
+    "Is there any event this week?",
+    "How do I prepare for the quantum computing internals?",
+]
+
+
+def load_questions():
+    db = SessionLocal()
+    try:
+        questions = [faq.question for faq in db.query(models.FAQ.question)]
+    finally:
+        db.close()
+    paraphrases = [re.sub(r"[^\w\s]", "", q).lower() for q in questions]
+    return questions + paraphrases + OPEN_QUESTIONS * 4
+
+
+async def replay(service, questions):
+    for message in questions:
+        intent, _ = service.classify_intent(message)
+        entities = service.extract_entities(message, intent)
+        await service.agenerate_answer(message, intent, entities, str(uuid.uuid4()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extractive fast path benchmark")
+    parser.add_argument('--latency-ms', type=float, default=800)
+    parser.add_argument('--mode', default=os.getenv("FAQ_RETRIEVAL_MODE", "legacy"),
+                        choices=['legacy', 'bm25', 'semantic', 'hybrid'])
+    args = parser.parse_args()
+
+    service = make_service(args.latency_ms / 1000)
+    service.retrieval_mode = args.mode
+    questions = load_questions()
+    print(f"{len(questions)} questions, {args.mode} retrieval, simulated LLM latency {args.latency_ms:.0f} ms\n")
+
+    for enabled in (False, True):
+        service.extractive_enabled = enabled
+        service.path_latency = {source: Histogram() for source in service.path_latency}
+        asyncio.run(replay(service, questions))
+        print(f"fast path {'on' if enabled else 'off'}:")
+        for source, histogram in service.path_latency.items():
+            if histogram.count:
+                stats = histogram.stats()
+                print(f"  {source:>10}: {stats['count']:4d} turns ({stats['count'] / len(questions):5.1%})  "
+                      f"p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare FAQ retrieval modes on relevance and speed
+
+Usage (from the repository root, after seeding feedback.db):
+    python -m benchmarks.faq_retrieval
+    python -m benchmarks.faq_retrieval --scale 50   # replicate the corpus 50x
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./feedback.db')
+
+from app.chatbot_service_dynamic import DynamicChatbotService
+
+SAMPLE_QUERIES = [
+    "When is the SEE exam for NLP?",
+    "when's the quantum final",
+    "What are the textbooks for Business Intelligence?",
+    "What are the CLOs for NLP?",
+    "What topics are covered in NLP Module 1?",
+    "Who is the HOD?",
+    "What is the attendance requirement?",
+    "When is IA2?",
+    "What is the data mining syllabus?",
+    "Tell me about the major project",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1, help='replicate the FAQ corpus N times')
+    parser.add_argument('--repeat', type=int, default=20, help='timed passes over the query set')
+    parser.add_argument('--modes', default='legacy,bm25,semantic,hybrid')
+    args = parser.parse_args()
+
+    service = DynamicChatbotService()
+    rows = service._load_faq_rows()
+    if args.scale > 1:
+        base = list(rows)
+        rows = [(f"{r[0]}#{i}",) + tuple(r[1:]) for i in range(args.scale) for r in base]
+    service.faq_index.loader = lambda: rows
+    service.faq_index.build()
+    print(f"Corpus: {len(service.faq_index)} FAQs\n")
+
+    for mode in args.modes.split(','):
+        service.search_database_enhanced("warm up", mode=mode)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for query in SAMPLE_QUERIES:
+                service.search_database_enhanced(query, limit=3, mode=mode)
+        per_query = (time.perf_counter() - start) / (args.repeat * len(SAMPLE_QUERIES))
+        print(f"=== {mode}: {per_query * 1000:.3f} ms/query ===")
+        for query in SAMPLE_QUERIES:
+            top = service.search_database_enhanced(query, limit=3, mode=mode)
+            print(f"  {query}")
+            for result in top:
+                print(f"      {result['score']:8.2f}  {result['faq_id']}: {result['question']}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
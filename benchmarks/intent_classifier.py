@@ -0,0 +1,117 @@
+"""
+Intent classification throughput: chained substring scans vs compiled regex
+
+"chain" is the original classify_intent (one `any(word in msg)` scan per
+intent, which often stops early on a false positive such as "hi" in "this");
+"chain+re" is the same chain with a word-boundary regex per intent, i.e. the
+cost of getting the answers right that way; "compiled" is IntentClassifier,
+which finds every keyword hit in a single pass. Also lists the messages on which the two disagree, which are
+mostly the substring false positives ("this" -> greeting, "via" -> exam).
+
+Usage (from the repository root):
+    python -m benchmarks.intent_classifier --repeat 20000
+"""
+import argparse
+import time
+
+from app.intent_classifier import IntentClassifier
+
+MESSAGES = [
+    "Hello!",
+    "When is the IA1 for NLP?",
+    "What is this subject about?",
+    "Can I submit the assignment via email?",
+    "Show me the timetable for Monday",
+    "Who is the HOD of the department?",
+    "What are the attendance policies?",
+    "Thanks, bye",
+    "What is the syllabus of Quantum Computing?",
+    "When is the term paper deadline for BI?",
+    "Tell me about the lab exams",
+    "What courses are there this semester?",
+    "Which professor teaches data mining?",
+    "Is there a seminar this week?",
+    "What is the minimum marks to pass?",
+]
+
+
+CHAIN_KEYWORDS = [
+    ("greeting", ['hello', 'hi', 'hey', 'greetings']),
+    ("farewell", ['bye', 'goodbye', 'thanks', 'thank you']),
+    ("timetable", ['timetable', 'schedule', 'class']),
+    ("faculty", ['faculty', 'teacher', 'professor', 'hod']),
+    ("exam", ['exam', 'test', 'ia', 'assessment']),
+    ("assignment", ['assignment', 'deadline', 'seminar', 'term paper']),
+    ("course", ['course', 'subject', 'syllabus']),
+    ("attendance", ['attendance', 'policy']),
+]
+
+
+def chain_classify(message):
+    msg_lower = message.lower()
+    if any(word in msg_lower for word in ['hello', 'hi', 'hey', 'greetings']):
+        return "greeting", 0.95
+    elif any(word in msg_lower for word in ['bye', 'goodbye', 'thanks', 'thank you']):
+        return "farewell", 0.95
+    elif any(word in msg_lower for word in ['timetable', 'schedule', 'class']):
+        return "timetable", 0.90
+    elif any(word in msg_lower for word in ['faculty', 'teacher', 'professor', 'hod']):
+        return "faculty", 0.90
+    elif any(word in msg_lower for word in ['exam', 'test', 'ia', 'assessment']):
+        return "exam", 0.90
+    elif any(word in msg_lower for word in ['assignment', 'deadline', 'seminar', 'term paper']):
+        return "assignment", 0.90
+    elif any(word in msg_lower for word in ['course', 'subject', 'syllabus']):
+        return "course", 0.90
+    elif any(word in msg_lower for word in ['attendance', 'policy']):
+        return "attendance", 0.90
+    else:
+        return "general", 0.70
+
+
+def bounded_chain(classifier):
+    """The chain with a word-boundary regex per intent, i.e. without the false positives"""
+    import re
+    patterns = []
+    for intent, keyword_list in CHAIN_KEYWORDS:
+        alternatives = "|".join(re.escape(k) for k in keyword_list)
+        patterns.append((intent, re.compile(rf"\b(?:{alternatives})(?:es|s|\d+)?\b")))
+
+    def classify(message):
+        msg_lower = message.lower()
+        for intent, pattern in patterns:
+            if pattern.search(msg_lower):
+                return intent, classifier.base_confidence[intent]
+        return "general", 0.70
+    return classify
+
+
+def run(name, classify, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            classify(message)
+    elapsed = time.perf_counter() - start
+    calls = repeat * len(MESSAGES)
+    print(f"{name:>9}: {calls / elapsed:>10.0f} msgs/s  {elapsed / calls * 1e6:6.2f} us/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    classifier = IntentClassifier.from_config()
+    run("chain", chain_classify, args.repeat)
+    run("chain+re", bounded_chain(classifier), args.repeat)
+    run("compiled", classifier.classify, args.repeat)
+
+    print("\nDisagreements:")
+    for message in MESSAGES:
+        old, new = chain_classify(message), classifier.classify(message)
+        if old[0] != new[0]:
+            print(f"  {message!r}: chain={old[0]} compiled={new[0]} ({new[1]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Upstream LLM calls for a burst of identical questions, with and without
+single-flight coalescing
+
+The simulated LLM provider counts its calls. N students ask the same
+question at the same moment, through the async path (one event loop) and the
+sync path (one thread each); with coalescing on, every burst should cost one
+call. A provider that always fails checks that the leader's error reaches
+every waiter: each request should come back as a fallback answer while the
+provider is called once per burst.
+
+Usage (from the repository root, after seeding feedback.db):
+    python -m benchmarks.singleflight --requests 50 --latency-ms 300
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./feedback.db')
+
+from app.llm_providers import OfflineProvider, SimulatedProvider
+from benchmarks.async_chat import make_service
+
+MESSAGE = "When is the SEE exam for NLP?"
+
+
+def burst(service, path, requests):
+    """(answer, source) for each of the concurrent requests"""
+    intent, _ = service.classify_intent(MESSAGE)
+    entities = service.extract_entities(MESSAGE, intent)
+    if path == "async":
+        async def run():
+            return await asyncio.gather(*(
+                service.agenerate_answer(MESSAGE, intent, entities, str(uuid.uuid4()))
+                for _ in range(requests)
+            ))
+        return asyncio.run(run())
+    with ThreadPoolExecutor(max_workers=requests) as pool:
+        return list(pool.map(
+            lambda _: service.generate_answer(MESSAGE, intent, entities, str(uuid.uuid4())),
+            range(requests)
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-flight coalescing benchmark")
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    args = parser.parse_args()
+
+    service = make_service(args.latency_ms / 1000)
+    print(f"{args.requests} identical concurrent questions, simulated LLM latency {args.latency_ms:.0f} ms\n")
+    print(f"{'path':>6} {'coalescing':>10} {'upstream calls':>15} {'elapsed':>9}")
+    for path in ("async", "sync"):
+        for enabled in (False, True):
+            service.llm_flights.enabled = enabled
+            service.llm = SimulatedProvider(OfflineProvider(), latency_ms=args.latency_ms)
+            start = time.perf_counter()
+            burst(service, path, args.requests)
+            elapsed = time.perf_counter() - start
+            print(f"{path:>6} {'on' if enabled else 'off':>10} {service.llm.calls:>15} {elapsed:>8.2f}s")
+
+    service.llm_flights.enabled = True
+    print("\nError propagation (failing provider):")
+    for path in ("async", "sync"):
+        service.llm = SimulatedProvider(OfflineProvider(), latency_ms=args.latency_ms, error_rate=1.0)
+        answers = burst(service, path, args.requests)
+        failed = sum(source == 'fallback' for _, source in answers)
+        print(f"{path:>6}: {service.llm.calls} upstream call(s), {failed}/{len(answers)} requests fell back")
+    print(f"\n{service.llm_flights.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Concurrent chat_history writes under the default and tuned SQLite profiles
+
+Each profile gets a fresh database file. W writer threads each save N chat
+turns the way the chat endpoint does (one ORM insert + commit per turn)
+while R reader threads keep paging through chat_history, and the run
+reports commit throughput, commit latency and "database is locked" errors.
+
+Usage (from the repository root):
+    python -m benchmarks.sqlite_profiles --writers 8 --turns 200 --readers 2
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./feedback.db')
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, SQLITE_PROFILES, create_sqlite_engine
+from app import models
+
+
+def run_profile(profile, args):
+    directory = tempfile.mkdtemp(prefix=f"sqlite-{profile}-")
+    engine = create_sqlite_engine(f"sqlite:///{directory}/bench.db", profile)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    user = models.User(username="bench", email="bench@example.com", hashed_password="x",
+                       full_name="Bench", role="student")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    latencies, errors, lock = [], [0], threading.Lock()
+    writing = threading.Event()
+    writing.set()
+
+    def writer(worker):
+        for turn in range(args.turns):
+            db = Session()
+            start = time.perf_counter()
+            try:
+                db.add(models.ChatHistory(
+                    user_id=user_id, session_id=f"s{worker}", user_message=f"question {turn}",
+                    bot_response="answer " * 40, intent="exam", confidence=0.9,
+                    entities=json.dumps({"course": "22AML71"})
+                ))
+                db.commit()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    errors[0] += 1
+            finally:
+                db.close()
+
+    def reader():
+        while writing.is_set():
+            db = Session()
+            try:
+                db.query(models.ChatHistory).filter(models.ChatHistory.user_id == user_id)\
+                    .order_by(models.ChatHistory.created_at.desc()).limit(50).all()
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+            finally:
+                db.close()
+
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    writers = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    start = time.perf_counter()
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    writing.clear()
+    for thread in readers:
+        thread.join()
+    engine.dispose()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    print(f"{profile:>8}: {len(latencies) / elapsed:8.0f} commits/s  "
+          f"p50 {statistics.median(latencies) * 1000 if latencies else 0:7.2f} ms  "
+          f"p95 {p95 * 1000:7.2f} ms  locked errors: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--turns', type=int, default=200, help='commits per writer')
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--profiles', default=",".join(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    for profile in args.profiles.split(','):
+        run_profile(profile, args)
+
+
+if __name__ == "__main__":
+    main()
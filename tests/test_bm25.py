@@ -0,0 +1,70 @@
+import pytest
+
+from app import bm25
+from app.bm25 import BM25Index
+from app.faq_index import FAQRecord
+
+ROWS = [
+    ("LIB001", "When is the library open?", "The library is open 9am to 8pm", "library timings", "facility"),
+    ("EXM001", "When are the IA exams?", "IA1 is in September and IA2 in November", "ia exam schedule", "exam"),
+    ("FEE001", "What are the hostel fees?", "Hostel fees are paid at the library counter", "hostel fees", "fees"),
+    ("NLP001", "Who teaches NLP?", "Dr. Rao teaches NLP", "nlp faculty", "faculty"),
+]
+
+
+def records(rows):
+    return [FAQRecord(row, order) for order, row in enumerate(rows)]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def index(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(bm25, "NUMPY_AVAILABLE", False)
+    index = BM25Index(k1=1.2, b=0.75)
+    index.build(records(ROWS))
+    return index
+
+
+def test_question_and_keyword_matches_outrank_answer_mentions(index):
+    results = index.search("library timings")
+    assert [faq["faq_id"] for faq in results] == ["LIB001", "FEE001"]
+    assert results[0]["score"] > results[1]["score"] > 0
+
+
+def test_rarer_terms_weigh_more(index):
+    # "when" is in two questions, "nlp" only in one
+    assert index.search("when nlp")[0]["faq_id"] == "NLP001"
+
+
+def test_limit_and_unknown_terms(index):
+    assert len(index.search("library hostel nlp exams", limit=2)) == 2
+    assert index.search("library", limit=0) == []
+    assert index.search("zebra") == []
+    assert index.search("what is the") == []
+
+
+def test_both_paths_score_alike():
+    numpy_index = BM25Index()
+    numpy_index.build(records(ROWS))
+    python_index = BM25Index()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(bm25, "NUMPY_AVAILABLE", False)
+        python_index.build(records(ROWS))
+    for query in ["library timings", "ia exam", "hostel fees library"]:
+        expected = python_index.search(query)
+        actual = numpy_index.search(query)
+        assert [faq["faq_id"] for faq in actual] == [faq["faq_id"] for faq in expected]
+        assert [faq["score"] for faq in actual] == pytest.approx([faq["score"] for faq in expected], rel=1e-5)
+
+
+@pytest.mark.parametrize("rows", [
+    [],
+    [("S1", "What is it?", "It is.", None, None), ("S2", "Is it?", "", "the", None)],
+])
+def test_empty_and_stopword_only_corpora(rows, index):
+    index.build(records(rows))
+    assert len(index) == len(rows)
+    assert index.search("what is it") == []
+    assert index.search("library") == []
@@ -0,0 +1,63 @@
+import threading
+
+from app import data_events
+from app.faq_index import FAQIndex
+
+ROWS = [
+    ("exam_schedule", "When are the exams?", "See the exam calendar", "exam schedule dates", "exam"),
+    ("nlp_syllabus", "What is the NLP syllabus?", "Five modules", "nlp syllabus modules", "course"),
+    ("library_hours", "When is the library open?", "9am to 8pm", "library timings", "facility"),
+    ("a", "Is it ok?", "Yes", None, None),
+]
+
+
+def brute_force(index, word):
+    return {token for token in index.postings if word in token}
+
+
+def test_substring_lookup_matches_vocabulary_scan():
+    index = FAQIndex(lambda: ROWS, refresh_interval=3600)
+    index.build()
+    for word in ["e", "ex", "exa", "exam", "exams?", "syllabus", "brar", "ok?", "a", "zz", "xyzw", "schedule"]:
+        assert set(index._tokens_containing(word)) == brute_force(index, word), word
+
+
+def test_removed_tokens_leave_the_gram_index():
+    index = FAQIndex(lambda: ROWS, refresh_interval=3600)
+    index.build()
+    index.remove("library_hours")
+    assert index._tokens_containing("librar") == ()
+    assert "library" not in index.grams.get("lib", set())
+    assert all(faq["faq_id"] != "library_hours" for faq in index.search("library timings"))
+
+
+def test_stale_index_reloads_in_the_background():
+    rows = list(ROWS)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return list(rows)
+
+    index = FAQIndex(loader, refresh_interval=3600)
+    index.ensure_fresh()
+    assert len(index) == len(ROWS)
+
+    rows.append(("hostel_fees", "What are the hostel fees?", "Rs 50,000", "hostel fees", "fees"))
+    data_events.bump("faqs")
+
+    # The reload is parked in the loader; queries still see the old index
+    index.ensure_fresh()
+    assert len(index) == len(ROWS)
+    assert all(faq["faq_id"] != "hostel_fees" for faq in index.search("hostel fees"))
+
+    release.set()
+    for _ in range(100):
+        if not index._refreshing:
+            break
+        threading.Event().wait(0.05)
+    assert index.search("hostel fees")[0]["faq_id"] == "hostel_fees"
+    assert len(calls) == 2
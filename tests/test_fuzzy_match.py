@@ -0,0 +1,59 @@
+from difflib import SequenceMatcher
+
+import pytest
+
+from app.faq_index import FAQRecord
+from app.fuzzy_match import FuzzyMatcher, trigram_signature
+
+QUESTIONS = [
+    "When is the library open?",
+    "When are the IA exams?",
+    "What are the hostel fees?",
+    "Who teaches NLP?",
+    "What is the NLP syllabus?",
+]
+QUERY = "when is the library opne"
+
+
+def records():
+    return [FAQRecord((f"Q{i}", q, "", None, None), i) for i, q in enumerate(QUESTIONS)]
+
+
+def exact(query, record):
+    return SequenceMatcher(None, query, record.question_lower).ratio()
+
+
+def test_estimate_is_a_dice_coefficient():
+    signature = trigram_signature("library")
+    assert FuzzyMatcher.estimate(signature, signature) == 1.0
+    assert FuzzyMatcher.estimate(signature, trigram_signature("xyz")) == 0.0
+    assert FuzzyMatcher.estimate(frozenset(), frozenset()) == 0.0
+
+
+def test_unbounded_matcher_reproduces_sequence_matcher():
+    rows = records()
+    matcher = FuzzyMatcher(max_candidates=len(rows), use_quick_ratio=False)
+    assert matcher.similarities(QUERY, rows) == pytest.approx([exact(QUERY, r) for r in rows])
+
+
+def test_only_the_shortlist_gets_the_exact_ratio():
+    rows = records()
+    matcher = FuzzyMatcher(max_candidates=1, use_quick_ratio=False)
+    scores = matcher.similarities(QUERY, rows)
+    signature = trigram_signature(QUERY)
+    assert scores[0] == pytest.approx(exact(QUERY, rows[0]))
+    for record, score in zip(rows[1:], scores[1:]):
+        assert score == pytest.approx(FuzzyMatcher.estimate(signature, record.trigrams))
+
+
+def test_quick_ratio_bound_only_skips_weak_candidates():
+    rows = records()
+    bounded = FuzzyMatcher(max_candidates=len(rows), use_quick_ratio=True, min_ratio=0.5)
+    scores = bounded.similarities(QUERY, rows)
+    for record, score in zip(rows, scores):
+        ratio = exact(QUERY, record)
+        if ratio >= 0.5:
+            assert score == pytest.approx(ratio)
+        else:
+            assert score < 0.5
+    assert max(range(len(rows)), key=scores.__getitem__) == 0
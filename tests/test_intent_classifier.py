@@ -0,0 +1,58 @@
+import pytest
+
+from app.intent_classifier import IntentClassifier
+
+
+@pytest.fixture(scope="module")
+def dynamic():
+    return IntentClassifier.from_config()
+
+
+@pytest.fixture(scope="module")
+def static():
+    return IntentClassifier.from_config(table="static_intents")
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("what is his name", "general"),
+    ("when is his ia", "exam"),
+    ("what is this about", "general"),
+    ("show my chat history", "general"),
+    ("they said so", "general"),
+    ("can I submit via email", "general"),
+    ("hi", "greeting"),
+    ("hi there", "greeting"),
+])
+def test_keywords_match_whole_words(dynamic, message, intent):
+    assert dynamic.classify(message)[0] == intent
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("When are the exams?", "exam"),
+    ("When is IA1?", "exam"),
+    ("Marks for ia-2", "exam"),
+    ("Any classes on Monday?", "timetable"),
+    ("List the assignments", "assignment"),
+    ("Which subjects do we have?", "course"),
+])
+def test_suffixed_keywords_match_plurals_and_numbers(dynamic, message, intent):
+    assert dynamic.classify(message)[0] == intent
+
+
+def test_unsuffixed_keywords_take_no_suffix(dynamic):
+    assert dynamic.classify("his")[0] == "general"
+    assert dynamic.classify("hi5")[0] == "general"
+    assert dynamic.classify("thanksgiving")[0] == "general"
+
+
+@pytest.mark.parametrize("message, dynamic_intent, static_intent", [
+    ("Who is the HOD?", "faculty", "general"),
+    ("Is there a seminar?", "assignment", "general"),
+    ("When is the term paper due?", "assignment", "general"),
+    ("Project submission date", "general", "assignment"),
+    ("Who are the faculties?", "general", "general"),
+    ("What are the policies?", "general", "general"),
+])
+def test_each_service_keeps_its_own_table(dynamic, static, message, dynamic_intent, static_intent):
+    assert dynamic.classify(message)[0] == dynamic_intent
+    assert static.classify(message)[0] == static_intent
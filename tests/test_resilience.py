@@ -0,0 +1,68 @@
+import pytest
+import requests
+
+from app.llm_providers import LLMProvider, ResilientProvider
+from app.resilience import CLOSED, OPEN, CircuitBreaker, CircuitOpenError, is_retryable
+
+
+class FailingProvider(LLMProvider):
+    name = "failing"
+
+    def __init__(self, error: Exception):
+        super().__init__()
+        self.error = error
+
+    def generate(self, prompt):
+        self._count()
+        raise self.error
+
+
+def make_provider(error, failures=3):
+    return ResilientProvider(
+        FailingProvider(error), max_in_flight=2, timeout=5, retries=0, queue_timeout=1,
+        breaker=CircuitBreaker(failure_threshold=failures, reset_seconds=60),
+    )
+
+
+@pytest.mark.parametrize("error", [
+    ConnectionRefusedError(111, "Connection refused"),
+    requests.ConnectionError("connection refused"),
+    OSError("network is unreachable"),
+])
+def test_transport_errors_are_retryable(error):
+    assert is_retryable(error)
+
+
+def test_httpx_transport_errors_are_retryable():
+    httpx = pytest.importorskip("httpx")
+    assert is_retryable(httpx.ConnectError("connection refused"))
+
+
+def test_status_decides_over_error_type():
+    response = requests.Response()
+    response.status_code = 400
+    assert not is_retryable(requests.HTTPError("bad request", response=response))
+    response.status_code = 503
+    assert is_retryable(requests.HTTPError("unavailable", response=response))
+
+
+def test_transport_error_opens_breaker():
+    provider = make_provider(requests.ConnectionError("connection refused"))
+    for _ in range(3):
+        with pytest.raises(requests.ConnectionError):
+            provider.generate("prompt")
+    assert provider.breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        provider.generate("prompt")
+    assert provider.inner.calls == 3
+
+
+def test_non_retryable_error_leaves_breaker_unchanged():
+    provider = make_provider(requests.ConnectionError("connection refused"))
+    with pytest.raises(requests.ConnectionError):
+        provider.generate("prompt")
+    provider.inner.error = ValueError("bad prompt")
+    with pytest.raises(ValueError):
+        provider.generate("prompt")
+    assert provider.breaker.state == CLOSED
+    assert provider.breaker.stats()["consecutive_failures"] == 1
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from app.retrieval import HybridRetriever, reciprocal_rank_fusion, weighted_score_fusion
+
+
+def result(faq_id, score=1.0):
+    return {'faq_id': faq_id, 'question': f"q {faq_id}", 'answer': f"a {faq_id}", 'score': score}
+
+
+def test_rrf_rewards_agreement():
+    fused = reciprocal_rank_fusion({
+        'a': [result('x'), result('y')],
+        'b': [result('y'), result('z')],
+    }, {}, k=60)
+    assert max(fused, key=fused.get) == 'y'
+    assert fused['x'] == pytest.approx(1 / 61)
+    assert fused['z'] == pytest.approx(1 / 62)
+
+
+def test_rrf_weights_scale_contributions():
+    fused = reciprocal_rank_fusion({'a': [result('x')], 'b': [result('y')]}, {'a': 2.0}, k=60)
+    assert fused['x'] == 2 * fused['y']
+
+
+def test_weighted_fusion_normalizes_scores():
+    fused = weighted_score_fusion({'a': [result('x', 10.0), result('y', 5.0)]}, {})
+    assert fused == {'x': 1.0, 'y': 0.0}
+    assert weighted_score_fusion({'a': []}, {}) == {}
+
+
+def test_search_fuses_and_lists_sources():
+    retriever = HybridRetriever({
+        'a': lambda terms, intent, depth: [result('x'), result('y')],
+        'b': lambda terms, intent, depth: [result('y')],
+    }, budgets_ms={'a': 1000, 'b': 1000})
+    results = retriever.search("anything", limit=2)
+    assert [r['faq_id'] for r in results] == ['y', 'x']
+    assert sorted(results[0]['sources']) == ['a', 'b']
+
+
+def test_slow_retriever_only_blocks_itself():
+    release = threading.Event()
+    slow_calls = []
+
+    def slow(terms, intent, depth):
+        slow_calls.append(terms.text)
+        release.wait(5)
+        return [result('slow')]
+
+    retriever = HybridRetriever({
+        'fast': lambda terms, intent, depth: [result('fast')],
+        'slow': slow,
+    }, budgets_ms={'fast': 500, 'slow': 20})
+    try:
+        start = time.monotonic()
+        for i in range(4 * retriever.threads):
+            results = retriever.search(f"query {i}")
+            assert [r['faq_id'] for r in results] == ['fast']
+        # Budget-bound while threads were free, immediate once they were taken
+        assert time.monotonic() - start < 2
+        assert len(slow_calls) == retriever.threads
+        assert retriever.dropped['slow'] == retriever.threads
+        assert retriever.skipped['slow'] == 3 * retriever.threads
+        assert retriever.dropped['fast'] == retriever.skipped['fast'] == 0
+    finally:
+        release.set()
+    time.sleep(0.1)
+    assert retriever.stats()['running'] == {'fast': 0, 'slow': 0}
+    assert {r['faq_id'] for r in retriever.search("after")} == {'fast', 'slow'}
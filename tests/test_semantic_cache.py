@@ -0,0 +1,52 @@
+import pytest
+
+from app.entity_extractor import EntityExtractor
+from app.semantic_cache import SemanticCache, exact_terms
+
+CONTEXT = "context-fingerprint"
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    # Days and assessments are built in; no courses are needed
+    return EntityExtractor(lambda: [])
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(max_entries=16, ttl_seconds=60)
+
+
+def ask(cache, extractor, question):
+    return cache.lookup(question, CONTEXT, extractor.extract(question))
+
+
+def answer(cache, extractor, question, text):
+    cache.add(question, CONTEXT, text, extractor.extract(question))
+
+
+@pytest.mark.parametrize("first, second", [
+    ("what is the timetable for monday for ai ml 7th sem",
+     "what is the timetable for tuesday for ai ml 7th sem"),
+    ("when is ia1 exam date for 7th sem aiml",
+     "when is ia2 exam date for 7th sem aiml"),
+])
+def test_questions_differing_in_a_key_term_miss(cache, extractor, first, second):
+    answer(cache, extractor, first, "first answer")
+    assert ask(cache, extractor, second) is None
+    assert ask(cache, extractor, first) == "first answer"
+
+
+def test_reworded_question_hits(cache, extractor):
+    answer(cache, extractor, "When is the NLP SEE exam?", "SEE answer")
+    assert ask(cache, extractor, "NLP SEE exam, when is it?") == "SEE answer"
+
+
+def test_other_context_misses(cache, extractor):
+    answer(cache, extractor, "When is the NLP SEE exam?", "SEE answer")
+    assert cache.lookup("When is the NLP SEE exam?", "other context") is None
+
+
+def test_exact_terms():
+    assert exact_terms("IA2 for 7th sem") == ("7th", "ia2")
+    assert exact_terms("timetable", {"days": ["monday"]}) == ("days:monday",)
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.faq_index import FAQRecord
+from app.semantic_index import HashedNgramEncoder, SemanticIndex
+
+ROWS = [
+    ("LIB001", "When is the library open?", "The library is open 9am to 8pm", "library timings", "facility"),
+    ("EXM001", "When are the IA exams?", "IA1 is in September and IA2 in November", "ia exam schedule", "exam"),
+    ("FEE001", "What are the hostel fees?", "Rs 50,000 per semester", "hostel fees", "fees"),
+]
+
+
+class CountingEncoder(HashedNgramEncoder):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        return super().encode(texts)
+
+
+def records(rows):
+    return [FAQRecord(row, order) for order, row in enumerate(rows)]
+
+
+def vector_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".npy"))
+
+
+def test_search_ranks_the_closest_faq_first(tmp_path):
+    index = SemanticIndex(str(tmp_path), CountingEncoder())
+    index.build(records(ROWS))
+    results = index.search("library opening timings", limit=2)
+    assert results[0]["faq_id"] == "LIB001"
+    assert len(results) <= 2
+    assert all(faq["score"] > 0 for faq in results)
+
+
+def test_restart_reuses_vectors_and_embeds_only_changes(tmp_path):
+    SemanticIndex(str(tmp_path), CountingEncoder()).build(records(ROWS))
+
+    restarted = SemanticIndex(str(tmp_path), CountingEncoder())
+    restarted.build(records(ROWS))
+    assert restarted.encoder.encoded == 0
+
+    changed = list(ROWS)
+    changed[2] = ("FEE001", "What are the hostel fees?", "Rs 60,000 per semester", "hostel fees", "fees")
+    edited = SemanticIndex(str(tmp_path), CountingEncoder())
+    edited.build(records(changed))
+    assert edited.encoder.encoded == 1
+    assert len(vector_files(tmp_path)) == 1
+    assert edited.search("hostel fees")[0]["faq_id"] == "FEE001"
+
+
+def test_mismatched_files_are_rebuilt(tmp_path):
+    SemanticIndex(str(tmp_path), CountingEncoder()).build(records(ROWS))
+    [name] = vector_files(tmp_path)
+    with open(tmp_path / name, "wb") as f:
+        f.write(b"not a numpy file")
+
+    index = SemanticIndex(str(tmp_path), CountingEncoder())
+    index.build(records(ROWS))
+    assert index.encoder.encoded == len(ROWS)
+    assert index.search("ia exams")[0]["faq_id"] == "EXM001"
+
+
+def test_empty_corpus_and_limits(tmp_path):
+    index = SemanticIndex(str(tmp_path), CountingEncoder())
+    assert index.search("library") == []
+    index.build([])
+    assert index.search("library") == []
+    index.build(records(ROWS))
+    assert index.search("library", limit=0) == []
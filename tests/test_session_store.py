@@ -0,0 +1,162 @@
+import sys
+import types
+
+import pytest
+
+from app.session_store import (
+    InMemorySessionStore, RedisSessionStore, SQLiteSessionStore, create_session_store,
+)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+            return self
+        return queue
+
+    def execute(self):
+        if self.client.down:
+            raise ConnectionError("redis is down")
+        for name, args in self.commands:
+            getattr(self.client, name)(*args)
+
+
+class FakeRedis:
+    """The redis-py calls RedisSessionStore makes, on a dict of lists"""
+
+    def __init__(self):
+        self.lists = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("redis is down")
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+
+    def ltrim(self, key, start, end):
+        items = self.lists.get(key, [])
+        self.lists[key] = items[start:] if end == -1 else items[start:end + 1]
+
+    def expire(self, key, ttl):
+        pass
+
+    def lrange(self, key, start, end):
+        self._check()
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def delete(self, key):
+        self._check()
+        self.lists.pop(key, None)
+
+    def ping(self):
+        self._check()
+        return True
+
+    def scan_iter(self, match, count=None):
+        self._check()
+        prefix = match.rstrip("*")
+        return iter([key for key in self.lists if key.startswith(prefix)])
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_store(request, tmp_path):
+    stores = []
+    client = FakeRedis()
+
+    def make(**kwargs):
+        if request.param == "sqlite":
+            store = SQLiteSessionStore(path=str(tmp_path / "sessions.db"), **kwargs)
+        else:
+            store = RedisSessionStore(client, **kwargs)
+        stores.append(store)
+        return store
+    make.client = client
+    yield make
+    for store in stores:
+        store.close()
+
+
+def history(store, session_id):
+    return [(turn.user, turn.bot) for turn in store.get_history(session_id)]
+
+
+def test_reads_see_pending_and_flushed_turns(make_store):
+    store = make_store(max_turns=3)
+    for i in range(5):
+        store.append("s1", f"q{i}", f"a{i}")
+    assert history(store, "s1") == [("q2", "a2"), ("q3", "a3"), ("q4", "a4")]
+    store.flush()
+    assert store.stats()["pending"] == 0
+    # Another worker's store on the same backend sees the flushed turns
+    assert history(make_store(max_turns=3), "s1") == [("q2", "a2"), ("q3", "a3"), ("q4", "a4")]
+
+
+def test_clear_removes_pending_and_flushed_turns(make_store):
+    store = make_store()
+    store.append("s1", "q0", "a0")
+    store.flush()
+    store.append("s1", "q1", "a1")
+    store.append("s2", "other", "kept")
+    store.clear("s1")
+    store.flush()
+    assert history(store, "s1") == []
+    assert history(store, "s2") == [("other", "kept")]
+
+
+def test_stats_count_stored_sessions(make_store):
+    store = make_store()
+    store.append("s1", "q0", "a0")
+    store.append("s2", "q1", "a1")
+    store.append("s2", "q2", "a2")
+    store.flush()
+    assert store.stats()["sessions"] == 2
+
+
+def test_pending_is_capped_while_backend_is_down(monkeypatch):
+    monkeypatch.setenv("SESSION_MAX_PENDING", "10")
+    # Keep the background flusher out of the way; the test flushes itself
+    monkeypatch.setenv("SESSION_FLUSH_INTERVAL_MS", "60000")
+    monkeypatch.setenv("SESSION_FLUSH_BATCH", "1000")
+    client = FakeRedis()
+    store = RedisSessionStore(client)
+    try:
+        client.down = True
+        for i in range(25):
+            store.append(f"s{i % 3}", f"q{i}", f"a{i}")
+            store.flush()
+        stats = store.stats()
+        assert stats["pending"] == 10
+        assert stats["dropped"] == 15
+        assert stats["sessions"] is None
+
+        client.down = False
+        store.flush()
+        assert store.stats()["pending"] == 0
+        # The newest turns survived
+        assert history(store, "s0")[-1] == ("q24", "a24")
+    finally:
+        store.close()
+
+
+def test_unreachable_redis_falls_back_to_memory(monkeypatch):
+    def from_url(url):
+        client = FakeRedis()
+        client.down = True
+        return client
+
+    fake_redis = types.ModuleType("redis")
+    fake_redis.Redis = types.SimpleNamespace(from_url=from_url)
+    monkeypatch.setitem(sys.modules, "redis", fake_redis)
+    monkeypatch.setenv("SESSION_STORE", "redis")
+    assert isinstance(create_session_store(), InMemorySessionStore)
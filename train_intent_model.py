@@ -0,0 +1,152 @@
+"""
+Train, evaluate and export the intent model
+
+Training data: labeled messages from chat_history, the seeded FAQ questions
+(labeled by category) and the keyword tables from app/intent_keywords.json.
+
+Usage:
+    python train_intent_model.py train [--out intent_model.npz]
+    python train_intent_model.py evaluate [--model intent_model.npz]
+    python train_intent_model.py export --model intent_model.npz --out small.npz --dtype float16
+"""
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+
+from dotenv import load_dotenv
+load_dotenv()
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./feedback.db')
+
+from app.database import SessionLocal
+from app import models
+from app.intent_classifier import IntentClassifier, DEFAULT_KEYWORDS_PATH
+from app.intent_model import IntentModel
+
+# FAQ categories that correspond to an intent; the rest are "general" questions
+FAQ_CATEGORY_INTENTS = {
+    'timetable': 'timetable',
+    'faculty': 'faculty',
+    'exam': 'exam',
+    'assignment': 'assignment',
+    'course': 'course',
+    'policy': 'attendance',
+}
+
+
+def load_examples():
+    """(text, intent) pairs, deduplicated"""
+    examples = []
+    db = SessionLocal()
+    try:
+        for message, intent in db.query(models.ChatHistory.user_message, models.ChatHistory.intent)\
+                .filter(models.ChatHistory.intent.isnot(None)):
+            examples.append((message, intent))
+        for question, category in db.query(models.FAQ.question, models.FAQ.category):
+            examples.append((question, FAQ_CATEGORY_INTENTS.get(category, 'general')))
+    finally:
+        db.close()
+
+    with open(os.getenv("INTENT_KEYWORDS_PATH", DEFAULT_KEYWORDS_PATH), encoding="utf-8") as f:
+        config = json.load(f)
+    for spec in config["intents"]:
+        examples.extend((keyword, spec["intent"]) for keyword in spec["keywords"])
+
+    return list(dict.fromkeys(examples))
+
+
+def split(examples, holdout, seed):
+    """Stratified train/test split"""
+    by_label = defaultdict(list)
+    for example in examples:
+        by_label[example[1]].append(example)
+    rng = random.Random(seed)
+    train, test = [], []
+    for items in by_label.values():
+        rng.shuffle(items)
+        n_test = int(len(items) * holdout)
+        test.extend(items[:n_test])
+        train.extend(items[n_test:])
+    return train, test
+
+
+def fit(examples, args):
+    texts, labels = zip(*examples)
+    return IntentModel.train(texts, labels, dim=args.dim, epochs=args.epochs,
+                             learning_rate=args.learning_rate, seed=args.seed)
+
+
+def report(model, examples):
+    rules = IntentClassifier.from_config()
+    correct = agree = 0
+    per_label = defaultdict(Counter)
+    start = time.perf_counter()
+    predictions = [model.predict(text)[0] for text, _ in examples]
+    elapsed = time.perf_counter() - start
+
+    for (text, label), predicted in zip(examples, predictions):
+        correct += predicted == label
+        agree += predicted == rules.classify(text)[0]
+        per_label[label]["support"] += 1
+        per_label[label]["tp"] += predicted == label
+        per_label[predicted]["predicted"] += 1
+
+    n = len(examples) or 1
+    print(f"Examples: {len(examples)}  accuracy: {correct / n:.3f}  "
+          f"agreement with keyword rules: {agree / n:.3f}  "
+          f"inference: {elapsed / n * 1e6:.1f} us/message")
+    print(f"{'intent':<12} {'precision':>9} {'recall':>7} {'support':>8}")
+    for label in sorted(per_label):
+        counts = per_label[label]
+        precision = counts["tp"] / counts["predicted"] if counts["predicted"] else 0.0
+        recall = counts["tp"] / counts["support"] if counts["support"] else 0.0
+        print(f"{label:<12} {precision:>9.3f} {recall:>7.3f} {counts['support']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent model training")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_cmd = commands.add_parser("train", help="fit on all examples and write the model")
+    evaluate_cmd = commands.add_parser("evaluate", help="hold-out evaluation, or score a saved model")
+    for cmd in (train_cmd, evaluate_cmd):
+        cmd.add_argument("--dim", type=int, default=4096)
+        cmd.add_argument("--epochs", type=int, default=50)
+        cmd.add_argument("--learning-rate", type=float, default=1.0)
+        cmd.add_argument("--seed", type=int, default=13)
+    train_cmd.add_argument("--out", default=os.getenv("INTENT_MODEL_PATH", "intent_model.npz"))
+    train_cmd.add_argument("--dtype", default="float16", choices=["float16", "float32"])
+    evaluate_cmd.add_argument("--model", help="saved model to score on all examples")
+    evaluate_cmd.add_argument("--holdout", type=float, default=0.2)
+
+    export_cmd = commands.add_parser("export", help="rewrite a model with another weight dtype")
+    export_cmd.add_argument("--model", required=True)
+    export_cmd.add_argument("--out", required=True)
+    export_cmd.add_argument("--dtype", default="float16", choices=["float16", "float32"])
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        IntentModel.load(args.model).save(args.out, dtype=args.dtype)
+        print(f"Wrote {args.out} ({os.path.getsize(args.out)} bytes)")
+        return
+
+    examples = load_examples()
+    print(f"Loaded {len(examples)} examples: {dict(Counter(label for _, label in examples))}")
+
+    if args.command == "train":
+        model = fit(examples, args)
+        model.save(args.out, dtype=args.dtype)
+        print(f"Wrote {args.out} ({os.path.getsize(args.out)} bytes)")
+        report(model, examples)
+    elif args.model:
+        report(IntentModel.load(args.model), examples)
+    else:
+        train, test = split(examples, args.holdout, args.seed)
+        report(fit(train, args), test)
+
+
+if __name__ == "__main__":
+    main()